@@ -2,43 +2,136 @@ import sys
 import ac
 import acsys
 import os
-import csv
 import time
 from datetime import datetime
 import traceback # Import traceback for better error logging
 
+# Make the app's own helper modules importable regardless of AC's working directory.
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import tacs_storage
+from tacs_leaderboard import Leaderboard, BestIndex
+import tacs_lap_poller
+import tacs_trace
+import tacs_profiler
+import tacs_scheduler
+import tacs_ui
+import tacs_delta
+import tacs_gaps
+import tacs_history
+import tacs_sectors
+import tacs_feed
+import tacs_identity
+
 # --- Global UI and State Variables ---
 app_window = 0
-l_lapcount, l_current_time, l_best_time, l_record_holder, l_last_lap, l_relative = (0,) * 6
+l_lapcount, l_current_time, l_delta, l_best_time, l_record_holder, l_rank, l_last_lap = (0,) * 7
+l_sectors, l_theoretical = 0, 0
+l_relatives = []          # One row per car ahead/behind pair
 l_recent_records = []
+v_lapcount, v_current_time, v_delta, v_last_lap = (None,) * 4  # tacs_ui.ValueLabel for the per-frame labels
+recent_records = None     # tacs_ui.RecentRecords over l_recent_records
 
 # --- Configuration ---
 RECORDS_DIR = "apps/python/TrackAndCarStats/records"
-UI_UPDATE_INTERVAL = 0.5  # How often to update slower-changing UI elements
+LAP_HISTORY = True        # Keep every completed lap in records/history (see tacs_history)
+SECTOR_SPLITS = True      # Track the player's sector splits from shared memory (see tacs_sectors)
+TELEMETRY_RECORDING = False  # Record the player's telemetry at physics rate into TELEMETRY_FILE (see tacs_telemetry)
+TELEMETRY_FILE = "apps/python/TrackAndCarStats/telemetry/telemetry.ring"
+TELEMETRY_CAPACITY = 1 << 19  # Samples kept in the ring, about 26 minutes at 333 Hz (30 MB)
+LIVE_FEED = False         # Serve the timing state to overlays at http://127.0.0.1:LIVE_FEED_PORT (see tacs_feed)
+LIVE_FEED_PORT = 8765
+CONFIG_FILE = os.path.join(APP_DIR, "TrackAndCarStats.ini")  # [scheduler] periods override the defaults below
+UI_UPDATE_INTERVAL = 0.5  # Default period of the slower-changing UI tasks
+FRAME_BUDGET_MS = 1.0     # Time per frame the scheduled tasks may use before the rest wait a frame
 MAX_RECORDS_DISPLAY = 6   # Number of recent records to display
+SAVE_QUEUE_SIZE = 32      # Bound on pending save wake-ups for the background saver
+RECORDS_STORAGE = "csv"   # "csv" rewrites {track}.csv per save, "journal" appends and compacts, "sqlite" uses records.db
+JOURNAL_COMPACT_EVERY = 50  # Journal lines per track before it is folded back into the CSV
+RECORDS_BY_DRIVER = False # Keep a record per car and driver instead of per car; turning it off again keeps each car's fastest
+LAP_POLL_BACKEND = "auto"   # "shared_memory", "ac" or "auto" (shared memory when available)
+LAP_POLL_CARS_PER_FRAME = 8 # Cars checked for a completed lap per frame, 0 = all of them
+RELATIVE_CARS = 1         # Cars shown ahead of and behind the focused car
+GAP_CHECKPOINTS = 256     # Spline checkpoints per lap for the relative gaps (see tacs_gaps)
+GAP_CARS_PER_FRAME = 8    # Cars sampled for the gap engine per frame, 0 = all of them
+TRACE_CAPTURE = False     # Record every ac getter result to a replayable trace (see tacs_trace)
+TRACE_DIR = "apps/python/TrackAndCarStats/traces"
+PROFILER_ENABLED = False  # Start with acUpdate section timing on; Ctrl+Shift+P toggles it in game
+PROFILER_TOGGLE_KEY = 0x50  # 'P' - Ctrl+Shift+P turns section timing on/off
+PROFILER_DUMP_KEY = 0x4F    # 'O' - Ctrl+Shift+O writes the timing table to the log
 
 # --- Caches and State Management ---
 app_state = {
     'full_track_name': None,
     'lap_count': 0,
-    'last_ui_update': 0
+    'focused_car': 0,
+    'best_lap': 0,        # Focused car's best shown on l_best_time, 0 = none
+    'delta_car': None,    # Car whose reference lap delta_tracker holds; None forces a reload
+    'delta_file': None,   # Where that car's reference lap is saved
+    'delta_loading': False,  # Whether the saver is still reading delta_file
+    'sector_file': None   # Where the player's best sector splits are saved
 }
-last_lap_times = {}       # {car_id: last_lap_time_ms}
+lap_poller = None         # tacs_lap_poller.LapPoller, created in acMain
+trace_recorder = None     # tacs_trace.TraceRecorder while TRACE_CAPTURE is on
 records_cache = {}        # {track_name: {car_tech_name: time_ms}}
-last_displayed_text = {}  # {label_widget: "text"} - To prevent redundant ac.setText calls
+leaderboards = {}         # {track_name: Leaderboard} - sorted index over records_cache
+best_indexes = {}         # {track_name: BestIndex} - fastest driver per car for the Best line, with RECORDS_BY_DRIVER only
+identities = tacs_identity.IdentityCache(  # Car, driver and skin per car slot; the lambdas follow `ac` into a trace capture
+    lambda car_id: ac.getCarName(car_id), lambda car_id: ac.getDriverName(car_id), lambda car_id: ac.getCarSkin(car_id))
+label_model = tacs_ui.LabelModel()  # What every label should show; flushed to ac.setText once per frame
+pending_record_messages = []  # Announcements waiting for the recent-records task
+gap_engine = tacs_gaps.GapEngine(GAP_CHECKPOINTS, GAP_CARS_PER_FRAME)  # Race order and gaps for the relatives
+delta_tracker = tacs_delta.DeltaTracker()  # Focused car's lap vs. its best recorded lap, by track position
+sector_graphics = None    # Shared-memory graphics page the sector splits are read from, None = disabled
+sector_tracker = None     # tacs_sectors.SectorTracker for the player's car
+telemetry_recorder = None # tacs_telemetry.TelemetryRecorder while TELEMETRY_RECORDING is on
+live_feed = None          # tacs_feed.LiveFeed while LIVE_FEED is on
+feed_server = None        # tacs_feed.FeedServer serving live_feed
+
+# --- Profiling (section indices into profiler.sections) ---
+PROFILE_FAST_UI, PROFILE_LAP_SCAN, PROFILE_BEST_LAP, PROFILE_TRACK_RECORD, PROFILE_GAP_SAMPLING, \
+    PROFILE_RELATIVES, PROFILE_RECENT_RECORDS, PROFILE_FRAME = range(8)
+profiler = tacs_profiler.SectionProfiler(
+    ("fast_ui", "lap_scan", "best_lap", "track_record", "gap_sampling", "relatives", "recent_records", "frame"),
+    enabled=PROFILER_ENABLED)
+
+# --- Frame scheduling (everything in acUpdate beyond the per-frame labels) ---
+scheduler = tacs_scheduler.FrameScheduler(FRAME_BUDGET_MS / 1000.0, profiler)
+
+# --- Persistence (all disk writes happen on the saver thread) ---
+def create_record_store():
+    """Builds the store for RECORDS_STORAGE; SQLite falls back to CSV files if this Python has no sqlite3."""
+    if RECORDS_STORAGE == "sqlite":
+        try:
+            return tacs_storage.SqliteRecordStore(RECORDS_DIR, log=ac.log, by_driver=RECORDS_BY_DRIVER)
+        except Exception as e:
+            ac.log("TACS Warning: SQLite records unavailable ({}), using CSV files".format(e))
+    elif RECORDS_STORAGE == "journal":
+        return tacs_storage.JournalRecordStore(RECORDS_DIR, compact_every=JOURNAL_COMPACT_EVERY, log=ac.log,
+                                               by_driver=RECORDS_BY_DRIVER)
+    return tacs_storage.CsvRecordStore(RECORDS_DIR, log=ac.log, by_driver=RECORDS_BY_DRIVER)
+
+record_store = create_record_store()
+lap_history = tacs_history.LapHistory(os.path.join(RECORDS_DIR, "history"), log=ac.log) if LAP_HISTORY else None
+record_saver = tacs_storage.RecordSaver(record_store, max_queue=SAVE_QUEUE_SIZE, log=ac.log, history=lap_history)
 
 # --- Helper Functions ---
 
 def update_label_if_changed(label, new_text):
-    """Avoids calling ac.setText if the label's text has not changed."""
-    global last_displayed_text
-    if label not in last_displayed_text or last_displayed_text[label] != new_text:
-        ac.setText(label, new_text)
-        last_displayed_text[label] = new_text
+    """Sets a label's text in the label model; flush_labels() sends it only if it changed."""
+    label_model.set(label, new_text)
 
-def normalize_path(path):
-    """Normalizes a path to use forward slashes, which is safer across systems."""
-    return path.replace('\\', '/')
+def flush_labels():
+    """Pushes every label changed this frame to the UI, once."""
+    label_model.flush(ac.setText)
+
+def add_label(text):
+    """Creates a label in the app window and registers it with the label model."""
+    label = ac.addLabel(app_window, text)
+    label_model.view(label, text)
+    return label
 
 def format_time(ms):
     """Converts milliseconds to a formatted time string MM:SS.mmm."""
@@ -67,103 +160,60 @@ def get_full_track_name():
     layout = get_track_layout()
     return "{}_{}".format(track_name, layout)
 
-def get_track_records_file(track_name):
-    """Constructs the full, normalized path to a track's records file."""
-    if not os.path.exists(RECORDS_DIR):
-        try:
-            os.makedirs(RECORDS_DIR)
-            ac.log("TACS: Created records directory at {}".format(normalize_path(RECORDS_DIR)))
-        except OSError as e:
-            ac.log("TACS Error: Could not create records directory: {}".format(e))
-            return None
-            
-    return normalize_path(os.path.join(RECORDS_DIR, "{}.csv".format(track_name)))
-
 def load_track_records(track):
     """Loads records for a specific track. Now uses a simplified {name: time} format."""
     if track in records_cache:
         return records_cache[track]
 
-    records = {}
-    records_file = get_track_records_file(track)
-    if not records_file:
-        return {}
-
-    try:
-        if os.path.exists(records_file):
-            with open(records_file, 'r', newline='') as f:
-                reader = csv.reader(f)
-                try:
-                    next(reader) 
-                except StopIteration:
-                    pass
-                
-                for row in reader:
-                    try:
-                        if len(row) >= 2:
-                            records[row[0]] = int(row[1])
-                    except (ValueError, IndexError):
-                        pass
-        else:
-            with open(records_file, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['CarName', 'Time_ms'])
-            ac.log("TACS: Created new records file for {}".format(track))
-
-    except Exception as e:
-        ac.log("TACS Error loading records for {}: {}".format(track, traceback.format_exc()))
-
+    records = record_store.load(track)
+    record_saver.submit_prepare(track)
     records_cache[track] = records
+    leaderboards[track] = Leaderboard(records)
+    if RECORDS_BY_DRIVER:
+        best_indexes[track] = BestIndex(records)
     return records
 
-def save_track_records(track, records):
-    """Saves all records for a specific track using the simplified 2-column format."""
-    records_file = get_track_records_file(track)
-    if not records_file:
-        return
-
-    try:
-        with open(records_file, 'w', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow(['CarName', 'Time_ms'])
-            sorted_records = sorted(records.items(), key=lambda item: item[1])
-            for technical_name, time_ms in sorted_records:
-                writer.writerow([technical_name, time_ms])
-        
-        records_cache[track] = dict(sorted_records)
-        ac.log("TACS: Successfully saved {} records for track {}".format(len(records), track))
-
-    except Exception as e:
-        ac.log("TACS Error saving records for {}: {}".format(track, traceback.format_exc()))
+def record_key(car_id):
+    """What records are keyed by: the car model, or (car, driver) with RECORDS_BY_DRIVER."""
+    identity = identities.get(car_id)
+    return (identity.car, identity.driver) if RECORDS_BY_DRIVER else identity.car
+
+def key_text(key):
+    """A record key for display: 'ks_bmw_m3' or 'ks_bmw_m3 (Driver Name)'."""
+    if isinstance(key, tuple):
+        return "{} ({})".format(key[0], key[1]) if key[1] else key[0]
+    return key
+
+def get_track_leaderboard(track):
+    """Returns the sorted leaderboard index for a track, loading its records if needed."""
+    if track not in leaderboards:
+        load_track_records(track)
+    return leaderboards[track]
+
+def get_best_index(track):
+    """Returns the per-car / per-driver best index for a track (RECORDS_BY_DRIVER), loading its records if needed."""
+    if track not in best_indexes:
+        load_track_records(track)
+    return best_indexes[track]
 
 def update_recent_record_display(message):
     """Updates the recent records display area with a new message at the top."""
-    if not l_recent_records: return
-    
-    try:
-        for i in range(len(l_recent_records) - 1, 0, -1):
-            text = ac.getText(l_recent_records[i-1])
-            update_label_if_changed(l_recent_records[i], text)
-        
-        update_label_if_changed(l_recent_records[0], message)
-        
-        for label in l_recent_records:
-            if ac.getText(label).strip():
-                ac.setVisible(label, False)
-                ac.setVisible(label, True)
-    except Exception as e:
-        ac.log("TACS Error in update_recent_record_display: {}".format(e))
+    if recent_records is None: return
+    recent_records.push(message)
 
 def check_and_update_record(track, car_id, lap_time_ms):
     """Checks if a new lap is a record and updates the files and UI with comparison info."""
     try:
-        technical_name = ac.getCarName(car_id)
-        if not technical_name: return
+        if not identities.car(car_id): return
+        key = record_key(car_id)
+        technical_name = key_text(key)
 
         records = load_track_records(track)
+        leaderboard = get_track_leaderboard(track)
         
-        previous_car_record = records.get(technical_name, float('inf'))
-        previous_track_best_time, previous_track_best_car = get_current_track_record(records)
+        previous_car_record = records.get(key, float('inf'))
+        previous_track_best_time, previous_track_best_car = leaderboard.best()
+        previous_track_best_car = key_text(previous_track_best_car)
         
         if lap_time_ms < previous_car_record:
             
@@ -183,86 +233,438 @@ def check_and_update_record(track, car_id, lap_time_ms):
                 else:
                     msg = "PB! {} - {}".format(technical_name, format_time(lap_time_ms))
 
-            records[technical_name] = lap_time_ms
-            save_track_records(track, records)
+            records[key] = lap_time_ms
+            leaderboard.update(key, lap_time_ms)
+            if RECORDS_BY_DRIVER:
+                best_indexes[track].update(key, lap_time_ms)
+            record_saver.submit(track, key, lap_time_ms)
             
-            update_recent_record_display(msg)
+            pending_record_messages.append(msg)
             ac.log("TACS: {}".format(msg))
             ac.console("TACS: {}".format(msg))
 
     except Exception as e:
         ac.log("TACS Error in check_and_update_record: {}".format(traceback.format_exc()))
 
-def get_current_track_record(records):
-    """Finds the best time and associated car name from a records dictionary."""
-    if not records:
-        return float('inf'), "N/A"
+def get_track_record_text(leaderboard):
+    """Formats the track record line from a leaderboard's best entry."""
+    best_time, best_car_name = leaderboard.best()
+    if best_time == float('inf'):
+        return "Track Record: N/A"
+    return "Track Record: {} by {}".format(format_time(best_time), key_text(best_car_name))
+
+def get_rank_text(leaderboard, key):
+    """Formats the focused car's position on the track leaderboard, e.g. 'Rank: P3 of 214'."""
+    rank = leaderboard.rank(key)
+    if not rank:
+        return "Rank: N/A"
+    return "Rank: P{} of {}".format(rank, len(leaderboard))
+
+def read_last_lap(car_id):
+    """LastLap through the ac API; the lap pollers' fallback path."""
+    return ac.getCarState(car_id, acsys.CS.LastLap)
 
+def read_spline_position(car_id):
+    return ac.getCarState(car_id, acsys.CS.NormalizedSplinePosition)
+
+def read_lap_count(car_id):
+    return ac.getCarState(car_id, acsys.CS.LapCount)
+
+def update_gap_roster():
+    """Matches the gap engine's cars and the identity cache to the session's car slots and who is connected."""
+    num_cars = ac.getCarsCount()
+    if num_cars != len(gap_engine.cars):
+        gap_engine.reset(num_cars)
+    if num_cars != len(identities):
+        identities.reset(num_cars)
+    for car_id in range(num_cars):
+        connected = bool(ac.isConnected(car_id))
+        gap_engine.set_connected(car_id, connected)
+        identities.set_connected(car_id, connected)
+
+def create_lap_poller():
+    """Builds the lap poller for LAP_POLL_BACKEND, falling back to the ac API path."""
+    # Shared memory reads bypass `ac`, so they would be missing from a captured trace.
+    if LAP_POLL_BACKEND in ("auto", "shared_memory") and trace_recorder is None:
+        try:
+            from third_party.sim_info import info
+            ac.log("TACS: Polling laps via shared memory")
+            return tacs_lap_poller.SharedMemoryLapPoller(info.graphics, read_last_lap, LAP_POLL_CARS_PER_FRAME)
+        except Exception as e:
+            ac.log("TACS Warning: Shared memory unavailable ({}). Polling laps via the ac API".format(e))
+    return tacs_lap_poller.LapPoller(read_last_lap, LAP_POLL_CARS_PER_FRAME)
+
+def start_trace_capture():
+    """Swaps this module's `ac` for a TraceRecorder so every getter result is captured."""
+    global ac, trace_recorder
     try:
-        best_car, best_time = min(records.items(), key=lambda item: item[1])
-        return best_time, best_car
-    except ValueError:
-        return float('inf'), "N/A"
+        if not os.path.exists(TRACE_DIR):
+            os.makedirs(TRACE_DIR)
+        trace_file = os.path.join(TRACE_DIR, "session_{}.tacstrace".format(datetime.now().strftime("%Y%m%d_%H%M%S")))
+        trace_recorder = tacs_trace.TraceRecorder(ac, trace_file, acsys.CS, time.time(), record_saver.submit_append)
+        ac = trace_recorder
+        ac.log("TACS: Capturing API trace to {}".format(tacs_storage.normalize_path(trace_file)))
+    except Exception as e:
+        ac.log("TACS Error starting trace capture: {}".format(traceback.format_exc()))
+
+# --- Scheduled Tasks (each takes the frame's time) ---
+
+def task_lap_scan(now):
+    """Checks this frame's share of cars for newly completed laps (for records)."""
+    lap_poller.poll(ac.getCarsCount(), on_lap_completed)
+
+def task_best_lap(now):
+    """
+    Shows the better of the focused car's session best and its all-time best here.
+
+    With RECORDS_BY_DRIVER that is the focused driver's best in this car; when
+    another driver has been faster in the same car, their time follows it.
+    """
+    focused_car = app_state['focused_car']
+    session_best_lap = ac.getCarState(focused_car, acsys.CS.BestLap)
+    car_all_time_best = get_track_leaderboard(app_state['full_track_name']).time_of(record_key(focused_car))
+
+    true_best = float('inf')
+    if session_best_lap > 0:
+        true_best = session_best_lap
+    if car_all_time_best < true_best:
+        true_best = car_all_time_best
+
+    if true_best != float('inf'):
+        app_state['best_lap'] = true_best
+        text = "Best: {}".format(format_time(true_best))
+        if RECORDS_BY_DRIVER:
+            car_best, car_best_driver = get_best_index(app_state['full_track_name']).car_best(identities.car(focused_car))
+            if car_best < true_best:
+                text += " | Car: {} {}".format(format_time(car_best), car_best_driver)
+        update_label_if_changed(l_best_time, text)
+    else:
+        app_state['best_lap'] = 0
+        update_label_if_changed(l_best_time, "Best: N/A")
+
+def task_track_record(now):
+    """Updates the record holder line and the focused car's rank."""
+    leaderboard = get_track_leaderboard(app_state['full_track_name'])
+    update_label_if_changed(l_record_holder, get_track_record_text(leaderboard))
+    update_label_if_changed(l_rank, get_rank_text(leaderboard, record_key(app_state['focused_car'])))
+
+def task_gap_sampling(now):
+    gap_engine.poll(read_spline_position, read_lap_count, now)
+
+def task_gap_roster(now):
+    update_gap_roster()
+
+def task_relatives(now):
+    update_relative_display(app_state['focused_car'])
+
+def task_recent_records(now):
+    """Moves announcements from check_and_update_record into the recent records panel."""
+    while pending_record_messages:
+        update_recent_record_display(pending_record_messages.pop(0))
+
+def task_live_feed(now):
+    live_feed.publish(build_feed_snapshot(now))
+
+def setup_scheduler():
+    """Registers the scheduled tasks and applies any [scheduler] periods from CONFIG_FILE."""
+    del scheduler.tasks[:]
+    scheduler.add("lap_scan", task_lap_scan, 0.0, PROFILE_LAP_SCAN)
+    scheduler.add("best_lap", task_best_lap, UI_UPDATE_INTERVAL, PROFILE_BEST_LAP)
+    scheduler.add("track_record", task_track_record, UI_UPDATE_INTERVAL, PROFILE_TRACK_RECORD)
+    scheduler.add("gap_sampling", task_gap_sampling, 0.0, PROFILE_GAP_SAMPLING)
+    scheduler.add("gap_roster", task_gap_roster, UI_UPDATE_INTERVAL * 4)
+    scheduler.add("relatives", task_relatives, UI_UPDATE_INTERVAL, PROFILE_RELATIVES)
+    scheduler.add("recent_records", task_recent_records, UI_UPDATE_INTERVAL / 2, PROFILE_RECENT_RECORDS)
+    if live_feed is not None:
+        scheduler.add("live_feed", task_live_feed, UI_UPDATE_INTERVAL / 2)
+
+    periods, frame_budget = tacs_scheduler.load_periods(CONFIG_FILE, log=ac.log)
+    scheduler.configure(periods, frame_budget)
+    scheduler.start(time.time())
+    ac.log("TACS: Scheduler periods: {}".format(", ".join(
+        "{} {:.2f}s".format(task.name, task.period) for task in scheduler.tasks)))
+
+def dump_profile():
+    """Writes the acUpdate section timing table to the log."""
+    ac.log("TACS: acUpdate profile ({}):".format("on" if profiler.enabled else "off"))
+    for line in profiler.summary_lines():
+        ac.log("TACS:   {}".format(line))
+
+def toggle_profiler():
+    """Hotkey callback: starts or stops section timing, starting from empty histograms."""
+    if profiler.toggle():
+        profiler.reset()
+    ac.log("TACS: acUpdate profiling {}".format("enabled" if profiler.enabled else "disabled"))
+
+profiler_hotkeys = tacs_profiler.Hotkeys({PROFILER_TOGGLE_KEY: toggle_profiler, PROFILER_DUMP_KEY: dump_profile})
+
+def get_reference_lap_file(track, car_name):
+    """Path of the saved reference lap for a track/car, next to the track's records."""
+    return os.path.join(record_store.records_dir, "{}__{}.ref".format(track, car_name))
+
+def load_reference_lap(car_id):
+    """Points delta_tracker at a car's saved reference lap; the saver thread reads it, so there is none until then."""
+    path = get_reference_lap_file(app_state['full_track_name'], identities.car(car_id))
+    delta_tracker.reset()
+    delta_tracker.reference.clear()
+    record_saver.request_file(path)
+    app_state['delta_car'] = car_id
+    app_state['delta_file'] = path
+    app_state['delta_loading'] = True
+
+def take_reference_lap():
+    """Takes over the reference lap read by the saver thread, unless a faster lap was set while it was read."""
+    done, data = record_saver.take_file(app_state['delta_file'])
+    if not done:
+        return
+    app_state['delta_loading'] = False
+    reference = delta_tracker.reference
+    if reference.lap_ms:
+        loaded = tacs_delta.ReferenceLap(reference.bins)
+        if loaded.from_bytes(data) and loaded.lap_ms < reference.lap_ms:
+            reference.times, reference.lap_ms = loaded.times, loaded.lap_ms
+    else:
+        reference.from_bytes(data)
+
+def update_delta(focused_car, lap_time_ms, last_lap_ms):
+    """Feeds this frame's position to the delta tracker and shows the delta to the reference lap."""
+    if focused_car != app_state['delta_car']:
+        load_reference_lap(focused_car)
+    if app_state['delta_loading']:
+        take_reference_lap()
+    spline = ac.getCarState(focused_car, acsys.CS.NormalizedSplinePosition)
+    if delta_tracker.update(spline, lap_time_ms, last_lap_ms):
+        record_saver.submit_file(app_state['delta_file'], delta_tracker.reference.to_bytes())
+    delta = delta_tracker.delta_ms(spline, lap_time_ms)
+    v_delta.update(None if delta is None else int(round(delta / 10.0)))
+
+def create_sector_tracker():
+    """Sets up sector tracking from shared memory; leaves it disabled when that is unavailable."""
+    global sector_graphics, sector_tracker
+    if not SECTOR_SPLITS or trace_recorder is not None:
+        return
+    try:
+        from third_party.sim_info import info
+        sector_count = info.static.sectorCount
+        graphics = info.graphics
+    except Exception as e:
+        ac.log("TACS Warning: Sector splits unavailable ({})".format(e))
+        return
+    if sector_count < 1:
+        ac.log("TACS Warning: Track reports no sectors, sector splits disabled")
+        return
+    sector_tracker = tacs_sectors.SectorTracker(sector_count)
+    sector_graphics = graphics
+
+def start_telemetry_recording():
+    """Starts the physics-rate telemetry thread; logs and carries on if shared memory is unavailable."""
+    global telemetry_recorder
+    try:
+        import tacs_telemetry
+        from third_party.sim_info import info
+        ring = tacs_telemetry.TelemetryRing(TELEMETRY_FILE, TELEMETRY_CAPACITY)
+        telemetry_recorder = tacs_telemetry.TelemetryRecorder(ring, info.physics, info.graphics)
+        telemetry_recorder.start()
+        ac.log("TACS: Recording telemetry to {}".format(TELEMETRY_FILE))
+    except Exception as e:
+        ac.log("TACS Warning: Telemetry recording unavailable ({})".format(e))
+
+def start_live_feed():
+    """Starts the localhost timing feed; the app carries on without it if the port is taken."""
+    global live_feed, feed_server
+    try:
+        live_feed = tacs_feed.LiveFeed()
+        feed_server = tacs_feed.FeedServer(live_feed, port=LIVE_FEED_PORT)
+        feed_server.start()
+        ac.log("TACS: Live feed at http://{}:{}/events".format(*feed_server.address))
+    except Exception as e:
+        live_feed = feed_server = None
+        ac.log("TACS Warning: Live feed unavailable ({})".format(e))
+
+def feed_relatives(focused_car_id):
+    """[{'car', 'laps', 'gap'}] of the cars around the focused car, nearest ahead first; gap < 0 is ahead."""
+    ahead, behind = gap_engine.neighbours(focused_car_id, RELATIVE_CARS)
+    if ahead is None:
+        return []
+    relatives = []
+    for car_id in ahead:
+        laps, seconds = gap_engine.gap(car_id, focused_car_id)
+        relatives.append({'car': identities.car(car_id), 'laps': -laps,
+                          'gap': None if seconds is None else -round(seconds, 3)})
+    for car_id in behind:
+        laps, seconds = gap_engine.gap(focused_car_id, car_id)
+        relatives.append({'car': identities.car(car_id), 'laps': laps,
+                          'gap': None if seconds is None else round(seconds, 3)})
+    return relatives
+
+def build_feed_snapshot(now):
+    """The live feed's view of the app: plain values only, built fresh each tick and never modified."""
+    focused_car = app_state['focused_car']
+    identity = identities.get(focused_car)
+    leaderboard = get_track_leaderboard(app_state['full_track_name'])
+    record_time, best_key = leaderboard.best()
+    if record_time == float('inf'):
+        track_record = None
+    elif isinstance(best_key, tuple):
+        track_record = {'car': best_key[0], 'driver': best_key[1], 'time_ms': record_time}
+    else:
+        track_record = {'car': best_key, 'time_ms': record_time}
+    return {
+        'track': app_state['full_track_name'],
+        'car': identity.car,
+        'driver': identity.driver,
+        'laps': app_state['lap_count'],
+        'current_ms': v_current_time.value or 0,
+        'last_ms': v_last_lap.value or 0,
+        'best_ms': app_state['best_lap'],
+        'delta_s': None if v_delta.value is None else v_delta.value / 100.0,
+        'track_record': track_record,
+        'rank': leaderboard.rank(record_key(focused_car)) or None,
+        'relatives': feed_relatives(focused_car),
+        'recent_records': list(recent_records.messages) if recent_records is not None else [],
+    }
+
+def get_sector_file(track, car_name):
+    """Path of the saved best sector splits for a track/car, next to the track's records."""
+    return os.path.join(record_store.records_dir, "{}__{}.sectors".format(track, car_name))
+
+def load_best_sectors():
+    """Loads the player's best splits for this track/car and shows them."""
+    if sector_tracker is None:
+        return
+    path = get_sector_file(app_state['full_track_name'], identities.car(0))
+    sector_tracker.reset()
+    sector_tracker.load(path)
+    app_state['sector_file'] = path
+    show_sectors()
+
+def show_sectors():
+    """Updates the best-sector and theoretical-best labels."""
+    splits = " | ".join("{:.3f}".format(ms / 1000.0) if ms else "--" for ms in sector_tracker.best)
+    update_label_if_changed(l_sectors, "Sectors: {}".format(splits))
+    update_label_if_changed(l_theoretical, "Theoretical: {}".format(format_time(sector_tracker.theoretical_best())))
+
+def on_sector_change():
+    """Called when the player's currentSectorIndex differs from what the tracker last saw."""
+    graphics = sector_graphics
+    in_pit = graphics.isInPit or graphics.isInPitLane
+    if sector_tracker.change(graphics.currentSectorIndex, graphics.lastSectorTime,
+                             graphics.iCurrentTime, graphics.iLastTime, in_pit):
+        record_saver.submit_file(app_state['sector_file'], sector_tracker.to_text().encode('utf-8'))
+        show_sectors()
+
+def get_session_type():
+    """AC session type from shared memory (0 practice, 1 qualify, 2 race, ...), -1 if unavailable."""
+    if trace_recorder is not None:
+        return -1
+    try:
+        from third_party.sim_info import info
+        return info.graphics.session
+    except Exception:
+        return -1
+
+def on_lap_completed(car_id, lap_time_ms):
+    """Lap poller callback for a car that has just completed a lap."""
+    if lap_history is not None:
+        record_saver.submit_lap(app_state['full_track_name'], time.time(), lap_time_ms,
+                                identities.car(car_id), identities.driver(car_id), get_session_type())
+    check_and_update_record(app_state['full_track_name'], car_id, lap_time_ms)
 
 def initialize_session():
     """Sets up all session-specific data and initial UI state."""
-    global app_state, last_lap_times, last_displayed_text
+    global app_state
     
     app_state['full_track_name'] = get_full_track_name()
     app_state['lap_count'] = 0
-    last_lap_times.clear()
-    last_displayed_text.clear()
+    app_state['best_lap'] = 0
+    app_state['delta_car'] = None
+    identities.reset(0)
+    load_best_sectors()
+    lap_poller.reset()
+    gap_engine.reset(0)
+    update_gap_roster()
+    label_model.invalidate()
+    for value_label in (v_lapcount, v_current_time, v_delta, v_last_lap):
+        if value_label is not None:
+            value_label.reset()
 
     ac.log("TACS: Initializing session for track: {}".format(app_state['full_track_name']))
     
-    records = load_track_records(app_state['full_track_name'])
-    best_time, best_car_name = get_current_track_record(records)
-    
-    record_text = "Track Record: N/A"
-    if best_time != float('inf'):
-        record_text = "Track Record: {} by {}".format(format_time(best_time), best_car_name)
-    
-    update_label_if_changed(l_record_holder, record_text)
+    leaderboard = get_track_leaderboard(app_state['full_track_name'])
+    update_label_if_changed(l_record_holder, get_track_record_text(leaderboard))
     
-    for label in l_recent_records:
-        update_label_if_changed(label, "")
+    if recent_records is not None:
+        recent_records.clear()
 
 
 # --- AC Hook Functions ---
 
 def acMain(ac_version):
     """Called by Assetto Corsa to initialize the app."""
-    global app_window, l_lapcount, l_current_time, l_best_time, l_last_lap, l_record_holder, l_relative, l_recent_records
+    global app_window, l_lapcount, l_current_time, l_delta, l_best_time, l_last_lap, l_record_holder, l_rank, l_recent_records, lap_poller
+    global l_sectors, l_theoretical
+    global v_lapcount, v_current_time, v_delta, v_last_lap, recent_records
     
     try:
+        if TRACE_CAPTURE:
+            start_trace_capture()
+
         app_window = ac.newApp("TrackAndCarStats")
-        ac.setSize(app_window, 300, 340)
+        ac.setSize(app_window, 300, 428 + 22 * (RELATIVE_CARS - 1))
         ac.setTitle(app_window, "")
         ac.drawBorder(app_window, 0)
         ac.setBackgroundOpacity(app_window, 0.9)
 
         y_pos = 10
-        l_lapcount = ac.addLabel(app_window, "Laps: 0"); ac.setPosition(l_lapcount, 10, y_pos); y_pos += 22
-        l_current_time = ac.addLabel(app_window, "Current: --:--.---"); ac.setPosition(l_current_time, 10, y_pos); y_pos += 22
-        l_best_time = ac.addLabel(app_window, "Best: --:--.---"); ac.setPosition(l_best_time, 10, y_pos); y_pos += 22
-        l_last_lap = ac.addLabel(app_window, "Last: --:--.---"); ac.setPosition(l_last_lap, 10, y_pos); y_pos += 22
-        l_record_holder = ac.addLabel(app_window, "Track Record: N/A"); ac.setPosition(l_record_holder, 10, y_pos); y_pos += 22
-        l_relative = ac.addLabel(app_window, "Relative: N/A"); ac.setPosition(l_relative, 10, y_pos); y_pos += 30
-
-        records_title = ac.addLabel(app_window, "Recent Records"); ac.setPosition(records_title, 10, y_pos); y_pos += 22
+        l_lapcount = add_label("Laps: 0"); ac.setPosition(l_lapcount, 10, y_pos); y_pos += 22
+        l_current_time = add_label("Current: --:--.---"); ac.setPosition(l_current_time, 10, y_pos); y_pos += 22
+        l_delta = add_label("Delta: N/A"); ac.setPosition(l_delta, 10, y_pos); y_pos += 22
+        l_best_time = add_label("Best: --:--.---"); ac.setPosition(l_best_time, 10, y_pos); y_pos += 22
+        l_last_lap = add_label("Last: --:--.---"); ac.setPosition(l_last_lap, 10, y_pos); y_pos += 22
+        l_record_holder = add_label("Track Record: N/A"); ac.setPosition(l_record_holder, 10, y_pos); y_pos += 22
+        l_rank = add_label("Rank: N/A"); ac.setPosition(l_rank, 10, y_pos); y_pos += 22
+        l_sectors = add_label("Sectors: N/A"); ac.setPosition(l_sectors, 10, y_pos); y_pos += 22
+        l_theoretical = add_label("Theoretical: N/A"); ac.setPosition(l_theoretical, 10, y_pos); y_pos += 22
+        for i in range(RELATIVE_CARS):
+            label = add_label("Relative: N/A" if i == 0 else "")
+            ac.setPosition(label, 10, y_pos)
+            l_relatives.append(label)
+            y_pos += 22
+        y_pos += 8
+
+        records_title = add_label("Recent Records"); ac.setPosition(records_title, 10, y_pos); y_pos += 22
         for i in range(MAX_RECORDS_DISPLAY):
-            label = ac.addLabel(app_window, "")
+            label = add_label("")
             ac.setPosition(label, 15, y_pos)
             ac.setFontSize(label, 14)
             ac.setSize(label, 270, 20)
             l_recent_records.append(label)
             y_pos += 20
             
-        for label in [l_lapcount, l_current_time, l_best_time, l_last_lap, l_record_holder, l_relative, records_title]:
+        recent_records = tacs_ui.RecentRecords(label_model, l_recent_records)
+        v_lapcount = tacs_ui.ValueLabel(label_model, l_lapcount, lambda laps: "Laps: {}".format(laps))
+        v_current_time = tacs_ui.ValueLabel(label_model, l_current_time, lambda ms: "Current: {}".format(format_time(ms)))
+        v_delta = tacs_ui.ValueLabel(label_model, l_delta,
+                                     lambda cs: "Delta: N/A" if cs is None else "Delta: {:+.2f}".format(cs / 100.0))
+        v_last_lap = tacs_ui.ValueLabel(label_model, l_last_lap, lambda ms: "Last: {}".format(format_time(ms)))
+
+        for label in [l_lapcount, l_current_time, l_delta, l_best_time, l_last_lap, l_record_holder, l_rank, l_sectors, l_theoretical, records_title] + l_relatives:
             ac.setFontSize(label, 16)
             ac.setSize(label, 280, 22)
 
+        record_saver.start()
+        lap_poller = create_lap_poller()
+        create_sector_tracker()
+        if TELEMETRY_RECORDING:
+            start_telemetry_recording()
+        if LIVE_FEED:
+            start_live_feed()
+        setup_scheduler()
         initialize_session()
+        flush_labels()
+        if trace_recorder is not None and not RECORDS_BY_DRIVER:  # traces store car-keyed records only
+            track = app_state['full_track_name']
+            trace_recorder.records_snapshot(track, load_track_records(track))
         
         ac.log("TACS: App initialized successfully.")
         return "TACS"
@@ -271,126 +673,114 @@ def acMain(ac_version):
         ac.log("TACS FATAL ERROR in acMain: {}".format(traceback.format_exc()))
         return "TACS"
 
+def format_relative(car_id, arrow, sign, laps, seconds):
+    """One side of a relative row, e.g. 'ks_bmw_m3 ↑ -1.4' or 'ks_bmw_m3 ↓ +1L'."""
+    if laps:
+        gap = "{}{}L".format(sign, laps)
+    elif seconds is None:
+        gap = "--"
+    else:
+        gap = "{}{:.1f}".format(sign, abs(seconds))
+    return u"{} {} {}".format(identities.car(car_id), arrow, gap)
+
 def update_relative_display(focused_car_id):
-    """Calculates and updates the relative time gaps to cars ahead and behind."""
-    num_cars = ac.getCarsCount()
-    if num_cars < 2:
-        update_label_if_changed(l_relative, "")
+    """Shows the gaps to the RELATIVE_CARS cars ahead of and behind the focused car."""
+    if len(gap_engine.order) < 2:
+        for label in l_relatives:
+            update_label_if_changed(label, "")
         return
 
-    leaderboard = []
-    for i in range(num_cars):
-        pos = ac.getCarRealTimeLeaderboardPosition(i)
-        if pos >= 0:
-            leaderboard.append((pos, i))
-    
-    leaderboard.sort()
-    
-    my_leaderboard_index = -1
-    for i, (pos, car_id) in enumerate(leaderboard):
-        if car_id == focused_car_id:
-            my_leaderboard_index = i
-            break
-            
-    if my_leaderboard_index == -1:
-        update_label_if_changed(l_relative, "Relative: N/A")
+    ahead, behind = gap_engine.neighbours(focused_car_id, RELATIVE_CARS)
+    if ahead is None:
+        for row, label in enumerate(l_relatives):
+            update_label_if_changed(label, "Relative: N/A" if row == 0 else "")
         return
 
-    my_spline_pos = ac.getCarState(focused_car_id, acsys.CS.NormalizedSplinePosition)
-    my_speed = ac.getCarState(focused_car_id, acsys.CS.SpeedMS)
-    track_len = ac.getTrackLength(0)
-
-    ahead_text = ""
-    if my_leaderboard_index > 0:
-        ahead_car_id = leaderboard[my_leaderboard_index - 1][1]
-        ahead_spline_pos = ac.getCarState(ahead_car_id, acsys.CS.NormalizedSplinePosition)
-        gap = ahead_spline_pos - my_spline_pos
-        if gap < -0.5: gap += 1.0
-        time_gap = (gap * track_len) / (my_speed or 1)
-        # --- MODIFICATION START ---
-        car_name = ac.getCarName(ahead_car_id)
-        ahead_text = u"{} ↑ -{:.1f}".format(car_name, time_gap)
-        # --- MODIFICATION END ---
-
-    behind_text = ""
-    if my_leaderboard_index < len(leaderboard) - 1:
-        behind_car_id = leaderboard[my_leaderboard_index + 1][1]
-        behind_spline_pos = ac.getCarState(behind_car_id, acsys.CS.NormalizedSplinePosition)
-        car_behind_speed = ac.getCarState(behind_car_id, acsys.CS.SpeedMS)
-        gap = my_spline_pos - behind_spline_pos
-        if gap < -0.5: gap += 1.0
-        time_gap = (gap * track_len) / (car_behind_speed or 1)
-        # --- MODIFICATION START ---
-        car_name = ac.getCarName(behind_car_id)
-        behind_text = u"{} ↓ +{:.1f}".format(car_name, time_gap)
-        # --- MODIFICATION END ---
-        
-    final_text = "{}   {}".format(ahead_text, behind_text).strip()
-    update_label_if_changed(l_relative, final_text)
+    for row, label in enumerate(l_relatives):
+        ahead_text = ""
+        if row < len(ahead):
+            laps, seconds = gap_engine.gap(ahead[row], focused_car_id)
+            ahead_text = format_relative(ahead[row], u"↑", "-", laps, seconds)
+        behind_text = ""
+        if row < len(behind):
+            laps, seconds = gap_engine.gap(focused_car_id, behind[row])
+            behind_text = format_relative(behind[row], u"↓", "+", laps, seconds)
+        update_label_if_changed(label, "{}   {}".format(ahead_text, behind_text).strip())
 
 def acUpdate(deltaT):
     """Called by Assetto Corsa every frame. Hot path for performance."""
     global app_state
     
     try:
+        profiling = profiler.enabled
+        if profiling:
+            frame_start = profiler.start()
+
         now = time.time()
-        should_update_slow_ui = (now - app_state['last_ui_update']) >= UI_UPDATE_INTERVAL
+        if trace_recorder is not None:
+            trace_recorder.frame(now, deltaT)
+        profiler_hotkeys.poll()
 
         focused_car = ac.getFocusedCar()
         if focused_car < 0: return
+        app_state['focused_car'] = focused_car
 
         # --- Fast UI Updates ---
-        update_label_if_changed(l_current_time, "Current: {}".format(format_time(ac.getCarState(focused_car, acsys.CS.LapTime))))
-        update_label_if_changed(l_last_lap, "Last: {}".format(format_time(ac.getCarState(focused_car, acsys.CS.LastLap))))
+        lap_time = ac.getCarState(focused_car, acsys.CS.LapTime)
+        last_lap = ac.getCarState(focused_car, acsys.CS.LastLap)
+        v_current_time.update(lap_time)
+        v_last_lap.update(last_lap)
+        update_delta(focused_car, lap_time, last_lap)
+        if sector_graphics is not None and sector_graphics.currentSectorIndex != sector_tracker.sector_index:
+            on_sector_change()
         
         current_laps = ac.getCarState(focused_car, acsys.CS.LapCount)
         if current_laps > app_state['lap_count']:
             app_state['lap_count'] = current_laps
-        update_label_if_changed(l_lapcount, "Laps: {}".format(app_state['lap_count']))
-
-        # --- Check for new completed laps from ANY car (for records) ---
-        num_cars = ac.getCarsCount()
-        for car_id in range(num_cars):
-            car_last_lap = ac.getCarState(car_id, acsys.CS.LastLap)
-            if car_last_lap > 0 and car_last_lap != last_lap_times.get(car_id):
-                last_lap_times[car_id] = car_last_lap
-                check_and_update_record(app_state['full_track_name'], car_id, car_last_lap)
-
-        # --- Slow UI Updates (Record Holder, Best Lap, Relatives, etc.) ---
-        if should_update_slow_ui:
-            app_state['last_ui_update'] = now
-            
-            records = load_track_records(app_state['full_track_name'])
-
-            # Update Best Lap Display
-            session_best_lap = ac.getCarState(focused_car, acsys.CS.BestLap)
-            car_name = ac.getCarName(focused_car)
-            car_all_time_best = records.get(car_name, float('inf'))
-            
-            true_best = float('inf')
-            if session_best_lap > 0:
-                true_best = session_best_lap
-            if car_all_time_best < true_best:
-                true_best = car_all_time_best
-
-            if true_best != float('inf'):
-                update_label_if_changed(l_best_time, "Best: {}".format(format_time(true_best)))
-            else:
-                update_label_if_changed(l_best_time, "Best: N/A")
+        v_lapcount.update(app_state['lap_count'])
+        if profiling: profiler.lap(PROFILE_FAST_UI)
 
-            # Update Record Holder
-            best_time, best_car_name = get_current_track_record(records)
-            record_text = "Track Record: N/A"
-            if best_time != float('inf'):
-                record_text = "Track Record: {} by {}".format(format_time(best_time), best_car_name)
-            update_label_if_changed(l_record_holder, record_text)
+        # --- Scheduled work: lap scan, best lap, record holder, relatives, recent records ---
+        scheduler.run(now)
+        flush_labels()
 
-            # Update Relative Gaps
-            update_relative_display(focused_car)
+        if profiling:
+            profiler.add(PROFILE_FRAME, time.perf_counter() - frame_start)
 
     except Exception as e:
         ac.log("TACS Error in acUpdate: {}".format(traceback.format_exc()))
 
 def acShutdown():
     """Called by Assetto Corsa when the app is being shut down."""
-    ac.log("TACS: Shutting down.")
\ No newline at end of file
+    ac.log("TACS: Shutting down.")
+    try:
+        if feed_server is not None:
+            feed_server.stop()
+        saved = record_saver.stop()
+        if saved:
+            record_store.close()
+        if trace_recorder is not None:
+            # Closed after the saver's final drain, so the trace also covers those saves.
+            trace_recorder.close()
+            if saved:
+                record_saver.flush()  # The worker has stopped; the last chunk is written here
+                ac.log("TACS: Trace capture finished after {} frames".format(trace_recorder.frames))
+            else:
+                ac.log("TACS Warning: Trace capture stopped after {} frames, its last chunk was not written".format(
+                    trace_recorder.frames))
+        if telemetry_recorder is not None:
+            telemetry_recorder.stop()
+            telemetry_recorder.ring.close()
+            ac.log("TACS: Telemetry recorded {} samples at {:.0f} Hz ({} physics steps missed, {} torn copies, {} roster changes)".format(
+                telemetry_recorder.samples, telemetry_recorder.rate(), telemetry_recorder.missed,
+                telemetry_recorder.torn, telemetry_recorder.replans))
+        stats = record_saver.stats
+        ac.log("TACS: Saver received {} records, {} files and {} laps ({} coalesced, {} dropped wake-ups)".format(
+            stats['records'], stats['files'], stats['laps'], stats['coalesced'], stats['dropped_wakeups']))
+        ac.log("TACS: Saver made {} writes ({} errors), avg {:.2f} ms, max {:.2f} ms; {} items still queued".format(
+            stats['writes'], stats['errors'], record_saver.average_write_ms(), stats['max_write_ms'],
+            record_saver.queue_depth()))
+        if profiler.enabled:
+            dump_profile()
+    except Exception as e:
+        ac.log("TACS Error in acShutdown: {}".format(traceback.format_exc()))
@@ -0,0 +1,186 @@
+"""
+Headless benchmark of TrackAndCarStats' per-frame work.
+
+    python benchmarks/bench_acupdate.py [--cars 1 20 60] [--frames 10000] [--lap-ms 30000] [--fps 60]
+
+For each grid size the app is imported fresh against the stand-in ac/acsys
+modules from fake_ac.py, acMain is called, and acUpdate is driven once per
+simulated frame. The app's `time` module is swapped for the simulated clock,
+so slow-UI ticks fire at the same frame cadence as in game. Records are
+written under a throwaway directory.
+
+Reported per grid size: acUpdate latency (p50/p99/max), the average cost of
+check_and_update_record and update_relative_display calls, ac.* calls per
+frame, and the bytes allocated per frame (tracemalloc peak, measured in a
+separate pass so tracing does not skew the timings). With --profile the
+app's own section profiler is switched on and its table printed as well.
+"""
+import argparse
+import importlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import fake_ac
+
+
+class SimClock:
+    """Stands in for the `time` module inside the app, reporting simulated time."""
+
+    def __init__(self, session):
+        self.session = session
+
+    def time(self):
+        return self.session.now_ms / 1000.0
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class CallTimer:
+    """Wraps a module-level function of the app and accumulates its run time."""
+
+    def __init__(self, module, name):
+        self.calls = 0
+        self.total = 0.0
+        self._func = getattr(module, name)
+        setattr(module, name, self)
+
+    def __call__(self, *args):
+        start = time.perf_counter()
+        try:
+            return self._func(*args)
+        finally:
+            self.total += time.perf_counter() - start
+            self.calls += 1
+
+    def mean_us(self):
+        return self.total / self.calls * 1e6 if self.calls else 0.0
+
+
+def import_fresh_app(workdir):
+    """Imports a new copy of the app (and its helpers) with `workdir` as the AC root."""
+    for name in list(sys.modules):
+        if name == "TrackAndCarStats" or name.startswith("tacs_"):
+            del sys.modules[name]
+    os.chdir(workdir)
+    return importlib.import_module("TrackAndCarStats")
+
+
+def load_app(session, workdir):
+    """Imports a fresh copy of the app against a new FakeAc, with `workdir` as the AC root."""
+    fake = fake_ac.install(session)
+    app = import_fresh_app(workdir)
+    app.time = SimClock(session)
+    return app, fake
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_grid(num_cars, frames, lap_ms, fps, alloc_frames, profile=False):
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="tacs_bench_")
+    try:
+        session = fake_ac.SimulatedSession(num_cars, lap_ms=lap_ms)
+        app, fake = load_app(session, workdir)
+        app.acMain("bench")
+        app.profiler.enabled = profile
+        record_timer = CallTimer(app, "check_and_update_record")
+        relative_timer = CallTimer(app, "update_relative_display")
+
+        dt_ms = 1000.0 / fps
+        perf_counter = time.perf_counter
+        timings = []
+        fake.reset_calls()
+        for _ in range(frames):
+            session.step(dt_ms)
+            start = perf_counter()
+            app.acUpdate(dt_ms / 1000.0)
+            timings.append(perf_counter() - start)
+        ac_calls = fake.total_calls()
+        top_calls = fake.calls.most_common(3)
+
+        profile_lines = app.profiler.summary_lines() if profile else []
+        app.profiler.enabled = False
+
+        tracemalloc.start()
+        allocated = []
+        for _ in range(alloc_frames):
+            session.step(dt_ms)
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            app.acUpdate(dt_ms / 1000.0)
+            allocated.append(tracemalloc.get_traced_memory()[1] - baseline)
+        tracemalloc.stop()
+
+        app.acShutdown()
+        timings.sort()
+        allocated.sort()
+        return {
+            'cars': num_cars,
+            'frames': frames,
+            'p50_us': percentile(timings, 50) * 1e6,
+            'p99_us': percentile(timings, 99) * 1e6,
+            'max_us': timings[-1] * 1e6,
+            'record_us': record_timer.mean_us(),
+            'record_calls': record_timer.calls,
+            'relative_us': relative_timer.mean_us(),
+            'ac_calls_per_frame': ac_calls / float(frames),
+            'alloc_b_p50': percentile(allocated, 50),
+            'alloc_b_max': allocated[-1] if allocated else 0,
+            'errors': [message for message in fake.logs if "Error" in message],
+            'top_calls': top_calls,
+            'profile': profile_lines,
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cars", type=int, nargs="+", default=[1, 20, 60])
+    parser.add_argument("--frames", type=int, default=10000)
+    parser.add_argument("--alloc-frames", type=int, default=1000)
+    parser.add_argument("--lap-ms", type=int, default=30000)
+    parser.add_argument("--fps", type=float, default=60.0)
+    parser.add_argument("--profile", action="store_true", help="also print the app's section profile")
+    args = parser.parse_args(argv)
+
+    header = "{:>5} {:>7} {:>9} {:>9} {:>9} {:>11} {:>9} {:>11} {:>10} {:>12}".format(
+        "cars", "frames", "p50 us", "p99 us", "max us", "record us", "laps", "relative us",
+        "ac/frame", "alloc B p50")
+    print(header)
+    print("-" * len(header))
+    results = []
+    for num_cars in args.cars:
+        result = run_grid(num_cars, args.frames, args.lap_ms, args.fps, args.alloc_frames, args.profile)
+        results.append(result)
+        print("{cars:>5} {frames:>7} {p50_us:>9.1f} {p99_us:>9.1f} {max_us:>9.1f} {record_us:>11.1f} "
+              "{record_calls:>9} {relative_us:>11.1f} {ac_calls_per_frame:>10.1f} {alloc_b_p50:>12}".format(**result))
+
+    for result in results:
+        top = ", ".join("{} x{}".format(name, count) for name, count in result['top_calls'])
+        print("{:>3} cars, busiest ac calls: {}".format(result['cars'], top))
+        for line in result['profile']:
+            print("  " + line)
+        for message in result['errors']:
+            print("  app logged: {}".format(message.splitlines()[0]))
+    return 1 if any(result['errors'] for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
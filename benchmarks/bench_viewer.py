@@ -0,0 +1,218 @@
+"""
+Benchmark of viewer.py against synthetic records archives.
+
+    python benchmarks/bench_viewer.py [--files 10 1000 10000] [--rows-per-file 100] [--tk]
+
+For each archive size a records directory of `files` track CSVs with
+`rows-per-file` cars each is generated (a quarter under legacy rt_ names), and
+the viewer is built on it. Without --tk the viewer runs against the model-only
+widgets in fake_tk.py, which measures the viewer's own work; with --tk it uses
+a real, withdrawn Tk root (needs a display) and includes Tk's cost.
+
+Reported per archive size, in milliseconds:
+- load: a cold load with no index cache, a warm load from the cache, and a
+  load from records.db holding the same records
+- sort: the first sort by each column (builds its order), then a re-sort
+  (flips the direction)
+- filter: selecting one track
+- search: a substring search, and the mean of one type-ahead keystroke
+- populate: refreshing the visible rows at a random scroll position
+- aggregates: recomputing every track's ranks and the per-car totals, as a
+  load does, then the slowest switch to the Ranks or Cars tab
+- peak MB: the viewer process's Python heap during a cold load (tracemalloc,
+  in a separate pass). Process-pool workers are not included.
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+
+import fake_tk
+import tacs_storage
+import viewer
+
+CAR_NAMES = 2000  # Distinct car names the generated records draw from
+
+
+def generate_records(records_dir, files, rows_per_file, seed=1):
+    """Writes `files` track CSVs of `rows_per_file` records each; returns the number of rows."""
+    rng = random.Random(seed)
+    os.makedirs(records_dir)
+    cars = ["ks_car_{:04d}".format(index) for index in range(CAR_NAMES)]
+    rows_per_file = min(rows_per_file, CAR_NAMES)
+    for index in range(files):
+        prefix = tacs_storage.LEGACY_PREFIX if index % 4 == 0 else ""
+        path = os.path.join(records_dir, "{}track_{:05d}_layout.csv".format(prefix, index))
+        times = sorted(rng.randint(60000, 480000) for _ in range(rows_per_file))
+        lines = ["CarName,Time_ms"]
+        lines.extend("{},{}".format(car, time_ms) for car, time_ms in zip(rng.sample(cars, rows_per_file), times))
+        with open(path, 'w', newline='') as f:
+            f.write("\n".join(lines) + "\n")
+    return files * rows_per_file
+
+
+def build_database(csv_dir, db_dir):
+    store = tacs_storage.SqliteRecordStore(db_dir)
+    try:
+        store.import_csv(csv_dir)
+    finally:
+        store.close()
+
+
+class Harness:
+    """Builds viewers and runs their event loop, on fake widgets or a real Tk root."""
+
+    def __init__(self, use_tk):
+        self.use_tk = use_tk
+        self.root = None
+        if not use_tk:
+            fake_tk.install(viewer)
+
+    def new_root(self):
+        if self.root is not None and self.use_tk:
+            self.root.destroy()
+        if self.use_tk:
+            import tkinter
+            self.root = tkinter.Tk()
+            self.root.withdraw()
+        else:
+            self.root = fake_tk.FakeRoot()
+        return self.root
+
+    def settle(self, app=None):
+        """Runs pending callbacks until the viewer has finished loading."""
+        while True:
+            if self.use_tk:
+                self.root.update()
+            else:
+                self.root.run_pending()
+            if app is None or not app.loading:
+                return
+            time.sleep(0.001)
+
+    def load(self, records_dir, cache_file):
+        """Builds a viewer on records_dir and waits for it to finish loading; returns (viewer, ms)."""
+        root = self.new_root()
+        start = time.perf_counter()
+        app = viewer.TrackAndCarStatsViewer(root, records_dir=records_dir, cache_file=cache_file)
+        self.settle(app)
+        return app, (time.perf_counter() - start) * 1000.0
+
+
+def timed_ms(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000.0
+
+
+def run_size(harness, files, rows_per_file, rng):
+    workdir = tempfile.mkdtemp(prefix="tacs_viewer_bench_")
+    try:
+        records_dir = os.path.join(workdir, "records")
+        db_dir = os.path.join(workdir, "db")
+        cache_file = os.path.join(workdir, viewer.CACHE_FILE)
+        rows = generate_records(records_dir, files, rows_per_file)
+        build_database(records_dir, db_dir)
+
+        _, cold_ms = harness.load(records_dir, cache_file)
+        app, warm_ms = harness.load(records_dir, cache_file)
+        _, db_ms = harness.load(db_dir, cache_file)
+
+        sort_ms = []
+        resort_ms = []
+        for key in ("time_ms", "car", "track"):
+            sort_ms.append(timed_ms(app.sort_records, key))
+            resort_ms.append(timed_ms(app.sort_records, key))
+
+        app.track_var.set(rng.choice(sorted(app.table.track_names)))
+        filter_ms = timed_ms(app.filter_records)
+        app.track_var.set("All Tracks")
+        app.filter_records()
+
+        app.search_var.set("car_01")
+        search_ms = timed_ms(app.run_search)
+        typed = "ks_car_0123"
+        keystrokes = []
+        for length in range(1, len(typed) + 1):
+            app.search_var.set(typed[:length])
+            keystrokes.append(timed_ms(app.run_search))
+        app.search_var.set("")
+        app.run_search()
+
+        populate_ms = []
+        for _ in range(50):
+            populate_ms.append(timed_ms(app.views['records'].scroll_rows, "moveto", str(rng.random())))
+
+        app.table.dirty_tracks = set(app.table.track_names)
+        aggregates_ms = timed_ms(viewer.RecordAggregates(app.table).refresh)
+        tab_ms = []
+        for name in ("ranks", "cars", "ranks", "cars"):
+            app.notebook.select(app.tabs[name])
+            tab_ms.append(timed_ms(app.filter_records))
+        app.notebook.select(app.tabs['records'])
+
+        os.remove(cache_file)
+        tracemalloc.start()
+        harness.load(records_dir, cache_file)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        return {
+            'files': files,
+            'rows': rows,
+            'loaded': len(app.table),
+            'cold_ms': cold_ms,
+            'warm_ms': warm_ms,
+            'db_ms': db_ms,
+            'sort_ms': max(sort_ms),
+            'resort_ms': max(resort_ms),
+            'filter_ms': filter_ms,
+            'search_ms': search_ms,
+            'key_ms': sum(keystrokes) / len(keystrokes),
+            'populate_ms': sum(populate_ms) / len(populate_ms),
+            'aggregates_ms': aggregates_ms,
+            'tab_ms': max(tab_ms),
+            'peak_mb': peak / (1024.0 * 1024.0),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--files", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--rows-per-file", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tk", action="store_true", help="use a real Tk root instead of the model-only widgets")
+    args = parser.parse_args(argv)
+
+    harness = Harness(args.tk)
+    rng = random.Random(args.seed)
+    header = "{:>6} {:>8} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9} {:>9} {:>8}".format(
+        "files", "rows", "cold ms", "warm ms", "db ms", "sort ms", "resort ms", "filter ms",
+        "search ms", "key ms", "populate", "aggr ms", "tab ms", "peak MB")
+    print(header)
+    print("-" * len(header))
+    failed = False
+    for files in args.files:
+        result = run_size(harness, files, args.rows_per_file, rng)
+        print("{files:>6} {rows:>8} {cold_ms:>9.1f} {warm_ms:>9.1f} {db_ms:>9.1f} {sort_ms:>9.1f} {resort_ms:>9.1f} "
+              "{filter_ms:>9.2f} {search_ms:>9.2f} {key_ms:>9.2f} {populate_ms:>9.3f} {aggregates_ms:>9.1f} {tab_ms:>9.1f} "
+              "{peak_mb:>8.1f}".format(**result))
+        if result['loaded'] != result['rows']:
+            print("  viewer loaded {} of {} rows".format(result['loaded'], result['rows']))
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
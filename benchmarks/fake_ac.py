@@ -0,0 +1,254 @@
+"""
+Stand-in `ac` and `acsys` modules for running TrackAndCarStats outside the game.
+
+`SimulatedSession` drives N cars around a track on a simulated clock, and
+`FakeAc` answers the ac API from it while counting every call. `install()`
+puts both into sys.modules so `import ac` / `import acsys` pick them up.
+"""
+import random
+import sys
+import types
+from collections import Counter
+
+
+class CS:
+    """The acsys.CS members the app reads."""
+    LapTime = 0
+    LastLap = 1
+    BestLap = 2
+    LapCount = 3
+    NormalizedSplinePosition = 4
+    SpeedMS = 5
+    SpeedKMH = 6
+    DriveTrainSpeed = 7
+
+
+class SimulatedCar:
+    def __init__(self, car_id, name, driver, base_lap_ms, rng):
+        self.car_id = car_id
+        self.name = name
+        self.driver = driver
+        self.base_lap_ms = base_lap_ms
+        self.rng = rng
+        self.lap_count = 0
+        self.lap_start_ms = 0.0
+        self.last_lap_ms = 0
+        self.best_lap_ms = 0
+        self.current_lap_target_ms = self._next_lap_target()
+        self.spline = 0.0
+
+    def _next_lap_target(self):
+        return self.base_lap_ms * self.rng.uniform(0.99, 1.03)
+
+    def advance(self, now_ms):
+        elapsed = now_ms - self.lap_start_ms
+        while elapsed >= self.current_lap_target_ms:
+            lap_ms = int(self.current_lap_target_ms)
+            self.lap_count += 1
+            self.last_lap_ms = lap_ms
+            if not self.best_lap_ms or lap_ms < self.best_lap_ms:
+                self.best_lap_ms = lap_ms
+            self.lap_start_ms += self.current_lap_target_ms
+            self.current_lap_target_ms = self._next_lap_target()
+            elapsed = now_ms - self.lap_start_ms
+        self.spline = elapsed / self.current_lap_target_ms
+
+    def progress(self):
+        return self.lap_count + self.spline
+
+
+class SimulatedSession:
+    """N cars lapping a track of `track_length_m` at roughly `lap_ms` per lap."""
+
+    def __init__(self, num_cars, lap_ms=90000, lap_spread=0.05, track_length_m=5000.0,
+                 track="bench_track", layout="", focused_car=0, seed=1):
+        rng = random.Random(seed)
+        self.track = track
+        self.layout = layout
+        self.track_length_m = track_length_m
+        self.focused_car = focused_car
+        self.now_ms = 0.0
+        self.cars = []
+        for car_id in range(num_cars):
+            base = lap_ms * (1.0 + lap_spread * car_id / max(1, num_cars - 1))
+            self.cars.append(SimulatedCar(car_id, "bench_car_{:02d}".format(car_id),
+                                          "Driver {}".format(car_id), base, rng))
+        self._positions = list(range(num_cars))
+
+    def step(self, dt_ms):
+        self.now_ms += dt_ms
+        for car in self.cars:
+            car.advance(self.now_ms)
+        order = sorted(self.cars, key=lambda c: -c.progress())
+        for position, car in enumerate(order):
+            self._positions[car.car_id] = position
+
+    def position_of(self, car_id):
+        return self._positions[car_id]
+
+
+def _counted(func):
+    name = func.__name__
+
+    def wrapper(self, *args):
+        self.calls[name] += 1
+        return func(self, *args)
+    wrapper.__name__ = name
+    return wrapper
+
+
+class FakeAc(types.ModuleType):
+    """Module object answering the ac API from a SimulatedSession."""
+
+    def __init__(self, session, echo_log=False):
+        types.ModuleType.__init__(self, "ac")
+        self.session = session
+        self.echo_log = echo_log
+        self.calls = Counter()
+        self.logs = []
+        self.texts = {}
+        self._next_control = 0
+
+    def total_calls(self):
+        return sum(self.calls.values())
+
+    def reset_calls(self):
+        self.calls.clear()
+
+    def _new_control(self, text=""):
+        self._next_control += 1
+        self.texts[self._next_control] = text
+        return self._next_control
+
+    # --- Logging ---
+    @_counted
+    def log(self, message):
+        self.logs.append(message)
+        if self.echo_log:
+            print(message)
+
+    @_counted
+    def console(self, message):
+        pass
+
+    # --- Window and controls ---
+    @_counted
+    def newApp(self, name):
+        return self._new_control()
+
+    @_counted
+    def addLabel(self, window, text):
+        return self._new_control(text)
+
+    @_counted
+    def addButton(self, window, text):
+        return self._new_control(text)
+
+    @_counted
+    def setText(self, control, text):
+        self.texts[control] = text
+
+    @_counted
+    def getText(self, control):
+        return self.texts.get(control, "")
+
+    @_counted
+    def setSize(self, control, width, height):
+        pass
+
+    @_counted
+    def setTitle(self, control, title):
+        pass
+
+    @_counted
+    def drawBorder(self, control, draw):
+        pass
+
+    @_counted
+    def setBackgroundOpacity(self, control, opacity):
+        pass
+
+    @_counted
+    def setPosition(self, control, x, y):
+        pass
+
+    @_counted
+    def setFontSize(self, control, size):
+        pass
+
+    @_counted
+    def setVisible(self, control, visible):
+        pass
+
+    @_counted
+    def addOnClickedListener(self, control, callback):
+        pass
+
+    # --- Session ---
+    @_counted
+    def getTrackName(self, car_id):
+        return self.session.track
+
+    @_counted
+    def getTrackConfiguration(self, car_id):
+        return self.session.layout
+
+    @_counted
+    def getTrackLength(self, car_id):
+        return self.session.track_length_m
+
+    @_counted
+    def getCarsCount(self):
+        return len(self.session.cars)
+
+    @_counted
+    def getFocusedCar(self):
+        return self.session.focused_car
+
+    @_counted
+    def isConnected(self, car_id):
+        return 0 <= car_id < len(self.session.cars)
+
+    @_counted
+    def getCarName(self, car_id):
+        return self.session.cars[car_id].name
+
+    @_counted
+    def getDriverName(self, car_id):
+        return self.session.cars[car_id].driver
+
+    @_counted
+    def getCarSkin(self, car_id):
+        return "default"
+
+    @_counted
+    def getCarRealTimeLeaderboardPosition(self, car_id):
+        return self.session.position_of(car_id)
+
+    @_counted
+    def getCarState(self, car_id, state):
+        car = self.session.cars[car_id]
+        if state == CS.LapTime:
+            return int(self.session.now_ms - car.lap_start_ms)
+        if state == CS.LastLap:
+            return car.last_lap_ms
+        if state == CS.BestLap:
+            return car.best_lap_ms
+        if state == CS.LapCount:
+            return car.lap_count
+        if state == CS.NormalizedSplinePosition:
+            return car.spline
+        if state in (CS.SpeedMS, CS.SpeedKMH):
+            speed_ms = self.session.track_length_m / (car.current_lap_target_ms / 1000.0)
+            return speed_ms if state == CS.SpeedMS else speed_ms * 3.6
+        return 0
+
+
+def install(session, echo_log=False):
+    """Installs stand-in ac/acsys modules for `session`; returns the FakeAc."""
+    fake_ac = FakeAc(session, echo_log)
+    fake_acsys = types.ModuleType("acsys")
+    fake_acsys.CS = CS
+    sys.modules["ac"] = fake_ac
+    sys.modules["acsys"] = fake_acsys
+    return fake_ac
@@ -0,0 +1,176 @@
+"""
+Model-only stand-ins for the tkinter widgets viewer.py uses.
+
+Widgets keep the state the viewer writes into them (variables, combobox
+values, Treeview items and their values) and do nothing else, so the viewer
+can be driven without a display. `FakeRoot.after()` queues callbacks, which
+`run_pending()` calls in order. `install(viewer)` swaps the viewer module's
+`tk`, `ttk` and `messagebox` for these.
+"""
+import types
+from collections import Counter
+
+_CONSTANTS = dict(W="w", E="e", N="n", S="s", LEFT="left", RIGHT="right", X="x", Y="y", BOTH="both",
+                  VERTICAL="vertical", HORIZONTAL="horizontal", END="end")
+
+
+class Variable:
+    def __init__(self, value=None, **kwargs):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+
+class Widget:
+    """Accepts and ignores layout, binding and configuration calls."""
+
+    def __init__(self, *args, **kwargs):
+        self._options = dict(kwargs)
+
+    def __getitem__(self, key):
+        return self._options.get(key)
+
+    def __setitem__(self, key, value):
+        self._options[key] = value
+
+    def _ignore(self, *args, **kwargs):
+        pass
+
+    grid = pack = bind = configure = columnconfigure = rowconfigure = set = _ignore
+
+
+class Treeview(Widget):
+    """Keeps items, their values and which are attached; counts the calls that change them."""
+
+    def __init__(self, *args, **kwargs):
+        Widget.__init__(self, *args, **kwargs)
+        self.values = {}
+        self.attached = []
+        self.calls = Counter()
+        self._next_id = 0
+
+    def insert(self, parent, index, values=()):
+        self.calls['insert'] += 1
+        self._next_id += 1
+        item = "I{:05d}".format(self._next_id)
+        self.values[item] = tuple(values)
+        self.attached.append(item)
+        return item
+
+    def delete(self, *items):
+        self.calls['delete'] += 1
+        for item in items:
+            self.values.pop(item, None)
+            self.detach(item)
+
+    def item(self, item, values=None):
+        self.calls['item'] += 1
+        if values is not None:
+            self.values[item] = tuple(values)
+        return {'values': self.values[item]}
+
+    def identify_row(self, y):
+        """The attached item at y, taking rows to be the viewer's ROW_HEIGHT (25 pixels) from the top."""
+        slot = int(y) // 25
+        return self.attached[slot] if 0 <= slot < len(self.attached) else ""
+
+    def move(self, item, parent, index):
+        self.calls['move'] += 1
+        if item in self.attached:
+            self.attached.remove(item)
+        self.attached.insert(index, item)
+
+    def detach(self, *items):
+        self.calls['detach'] += 1
+        for item in items:
+            if item in self.attached:
+                self.attached.remove(item)
+
+    def heading(self, column, **kwargs):
+        self.calls['heading'] += 1
+
+    def column(self, column, **kwargs):
+        pass
+
+    def shown(self):
+        """Values of the attached items, top to bottom."""
+        return [self.values[item] for item in self.attached]
+
+
+class Notebook(Widget):
+    """Keeps its tabs and which one is selected."""
+
+    def __init__(self, *args, **kwargs):
+        Widget.__init__(self, *args, **kwargs)
+        self.tab_list = []
+        self.current = None
+
+    def add(self, child, **kwargs):
+        self.tab_list.append(child)
+        if self.current is None:
+            self.current = child
+
+    def select(self, tab=None):
+        if tab is None:
+            return str(self.current) if self.current is not None else ""
+        self.current = tab
+
+    def tabs(self):
+        return tuple(str(tab) for tab in self.tab_list)
+
+
+class FakeRoot(Widget):
+    def __init__(self):
+        Widget.__init__(self)
+        self.pending = []
+        self._job = 0
+
+    def after(self, ms, callback, *args):
+        self._job += 1
+        self.pending.append((self._job, callback, args))
+        return self._job
+
+    def after_cancel(self, job):
+        self.pending = [entry for entry in self.pending if entry[0] != job]
+
+    def run_pending(self):
+        """Calls the callbacks queued so far (not the ones they queue); returns how many ran."""
+        pending, self.pending = self.pending, []
+        for _, callback, args in pending:
+            callback(*args)
+        return len(pending)
+
+    def title(self, *args):
+        pass
+
+    geometry = protocol = destroy = update = Widget._ignore
+
+
+class MessageBox:
+    def __init__(self):
+        self.shown = []
+
+    def _show(self, title, message):
+        self.shown.append((title, message))
+
+    showwarning = showerror = showinfo = _show
+
+
+def install(viewer):
+    """Points the viewer module at these stand-ins; returns its MessageBox."""
+    tk = types.ModuleType("fake_tk.tk")
+    tk.StringVar = tk.BooleanVar = tk.IntVar = Variable
+    tk.Tk = FakeRoot
+    for name, value in _CONSTANTS.items():
+        setattr(tk, name, value)
+    ttk = types.ModuleType("fake_tk.ttk")
+    ttk.Frame = ttk.Label = ttk.Combobox = ttk.Entry = ttk.Checkbutton = ttk.Scrollbar = ttk.Style = Widget
+    ttk.Treeview = Treeview
+    ttk.Notebook = Notebook
+    messagebox = MessageBox()
+    viewer.tk, viewer.ttk, viewer.messagebox = tk, ttk, messagebox
+    return messagebox
@@ -0,0 +1,114 @@
+"""
+Deterministic offline replay of a trace captured in game with TRACE_CAPTURE.
+
+    python benchmarks/replay_trace.py traces/session_20260101_200000.tacstrace [--repeat 3]
+
+The app is imported fresh with a ReplayAc standing in for `ac`, an acsys whose
+CS values are the ones recorded in the trace, the app's clock (and the frame
+scheduler's, so the frame budget never defers a task) pinned to each frame's
+recorded time, and a throwaway records directory seeded with the
+records the session started with. acMain, every acUpdate and acShutdown are
+then driven exactly as in game.
+
+Reported: acUpdate latency (p50/p99/max), replay speed against the captured
+session length, and whether the console messages (PBs and track records)
+match the ones announced during capture. Exits 1 on a mismatch.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+from bench_acupdate import import_fresh_app, percentile
+import fake_ac
+
+import tacs_storage
+import tacs_trace
+
+
+class ReplayClock:
+    """Stands in for the `time` module inside the app, reporting the current frame's time."""
+
+    def __init__(self, replay):
+        self.replay = replay
+
+    def time(self):
+        return self.replay.now
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+def replay_once(trace_file):
+    cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix="tacs_replay_")
+    try:
+        replay = tacs_trace.TraceReplay(trace_file)
+        store = tacs_storage.CsvRecordStore(os.path.join(workdir, "apps/python/TrackAndCarStats/records"))
+        for track, records in replay.initial_records.items():
+            store.write(track, records)
+
+        replay_ac = tacs_trace.ReplayAc(replay, fake_ac.FakeAc(session=None))
+        acsys = types.ModuleType("acsys")
+        acsys.CS = type("CS", (), dict(replay.cs))
+        sys.modules["ac"] = replay_ac
+        sys.modules["acsys"] = acsys
+
+        app = import_fresh_app(workdir)
+        app.time = ReplayClock(replay)
+        # Real task costs would make budget deferrals, and so the output, vary from run to run.
+        app.scheduler.clock = lambda: replay.now
+        app.acMain("replay")
+
+        perf_counter = time.perf_counter
+        timings = []
+        while replay.next_frame():
+            start = perf_counter()
+            app.acUpdate(replay.delta_t)
+            timings.append(perf_counter() - start)
+        app.acShutdown()
+
+        timings.sort()
+        return {
+            'frames': len(timings),
+            'session_s': replay.now - replay.start_time,
+            'replay_s': sum(timings),
+            'p50_us': percentile(timings, 50) * 1e6,
+            'p99_us': percentile(timings, 99) * 1e6,
+            'max_us': timings[-1] * 1e6 if timings else 0.0,
+            'expected': [text for _, text in replay.messages],
+            'actual': [text for _, text in replay_ac.messages],
+        }
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("trace")
+    parser.add_argument("--repeat", type=int, default=1)
+    args = parser.parse_args(argv)
+    trace_file = os.path.abspath(args.trace)
+
+    status = 0
+    for run in range(args.repeat):
+        result = replay_once(trace_file)
+        print("run {}: {frames} frames ({session_s:.0f} s of session) replayed in {replay_s:.2f} s, "
+              "acUpdate p50 {p50_us:.1f} us, p99 {p99_us:.1f} us, max {max_us:.1f} us".format(run + 1, **result))
+        if sorted(result['expected']) == sorted(result['actual']):
+            print("  {} announcements match the capture".format(len(result['expected'])))
+            continue
+        status = 1
+        for text in sorted(set(result['expected']) - set(result['actual'])):
+            print("  missing in replay: {}".format(text))
+        for text in sorted(set(result['actual']) - set(result['expected'])):
+            print("  only in replay:    {}".format(text))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""
+Live delta against a reference lap indexed by track position.
+
+A lap is stored as the elapsed time (ms) at which the car passed each of
+`bins` evenly spaced NormalizedSplinePosition points. During a lap the delta
+is the current lap time minus the reference time at the same position, found
+by direct index plus linear interpolation between two bins: no search and no
+per-frame allocation beyond the numbers themselves.
+
+The lap in progress is written into a second preallocated array of the same
+size; when it completes cleanly and beats the reference, the two arrays swap
+roles.
+
+A lap ends when LapTime resets. At the line the spline usually wraps a few
+frames before or after that, so a lap counts as clean if the reset came
+within `_START_TOLERANCE` of the line on either side, and a wrap from the end
+of the lap to its start is never taken for going backwards. When the timer
+resets before the wrap, binning waits for the wrap.
+"""
+import struct
+from array import array
+
+REFERENCE_BINS = 4096
+
+_HEADER = struct.Struct("<8sii")  # magic, bins, lap_ms
+_MAGIC = b"TACSREF1"
+
+# A lap only counts if it started this close to the line (as a fraction of the lap)...
+_START_TOLERANCE = 0.02
+# ...and never jumped forward by more than this fraction between two frames.
+_MAX_GAP = 0.05
+
+
+class ReferenceLap(object):
+    """Elapsed ms at `bins` spline positions for one lap, plus that lap's time."""
+
+    def __init__(self, bins=REFERENCE_BINS):
+        self.bins = bins
+        self.times = array('i', [0]) * bins
+        self.lap_ms = 0  # 0 = no reference yet
+
+    def to_bytes(self):
+        return _HEADER.pack(_MAGIC, self.bins, self.lap_ms) + self.times.tobytes()
+
+    def load(self, path):
+        """Reads a reference saved with to_bytes(); returns False if the file is missing or unusable."""
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except (IOError, OSError):
+            return False
+        return self.from_bytes(data)
+
+    def from_bytes(self, data):
+        """Takes over a reference saved with to_bytes(); returns False if the data is unusable."""
+        if not data or len(data) < _HEADER.size:
+            return False
+        magic, bins, lap_ms = _HEADER.unpack_from(data)
+        if magic != _MAGIC or bins != self.bins or len(data) != _HEADER.size + 4 * bins:
+            return False
+        self.times = array('i')
+        self.times.frombytes(data[_HEADER.size:])
+        self.lap_ms = lap_ms
+        return True
+
+    def clear(self):
+        self.lap_ms = 0
+
+    def time_at(self, spline):
+        """Interpolated reference time (ms) at a spline position in [0, 1)."""
+        position = spline * self.bins
+        index = int(position)
+        if index >= self.bins - 1:
+            lower = self.times[self.bins - 1]
+            upper = self.lap_ms
+            fraction = position - (self.bins - 1)
+        elif index < 0:
+            return 0.0
+        else:
+            lower = self.times[index]
+            upper = self.times[index + 1]
+            fraction = position - index
+        return lower + (upper - lower) * fraction
+
+
+class DeltaTracker(object):
+    """Records the focused car's laps into bins and reports the live delta to a ReferenceLap."""
+
+    def __init__(self, bins=REFERENCE_BINS):
+        self.bins = bins
+        self.reference = ReferenceLap(bins)
+        self._current = array('i', [0]) * bins
+        self.reset()
+
+    def reset(self):
+        """Forgets the lap in progress (car change, teleport to pits, new session)."""
+        self._last_bin = -1
+        self._last_time = 0
+        self._last_spline = -1.0
+        self._clean = False
+        self._before_line = False  # LapTime reset but the spline has not wrapped yet
+
+    def update(self, spline, lap_time_ms, last_lap_ms):
+        """
+        Feeds one frame; returns the completed lap's time if it just became the new reference.
+
+        `last_lap_ms` is only read on the frame a lap ends.
+        """
+        improved = 0
+        if lap_time_ms < self._last_time:
+            # LapTime reset: the lap is over, whichever side of the line the spline is on this frame.
+            improved = self._finish_lap(last_lap_ms)
+            self._last_bin = -1
+            self._last_time = 0
+            self._before_line = spline >= 1.0 - _START_TOLERANCE
+            self._clean = self._before_line or spline <= _START_TOLERANCE
+        elif self._last_spline >= 0.0:
+            if self._last_spline >= 1.0 - _START_TOLERANCE and spline <= _START_TOLERANCE:
+                # Crossed the line, before or after the timer reset.
+                self._before_line = False
+            elif spline < self._last_spline or spline - self._last_spline > _MAX_GAP:
+                # Went backwards or skipped ahead (reset to pits, cut, replay jump): not a reference lap.
+                self._clean = False
+
+        if self._before_line:
+            self._last_time = lap_time_ms
+            self._last_spline = spline
+            return improved
+
+        index = int(spline * self.bins)
+        if index >= self.bins:
+            index = self.bins - 1
+        if index > self._last_bin:
+            current = self._current
+            start = self._last_bin + 1
+            if start < index:
+                # Fill the bins passed since the last frame by interpolating between the two samples.
+                span = index - self._last_bin
+                step = (lap_time_ms - self._last_time) / float(span)
+                base = self._last_time
+                for offset, i in enumerate(range(start, index), 1):
+                    current[i] = int(base + step * offset)
+            current[index] = lap_time_ms
+            self._last_bin = index
+
+        self._last_time = lap_time_ms
+        self._last_spline = spline
+        return improved
+
+    def _finish_lap(self, last_lap_ms):
+        # LastLap can still hold the previous lap for a frame; the last elapsed time is then within a frame of it.
+        lap_ms = last_lap_ms if abs(last_lap_ms - self._last_time) < 1000 else self._last_time
+        if not self._clean or self._last_bin < self.bins - 1 - int(_MAX_GAP * self.bins):
+            return 0
+        reference = self.reference
+        if reference.lap_ms and lap_ms >= reference.lap_ms:
+            return 0
+        current = self._current
+        for i in range(self._last_bin + 1, self.bins):
+            current[i] = self._last_time
+        self._current, reference.times = reference.times, current
+        reference.lap_ms = lap_ms
+        return lap_ms
+
+    def delta_ms(self, spline, lap_time_ms):
+        """Current lap time minus the reference at the same position, or None without a reference."""
+        if not self.reference.lap_ms:
+            return None
+        return lap_time_ms - self.reference.time_at(spline)
@@ -0,0 +1,174 @@
+"""
+Live-timing feed for overlays and pit-wall screens, served on localhost.
+
+    GET /state    the latest snapshot as one JSON object
+    GET /events   Server-Sent Events: one `state` event with the full
+                  snapshot, then a `delta` event holding only the keys that
+                  changed, for every change
+
+The frame thread calls `LiveFeed.publish()` with a snapshot dict of plain,
+never-mutated values at most once per tick; that stores a reference and sets
+an event. A broadcaster thread diffs it against the previous snapshot,
+encodes the delta once and appends it to a short event log, which every
+client thread streams from. Subscribers therefore add no work to the frame.
+
+A client that falls more than `history` events behind gets a fresh `state`
+event instead of the deltas it missed. Runs on the standard library only
+(http.server with a thread per client), so it works on AC's Python 3.3.
+"""
+import json
+import threading
+from collections import deque
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+HEARTBEAT_S = 15.0  # An idle /events stream sends a comment this often, so proxies and clients keep it open
+
+_MISSING = object()
+
+
+def _event(kind, seq, data):
+    return "id: {}\nevent: {}\ndata: {}\n\n".format(seq, kind, json.dumps(data, sort_keys=True)).encode('utf-8')
+
+
+class LiveFeed(object):
+    """The latest published snapshot plus a bounded log of the deltas between snapshots."""
+
+    def __init__(self, history=64):
+        self.seq = 0             # number of deltas broadcast so far
+        self.closed = False
+        self._state = {}         # last broadcast snapshot
+        self._events = deque(maxlen=history)  # [(seq, encoded delta event)]
+        self._changed = threading.Condition()
+        self._pending = None     # newest snapshot from publish(), not yet diffed
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="TACS-Feed")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def publish(self, snapshot):
+        """Hands over the frame's snapshot; the dict and its values must not be changed afterwards."""
+        self._pending = snapshot
+        self._wake.set()
+
+    def close(self):
+        with self._changed:
+            self.closed = True
+            self._changed.notify_all()
+        self._wake.set()
+
+    def state(self):
+        """(seq, snapshot) of the last broadcast."""
+        with self._changed:
+            return self.seq, self._state
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            if self.closed:
+                return
+            snapshot = self._pending
+            if snapshot is None:
+                continue
+            self.broadcast(snapshot)
+
+    def broadcast(self, snapshot):
+        """Appends the delta from the last snapshot, if any, and wakes the clients."""
+        state = self._state
+        delta = dict((key, value) for key, value in snapshot.items() if state.get(key, _MISSING) != value)
+        if not delta:
+            return
+        with self._changed:
+            self.seq += 1
+            self._state = snapshot
+            self._events.append((self.seq, _event('delta', self.seq, delta)))
+            self._changed.notify_all()
+
+    def stream(self, write, heartbeat=HEARTBEAT_S):
+        """Writes the SSE stream of one client through write(bytes) until the feed closes or write fails."""
+        seq, state = self.state()
+        write(_event('state', seq, state))
+        changed = self._changed
+        while True:
+            with changed:
+                if self.seq == seq and not self.closed:
+                    changed.wait(heartbeat)
+                if self.closed:
+                    return
+                if self.seq == seq:
+                    data = b": keepalive\n\n"
+                elif not self._events or self._events[0][0] > seq + 1:
+                    # Missed deltas already dropped from the log: start over from the full state.
+                    data = _event('state', self.seq, self._state)
+                else:
+                    data = b"".join(event for event_seq, event in self._events if event_seq > seq)
+                seq = self.seq
+            write(data)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    feed = None  # set per server by FeedServer
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path == '/state':
+            _, state = self.feed.state()
+            body = json.dumps(state, sort_keys=True).encode('utf-8')
+            self._headers(200, 'application/json', len(body))
+            self.wfile.write(body)
+        elif path == '/events':
+            self._headers(200, 'text/event-stream')
+            try:
+                self.feed.stream(self._write)
+            except (IOError, OSError):
+                pass  # client went away
+        else:
+            self._headers(404, 'text/plain', 0)
+
+    def _write(self, data):
+        self.wfile.write(data)
+        self.wfile.flush()
+
+    def _headers(self, status, content_type, length=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')  # browser-source overlays load from file:// or other ports
+        if length is not None:
+            self.send_header('Content-Length', str(length))
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FeedServer(object):
+    """Serves a LiveFeed over HTTP from background threads."""
+
+    def __init__(self, feed, host="127.0.0.1", port=8765):
+        self.feed = feed
+        handler = type('FeedHandler', (_Handler,), {'feed': feed})
+        self._server = _ThreadingServer((host, port), handler)
+        self.address = self._server.server_address
+        self._thread = None
+
+    def start(self):
+        self.feed.start()
+        self._thread = threading.Thread(target=self._server.serve_forever, name="TACS-FeedServer")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self.feed.close()
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,181 @@
+"""
+Time gaps between cars from spline checkpoint crossings.
+
+The lap is cut into `checkpoints` evenly spaced spline positions. For every
+car the engine keeps a circular buffer, one slot per checkpoint, holding the
+time at which the car last crossed that checkpoint and which crossing it was
+(laps * checkpoints + checkpoint). Crossing times are interpolated between two
+samples of the car, so cars do not have to be sampled every frame.
+
+The gap from a car to one further ahead is the difference between the times
+both crossed the trailing car's latest checkpoint: exact at that point of the
+track, independent of speed, and a single slot lookup. If the lead car's slot
+already holds a later lap, it is a lap or more ahead.
+
+Cars are kept in race order (laps + spline, highest first). A sample only
+moves its car past the neighbours it overtook, so the order is never re-sorted.
+"""
+import math
+from array import array
+
+CHECKPOINTS = 256
+
+# A sample that moves a car further than this (fraction of a lap) is a teleport
+# (back to the pits, session restart): its crossings are not recorded.
+_MAX_STEP = 0.1
+
+
+class CarTrace(object):
+    """One car's progress and checkpoint crossing history."""
+    __slots__ = ('car_id', 'progress', 'last_time', 'last_mark', 'times', 'marks')
+
+    def __init__(self, car_id, checkpoints):
+        self.car_id = car_id
+        self.progress = -1.0  # laps + spline at the last sample, < 0 before the first one
+        self.last_time = 0.0
+        self.last_mark = -1   # latest recorded crossing, -1 = none yet
+        self.times = array('d', [0.0]) * checkpoints
+        self.marks = array('l', [-1]) * checkpoints
+
+
+class GapEngine(object):
+    """Checkpoint histories, race order and gaps for every car in the session."""
+
+    def __init__(self, checkpoints=CHECKPOINTS, cars_per_frame=0):
+        self.checkpoints = checkpoints
+        self.cars_per_frame = cars_per_frame  # cars sampled per poll(), 0 = all of them
+        self.reset(0)
+
+    def reset(self, num_cars):
+        self.cars = [CarTrace(car_id, self.checkpoints) for car_id in range(num_cars)]
+        self.order = []                               # connected car ids, leader first
+        self.position = array('i', [-1]) * num_cars   # car id -> index in order, -1 = not in it
+        self._next_car = 0
+
+    def set_connected(self, car_id, connected):
+        """Adds a car to the order or drops it (and its history) from it."""
+        position = self.position[car_id]
+        if connected and position < 0:
+            self.order.append(car_id)
+            self.position[car_id] = len(self.order) - 1
+            self._reorder(car_id)
+        elif not connected and position >= 0:
+            del self.order[position]
+            for index in range(position, len(self.order)):
+                self.position[self.order[index]] = index
+            self.position[car_id] = -1
+            self.cars[car_id] = CarTrace(car_id, self.checkpoints)
+
+    def poll(self, read_spline, read_laps, now):
+        """
+        Samples the next `cars_per_frame` connected cars, round robin.
+
+        read_spline(car_id) and read_laps(car_id) read the car's state; laps
+        are only read the first time a car is sampled, after that crossings of
+        the line are counted from the spline.
+        """
+        num_cars = len(self.cars)
+        if not num_cars:
+            return
+        budget = self.cars_per_frame or num_cars
+        if budget > num_cars:
+            budget = num_cars
+        car_id = self._next_car
+        position = self.position
+        for _ in range(budget):
+            if car_id >= num_cars:
+                car_id = 0
+            if position[car_id] >= 0:
+                car = self.cars[car_id]
+                laps = read_laps(car_id) if car.progress < 0.0 else 0
+                self.sample(car_id, read_spline(car_id), now, laps)
+            car_id += 1
+        self._next_car = car_id
+
+    def sample(self, car_id, spline, now, laps=0):
+        """Records a car at `spline` at time `now` (seconds); `laps` is only used for its first sample."""
+        car = self.cars[car_id]
+        old = car.progress
+        if old < 0.0:
+            car.progress = laps + spline
+            car.last_time = now
+            self._reorder(car_id)
+            return
+
+        lap = math.floor(old)
+        old_spline = old - lap
+        if spline < old_spline - 0.5:
+            lap += 1  # crossed the line
+        elif spline > old_spline + 0.5:
+            lap -= 1  # backed over the line
+        new = lap + spline
+
+        step = new - old
+        if 0.0 < step <= _MAX_STEP:
+            checkpoints = self.checkpoints
+            first = int(math.floor(old * checkpoints)) + 1
+            last = int(math.floor(new * checkpoints))
+            if first <= last:
+                times, marks = car.times, car.marks
+                start_time = car.last_time
+                time_per_lap = (now - start_time) / step
+                for mark in range(first, last + 1):
+                    slot = mark % checkpoints
+                    times[slot] = start_time + (float(mark) / checkpoints - old) * time_per_lap
+                    marks[slot] = mark
+                car.last_mark = last
+
+        car.progress = new
+        car.last_time = now
+        if step:
+            self._reorder(car_id)
+
+    def _reorder(self, car_id):
+        """Moves one car past the neighbours its progress now puts it ahead of / behind."""
+        order, position, cars = self.order, self.position, self.cars
+        index = position[car_id]
+        if index < 0:
+            return
+        progress = cars[car_id].progress
+        while index > 0 and cars[order[index - 1]].progress < progress:
+            other = order[index - 1]
+            order[index] = other
+            position[other] = index
+            index -= 1
+        while index < len(order) - 1 and cars[order[index + 1]].progress > progress:
+            other = order[index + 1]
+            order[index] = other
+            position[other] = index
+            index += 1
+        order[index] = car_id
+        position[car_id] = index
+
+    def neighbours(self, car_id, count=1):
+        """([cars ahead, nearest first], [cars behind, nearest first]), at most `count` each."""
+        index = self.position[car_id] if 0 <= car_id < len(self.cars) else -1
+        if index < 0:
+            return None, None
+        order = self.order
+        ahead = order[max(0, index - count):index]
+        ahead.reverse()
+        behind = order[index + 1:index + 1 + count]
+        return ahead, behind
+
+    def gap(self, lead_id, trail_id):
+        """
+        (laps, seconds) from `trail_id` back to `lead_id`.
+
+        laps > 0 when the lead car is that many laps ahead (seconds is then
+        None); (0, None) until both cars have crossed a common checkpoint.
+        """
+        lead, trail = self.cars[lead_id], self.cars[trail_id]
+        mark = trail.last_mark
+        if mark >= 0:
+            slot = mark % self.checkpoints
+            lead_mark = lead.marks[slot]
+            if lead_mark == mark:
+                return 0, trail.times[slot] - lead.times[slot]
+            if lead_mark > mark:
+                return (lead_mark - mark) // self.checkpoints, None
+        laps = int(lead.progress - trail.progress) if lead.progress >= 0.0 and trail.progress >= 0.0 else 0
+        return max(0, laps), None
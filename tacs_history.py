@@ -0,0 +1,354 @@
+"""
+Every completed lap, stored per track as fixed-width column files.
+
+    records/history/{track}/timestamp.col  float64  unix time the lap was seen
+                            time_ms.col    int32    lap time
+                            car.col        uint16   index into cars.txt
+                            driver.col     uint16   index into drivers.txt
+                            session.col    int8     AC session type, -1 = unknown
+
+Cars and drivers are dictionary encoded: cars.txt / drivers.txt hold one name
+per line and are only ever appended to, so a code never changes meaning. A
+track takes at most 65536 of each; laps with a name past that are dropped.
+
+Rows are appended column by column, so a crash between two columns leaves
+them with different lengths. Readers use the shortest, and before
+`LapHistory` first appends to a track (and again after a failed write) it
+truncates every column to that common row count, so later rows line up.
+
+The frame thread only calls `LapHistory.append()`; encoding and file writes
+happen in `flush()` on the saver thread. `TrackHistory` maps the columns for
+reading (`numpy()` gives NumPy arrays over them), and `car_stats()` groups the
+lap times per car into compact arrays and summarizes them.
+"""
+import os
+import mmap
+import math
+import threading
+from array import array
+
+from tacs_storage import normalize_path
+
+
+def _no_log(message):
+    pass
+
+
+MAX_CODES = 1 << 16  # Names a uint16 car/driver column can tell apart
+
+# (file name, array typecode)
+COLUMNS = (
+    ("timestamp", 'd'),
+    ("time_ms", 'i'),
+    ("car", 'H'),
+    ("driver", 'H'),
+    ("session", 'b'),
+)
+
+SESSION_TYPES = {-1: "Unknown", 0: "Practice", 1: "Qualify", 2: "Race", 3: "Hotlap",
+                 4: "Time Attack", 5: "Drift", 6: "Drag"}
+
+
+def _read_names(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.rstrip('\n') for line in f]
+
+
+class _Dictionary(object):
+    """An append-only name <-> code table backed by a text file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.names = _read_names(path)
+        self.codes = dict((name, code) for code, name in enumerate(self.names))
+        self._new = []
+
+    def encode(self, name):
+        name = (name or "").replace('\n', ' ')
+        code = self.codes.get(name)
+        if code is None:
+            code = len(self.names)
+            if code >= MAX_CODES:
+                raise OverflowError("{} already holds {} names".format(normalize_path(self.path), MAX_CODES))
+            self.names.append(name)
+            self.codes[name] = code
+            self._new.append(name)
+        return code
+
+    def save(self):
+        if not self._new:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for name in self._new:
+                f.write(name + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self._new = []
+
+
+class LapHistory(object):
+    """Appends completed laps to the per-track column files."""
+
+    def __init__(self, history_dir, log=None):
+        self.history_dir = history_dir
+        self.log = log or _no_log
+        self._lock = threading.Lock()
+        self._pending = []      # [(track, timestamp, time_ms, car, driver, session)]
+        self._dictionaries = {}  # {track: (cars, drivers)}, only touched by flush()
+        self._aligned = set()    # Tracks whose columns flush() has truncated to a common row count
+        self.laps_written = 0
+        self.errors = 0          # Tracks flush() failed to write; their laps are retried on the next flush
+
+    def track_dir(self, track):
+        return os.path.join(self.history_dir, track)
+
+    def append(self, track, timestamp, time_ms, car, driver, session=-1):
+        """Queues one lap; cheap enough for the frame thread."""
+        with self._lock:
+            self._pending.append((track, timestamp, time_ms, car, driver, session))
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def align(self, track):
+        """Truncates every column of a track to the row count they all have; returns that count."""
+        directory = self.track_dir(track)
+        sizes = {}
+        for name, typecode in COLUMNS:
+            path = os.path.join(directory, name + ".col")
+            sizes[name] = os.path.getsize(path) if os.path.exists(path) else 0
+        rows = min(sizes[name] // array(typecode).itemsize for name, typecode in COLUMNS)
+        for name, typecode in COLUMNS:
+            size = rows * array(typecode).itemsize
+            if sizes[name] != size:
+                self.log("TACS Warning: Lap history {} for {} had {} bytes past row {}, dropped".format(
+                    name, track, sizes[name] - size, rows))
+                with open(os.path.join(directory, name + ".col"), 'r+b') as f:
+                    f.truncate(size)
+        return rows
+
+    def flush(self):
+        """
+        Encodes and appends every queued lap; returns how many were written.
+
+        A track that fails to write is logged and its laps go back in the
+        queue, so the other tracks are still written.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+
+        by_track = {}
+        for row in pending:
+            by_track.setdefault(row[0], []).append(row)
+
+        written = 0
+        retry = []
+        for track, rows in by_track.items():
+            try:
+                written += self._write_track(track, rows)
+            except Exception as e:
+                self.errors += 1
+                self.log("TACS Error writing lap history for {}, {} laps kept for the next flush: {}".format(
+                    track, len(rows), e))
+                retry.extend(rows)
+        if retry:
+            with self._lock:
+                self._pending[:0] = retry
+        self.laps_written += written
+        return written
+
+    def _write_track(self, track, rows):
+        """Appends one track's laps to its columns; returns how many were written."""
+        directory = self.track_dir(track)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        dictionaries = self._dictionaries.get(track)
+        if dictionaries is None:
+            dictionaries = self._dictionaries[track] = (
+                _Dictionary(os.path.join(directory, "cars.txt")),
+                _Dictionary(os.path.join(directory, "drivers.txt")))
+        cars, drivers = dictionaries
+
+        columns = dict((name, array(typecode)) for name, typecode in COLUMNS)
+        for _, timestamp, time_ms, car, driver, session in rows:
+            try:
+                car_code = cars.encode(car)
+                driver_code = drivers.encode(driver)
+            except OverflowError as e:
+                # Retrying cannot help, so only this lap is lost.
+                self.log("TACS Warning: Lap history for {} dropped a lap: {}".format(track, e))
+                continue
+            columns["timestamp"].append(timestamp)
+            columns["time_ms"].append(int(time_ms))
+            columns["car"].append(car_code)
+            columns["driver"].append(driver_code)
+            columns["session"].append(max(-1, min(127, int(session))))
+
+        # Names first, so every code written below already has its line.
+        cars.save()
+        drivers.save()
+        if track not in self._aligned:
+            self.align(track)
+            self._aligned.add(track)
+        try:
+            for name, _ in COLUMNS:
+                with open(os.path.join(directory, name + ".col"), 'ab') as f:
+                    f.write(columns[name].tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+        except Exception:
+            self._aligned.discard(track)  # Some columns may have this batch and some not
+            raise
+        return len(columns["time_ms"])
+
+
+class TrackHistory(object):
+    """Read-only, memory-mapped view of one track's lap history."""
+
+    def __init__(self, history_dir, track):
+        self.directory = os.path.join(history_dir, track)
+        self.cars = _read_names(os.path.join(self.directory, "cars.txt"))
+        self.drivers = _read_names(os.path.join(self.directory, "drivers.txt"))
+        self._files = []
+        self._maps = []
+        self._views = []
+        self.columns = {}
+        rows = None
+        raw = {}
+        for name, typecode in COLUMNS:
+            view = self._map(os.path.join(self.directory, name + ".col"))
+            count = len(view) // array(typecode).itemsize if view is not None else 0
+            raw[name] = (view, typecode)
+            rows = count if rows is None else min(rows, count)
+        self.rows = rows or 0
+        for name, (view, typecode) in raw.items():
+            if view is None or not self.rows:
+                self.columns[name] = array(typecode)
+            else:
+                self.columns[name] = view[:self.rows * array(typecode).itemsize].cast(typecode)
+
+    def _map(self, path):
+        if not os.path.exists(path) or not os.path.getsize(path):
+            return None
+        f = open(path, 'rb')
+        self._files.append(f)
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps.append(mapped)
+        view = memoryview(mapped)
+        self._views.append(view)
+        return view
+
+    def __len__(self):
+        return self.rows
+
+    def car_name(self, code):
+        return self.cars[code] if code < len(self.cars) else "?"
+
+    def driver_name(self, code):
+        return self.drivers[code] if code < len(self.drivers) else "?"
+
+    def numpy(self):
+        """{column: numpy array} over the same mapped memory (requires NumPy)."""
+        import numpy
+        if not self.rows:
+            return dict((name, numpy.zeros(0, dtype=typecode)) for name, typecode in COLUMNS)
+        return dict((name, numpy.frombuffer(self.columns[name], dtype=typecode)) for name, typecode in COLUMNS)
+
+    def close(self):
+        for view in self.columns.values():
+            if isinstance(view, memoryview):
+                view.release()
+        self.columns = {}
+        for view in self._views:
+            view.release()
+        for mapped in self._maps:
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+        for f in self._files:
+            f.close()
+        self._views, self._maps, self._files = [], [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def percentile(sorted_times, pct):
+    """Linear-interpolated percentile of an already sorted sequence."""
+    if not sorted_times:
+        return 0.0
+    position = (len(sorted_times) - 1) * pct / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_times) - 1)
+    return sorted_times[lower] + (sorted_times[upper] - sorted_times[lower]) * (position - lower)
+
+
+def car_stats(history, percentiles=(50, 90), session=None):
+    """
+    Per-car lap statistics for a TrackHistory.
+
+    Returns {car name: {'laps', 'best', 'mean', 'stdev', 'consistency', 'p50', ...}}
+    where consistency is the standard deviation as a percentage of the mean.
+    `session` limits the laps to one AC session type.
+    """
+    times_column = history.columns["time_ms"]
+    car_column = history.columns["car"]
+    session_column = history.columns["session"]
+    per_car = {}  # {car code: array('i') of lap times}
+    for index in range(history.rows):
+        if session is not None and session_column[index] != session:
+            continue
+        code = car_column[index]
+        times = per_car.get(code)
+        if times is None:
+            times = per_car[code] = array('i')
+        times.append(times_column[index])
+
+    stats = {}
+    for code, times in per_car.items():
+        ordered = sorted(times)
+        count = len(ordered)
+        mean = float(sum(ordered)) / count
+        variance = sum((t - mean) * (t - mean) for t in ordered) / count
+        stdev = math.sqrt(variance)
+        entry = {
+            'laps': count,
+            'best': ordered[0],
+            'mean': mean,
+            'stdev': stdev,
+            'consistency': stdev / mean * 100.0 if mean else 0.0,
+        }
+        for pct in percentiles:
+            entry['p{}'.format(pct)] = percentile(ordered, pct)
+        stats[history.car_name(code)] = entry
+    return stats
+
+
+def main(argv=None):
+    """Prints per-car stats for one track: tacs_history.py <history dir> <track>."""
+    import sys
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2:
+        print("usage: tacs_history.py <history dir> <track>")
+        return 2
+    with TrackHistory(argv[0], argv[1]) as history:
+        print("{} laps in {}".format(len(history), normalize_path(history.directory)))
+        stats = car_stats(history)
+        print("{:<32} {:>6} {:>10} {:>10} {:>10} {:>7}".format("car", "laps", "best", "p50", "p90", "cons %"))
+        for car, entry in sorted(stats.items(), key=lambda item: item[1]['best']):
+            print("{:<32} {:>6} {:>10} {:>10.0f} {:>10.0f} {:>7.2f}".format(
+                car, entry['laps'], entry['best'], entry['p50'], entry['p90'], entry['consistency']))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,53 @@
+"""
+Per-session cache of who is in each car slot.
+
+`ac.getCarName`, `ac.getDriverName` and `ac.getCarSkin` cross into the game
+on every call, yet what they return only changes when a car slot is
+(re)connected. `IdentityCache` asks once per slot and connection and keeps
+the answer until the app's roster check sees the car count change or the
+slot disconnect or reconnect.
+"""
+from collections import namedtuple
+
+Identity = namedtuple('Identity', 'car driver skin')
+
+
+class IdentityCache(object):
+    """car_id -> Identity, resolved on first use after each (re)connection."""
+
+    def __init__(self, get_car_name, get_driver_name, get_car_skin):
+        self._get_car_name = get_car_name
+        self._get_driver_name = get_driver_name
+        self._get_car_skin = get_car_skin
+        self.resolved = 0  # identities looked up through the getters so far
+        self.reset(0)
+
+    def reset(self, num_cars):
+        """Forgets every identity; called for a new session or car count."""
+        self._identities = [None] * num_cars
+        self._connected = [None] * num_cars  # None = not seen by set_connected yet
+
+    def __len__(self):
+        return len(self._identities)
+
+    def set_connected(self, car_id, connected):
+        """Roster update for one slot; a change of connection state drops its identity."""
+        if self._connected[car_id] != connected:
+            if self._connected[car_id] is not None:
+                self._identities[car_id] = None
+            self._connected[car_id] = connected
+
+    def get(self, car_id):
+        identity = self._identities[car_id] if 0 <= car_id < len(self._identities) else None
+        if identity is None:
+            identity = Identity(self._get_car_name(car_id), self._get_driver_name(car_id), self._get_car_skin(car_id))
+            self.resolved += 1
+            if 0 <= car_id < len(self._identities):
+                self._identities[car_id] = identity
+        return identity
+
+    def car(self, car_id):
+        return self.get(car_id).car
+
+    def driver(self, car_id):
+        return self.get(car_id).driver
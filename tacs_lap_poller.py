@@ -0,0 +1,89 @@
+"""
+Completed-lap detection for every car in the session.
+
+A car's LastLap value stays put until its next lap completes, so cars do not
+have to be read every frame: the pollers walk the grid round-robin, reading at
+most `cars_per_frame` cars per call, and per-frame cost stays flat however
+many cars are connected. A lap is still noticed within ceil(cars / budget)
+frames of completing.
+"""
+
+_NO_TIME = 2147483647  # INT_MAX, what the page holds before a lap has been set
+
+
+class LapPoller(object):
+    """Round-robin LastLap scan through a `read_last_lap(car_id)` callable (the ac API)."""
+
+    def __init__(self, read_last_lap, cars_per_frame=0):
+        self.read_last_lap = read_last_lap
+        self.cars_per_frame = cars_per_frame  # 0 reads every car every frame
+        self.last_lap_times = {}  # {car_id: last_lap_time_ms}
+        self._next_car = 0
+
+    def reset(self):
+        """Forgets every car's last lap, e.g. when a new session starts."""
+        self.last_lap_times.clear()
+        self._next_car = 0
+
+    def poll(self, num_cars, on_lap):
+        """Reads this frame's share of cars, calling on_lap(car_id, lap_ms) for each new lap."""
+        if num_cars <= 0:
+            return
+
+        budget = self.cars_per_frame
+        if budget <= 0 or budget >= num_cars:
+            car_ids = range(num_cars)
+        else:
+            start = self._next_car % num_cars
+            end = start + budget
+            self._next_car = end % num_cars
+            if end <= num_cars:
+                car_ids = range(start, end)
+            else:
+                car_ids = list(range(start, num_cars)) + list(range(end - num_cars))
+
+        last_lap_times = self.last_lap_times
+        read_last_lap = self.read_last_lap
+        for car_id in car_ids:
+            car_last_lap = read_last_lap(car_id)
+            if car_last_lap > 0 and car_last_lap != last_lap_times.get(car_id):
+                last_lap_times[car_id] = car_last_lap
+                on_lap(car_id, car_last_lap)
+
+
+class SharedMemoryLapPoller(LapPoller):
+    """
+    LapPoller gated by the shared-memory graphics page.
+
+    Frames where the page's `packetId` has not moved (paused, loading, or the
+    app ticking faster than the sim) are skipped outright. The player's car
+    (id 0) is read from the page's `iLastTime` rather than through the ac API;
+    other cars' lap times are not in shared memory and still come from
+    `read_last_lap`.
+    """
+
+    def __init__(self, graphics, read_last_lap, cars_per_frame=0):
+        LapPoller.__init__(self, read_last_lap, cars_per_frame)
+        self.graphics = graphics
+        self.api_read_last_lap = read_last_lap
+        self.read_last_lap = self._read_last_lap
+        self.skipped_frames = 0
+        self._last_packet_id = None
+
+    def reset(self):
+        LapPoller.reset(self)
+        self._last_packet_id = None
+
+    def _read_last_lap(self, car_id):
+        if car_id == 0:
+            last_time = self.graphics.iLastTime
+            return last_time if last_time < _NO_TIME else 0
+        return self.api_read_last_lap(car_id)
+
+    def poll(self, num_cars, on_lap):
+        packet_id = self.graphics.packetId
+        if packet_id == self._last_packet_id:
+            self.skipped_frames += 1
+            return
+        self._last_packet_id = packet_id
+        LapPoller.poll(self, num_cars, on_lap)
@@ -0,0 +1,99 @@
+"""
+Per-track leaderboard index kept alongside `records_cache`.
+
+Entries are held as a list of (time_ms, car) tuples in sorted order, so the
+track best is the first entry, a car's rank is one binary search, and the top
+K is a slice. An improvement is a bisect to remove the old entry and an insort
+for the new one: O(log n) to find the positions, but O(n) to shift the list
+around them. That shift is one memmove over a track's few hundred cars, far
+cheaper than a balanced tree in pure Python, so the list is kept.
+
+With records kept per driver the keys are (car, driver) tuples instead of car
+names; `BestIndex` then answers "fastest in this car" and "fastest by this
+driver" without a scan.
+"""
+from bisect import bisect_left, insort
+
+
+class Leaderboard(object):
+    """Sorted view of one track's {car: time_ms} records."""
+
+    def __init__(self, records=None):
+        self._entries = []  # [(time_ms, car)] fastest first
+        self._times = {}    # {car: time_ms}
+        if records:
+            self.rebuild(records)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def rebuild(self, records):
+        """Replaces the index with the contents of a {car: time_ms} dict."""
+        self._times = dict(records)
+        self._entries = sorted((time_ms, car) for car, time_ms in self._times.items())
+
+    def update(self, car, time_ms):
+        """Records a new time for a car (O(n): the list shifts); returns False if it is not an improvement."""
+        previous = self._times.get(car)
+        if previous is not None:
+            if time_ms >= previous:
+                return False
+            del self._entries[bisect_left(self._entries, (previous, car))]
+        self._times[car] = time_ms
+        insort(self._entries, (time_ms, car))
+        return True
+
+    def best(self):
+        """Returns (time_ms, car) for the track record, or (inf, "N/A") if there is none."""
+        if not self._entries:
+            return float('inf'), "N/A"
+        return self._entries[0]
+
+    def time_of(self, car):
+        return self._times.get(car, float('inf'))
+
+    def rank(self, car):
+        """1-based position of a car's best (ties share a position); 0 if it has no time."""
+        time_ms = self._times.get(car)
+        if time_ms is None:
+            return 0
+        return bisect_left(self._entries, (time_ms,)) + 1
+
+    def top(self, k):
+        """The k fastest entries as (time_ms, car) tuples."""
+        return self._entries[:k]
+
+
+class BestIndex(object):
+    """
+    Secondary index over (car, driver)-keyed records: the fastest entry per car and per driver.
+
+    Records only ever improve, so an update is two dict compares.
+    """
+
+    def __init__(self, records=None):
+        self.by_car = {}     # {car: (time_ms, driver)}
+        self.by_driver = {}  # {driver: (time_ms, car)}
+        if records:
+            self.rebuild(records)
+
+    def rebuild(self, records):
+        self.by_car = {}
+        self.by_driver = {}
+        for key, time_ms in records.items():
+            self.update(key, time_ms)
+
+    def update(self, key, time_ms):
+        car, driver = key
+        if time_ms < self.by_car.get(car, (float('inf'),))[0]:
+            self.by_car[car] = (time_ms, driver)
+        if time_ms < self.by_driver.get(driver, (float('inf'),))[0]:
+            self.by_driver[driver] = (time_ms, car)
+
+    def car_best(self, car):
+        """(time_ms, driver) of the fastest driver in a car, or (inf, "N/A")."""
+        return self.by_car.get(car, (float('inf'), "N/A"))
+
+    def driver_best(self, driver):
+        """(time_ms, car) of a driver's fastest car, or (inf, "N/A")."""
+        return self.by_driver.get(driver, (float('inf'), "N/A"))
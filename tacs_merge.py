@@ -0,0 +1,174 @@
+"""
+Merges the records directories of several rigs into one.
+
+    python tacs_merge.py --output DIR [--jobs N] RIG [RIG ...]
+
+Each RIG is the records directory of one simulator, or its AC install (or
+any directory) holding `apps/python/TrackAndCarStats/records` or `records`,
+optionally given a name as NAME=DIR (the name defaults to the directory).
+Both `{track}.csv` files (legacy `rt_{track}.csv` too) and a records.db are
+read.
+
+Tracks are merged independently by a process pool. A worker streams the rows
+of every rig's copy of one track and keeps the fastest time per car, so its
+memory is bounded by one track's cars. The result is written as
+`{track}.csv`, fastest first, with a third `Rig` column naming where each
+time came from; the app and the viewer only read the first two columns.
+On equal times the rig listed first wins.
+"""
+import io
+import os
+import csv
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from tacs_storage import (SqliteRecordStore, iter_records_csv, list_records_files, normalize_path,
+                          write_file_atomic)
+
+SERIAL_MAX_TRACKS = 16  # Fewer tracks than this are merged in-process; starting a pool costs more
+RECORDS_SUBDIRS = (os.path.join("apps", "python", "TrackAndCarStats", "records"), "records")
+
+
+def parse_rig(argument):
+    """'NAME=DIR' or 'DIR' -> (name, directory)."""
+    name, sep, directory = argument.partition('=')
+    if not sep or not name or os.path.isdir(argument):
+        return normalize_path(argument), argument
+    return name, directory
+
+
+def records_dir_for(directory):
+    """The records directory of a rig given as itself or as a directory above it."""
+    for subdir in RECORDS_SUBDIRS:
+        candidate = os.path.join(directory, subdir)
+        if os.path.isdir(candidate):
+            return candidate
+    return directory
+
+
+def database_tracks(db_path):
+    """Track keys in a records.db, opened read-only."""
+    import sqlite3
+    db = sqlite3.connect('file:{}?mode=ro'.format(normalize_path(os.path.abspath(db_path))), uri=True)
+    try:
+        return [row[0] for row in db.execute("SELECT DISTINCT track FROM records")]
+    finally:
+        db.close()
+
+
+def iter_database_track(db_path, track):
+    """Yields (car, time_ms, driver) of one track in a records.db, like iter_records_csv."""
+    import sqlite3
+    db = sqlite3.connect('file:{}?mode=ro'.format(normalize_path(os.path.abspath(db_path))), uri=True)
+    try:
+        for car, time_ms in db.execute("SELECT car, time_ms FROM records WHERE track = ?", (track,)):
+            yield car, time_ms, ""
+    finally:
+        db.close()
+
+
+def collect_sources(rigs):
+    """{track: [(rig name, path)]} over every rig, in rig order; returns (sources, errors)."""
+    sources = {}
+    errors = []
+    for name, directory in rigs:
+        if not os.path.isdir(directory):
+            errors.append("{}: not a directory".format(directory))
+            continue
+        directory = records_dir_for(directory)
+        for track, path in list_records_files(directory).items():
+            sources.setdefault(track, []).append((name, path))
+        db_path = os.path.join(directory, SqliteRecordStore.FILENAME)
+        if os.path.exists(db_path):
+            try:
+                for track in database_tracks(db_path):
+                    sources.setdefault(track, []).append((name, db_path))
+            except Exception as e:
+                errors.append("{}: {}".format(normalize_path(db_path), e))
+    return sources, errors
+
+
+def merge_track(job):
+    """
+    Merges one track; runs in a pool worker.
+
+    job is (track, [(rig name, path)], output dir). Returns
+    (track, records written, rows read, [error messages]).
+    """
+    track, sources, output_dir = job
+    best = {}  # {car: (time_ms, rig name)}
+    rows_read = 0
+    errors = []
+    for rig, path in sources:
+        if path.endswith('.csv'):
+            rows = iter_records_csv(path)
+        else:
+            rows = iter_database_track(path, track)
+        try:
+            for car, time_ms, _ in rows:
+                rows_read += 1
+                if time_ms <= 0:
+                    continue
+                current = best.get(car)
+                if current is None or time_ms < current[0]:
+                    best[car] = (time_ms, rig)
+        except Exception as e:
+            errors.append("{}: {}".format(normalize_path(path), e))
+
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    writer.writerow(['CarName', 'Time_ms', 'Rig'])
+    for car, (time_ms, rig) in sorted(best.items(), key=lambda item: item[1][0]):
+        writer.writerow([car, time_ms, rig])
+    write_file_atomic(os.path.join(output_dir, "{}.csv".format(track)), out.getvalue().encode('utf-8'))
+    return track, len(best), rows_read, errors
+
+
+def merge(rigs, output_dir, jobs=None, log=print):
+    """Merges [(rig name, directory)] into output_dir; returns (tracks, records, rows read, errors)."""
+    sources, errors = collect_sources(rigs)
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    work = [(track, sources[track], output_dir) for track in sorted(sources)]
+
+    tracks = records = rows_read = 0
+    if jobs == 1 or len(work) < SERIAL_MAX_TRACKS:
+        results = map(merge_track, work)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        workers = jobs or os.cpu_count() or 1
+        results = pool.map(merge_track, work, chunksize=max(1, len(work) // (workers * 4)))
+    try:
+        for track, written, read, track_errors in results:
+            tracks += 1
+            records += written
+            rows_read += read
+            errors.extend(track_errors)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    for error in errors:
+        log("Error reading {}".format(error))
+    return tracks, records, rows_read, errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge the records directories of several rigs, keeping each car's best time.")
+    parser.add_argument('rigs', nargs='+', metavar='RIG', help="records directory, or NAME=DIR")
+    parser.add_argument('-o', '--output', required=True, help="directory to write the merged {track}.csv files to")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="worker processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    rigs = [parse_rig(argument) for argument in args.rigs]
+    start = time.time()
+    tracks, records, rows_read, errors = merge(rigs, args.output, args.jobs)
+    print("{} tracks, {} records from {} rows of {} rigs in {:.2f}s".format(
+        tracks, records, rows_read, len(rigs), time.time() - start))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Low-overhead section timing for acUpdate.
+
+Every section gets a fixed log2 histogram of durations plus a ring buffer of
+its most recent samples, all allocated up front, so profiling a frame only
+updates existing slots. When the profiler is disabled the call sites skip it
+with a single attribute check.
+"""
+import sys
+import time
+from array import array
+
+# Bucket i holds durations below 2**i microseconds; the last one is open ended.
+HISTOGRAM_BUCKETS = 22
+
+
+class SectionProfiler(object):
+    """Timing histograms for a fixed list of named sections."""
+
+    def __init__(self, sections, ring_size=256, enabled=False):
+        self.sections = tuple(sections)
+        self.enabled = enabled
+        self.ring_size = ring_size
+        count = len(self.sections)
+        self._histograms = [array('L', [0] * HISTOGRAM_BUCKETS) for _ in range(count)]
+        self._recent = [array('d', [0.0] * ring_size) for _ in range(count)]
+        self._counts = array('L', [0] * count)
+        self._totals = array('d', [0.0] * count)
+        self._maxima = array('d', [0.0] * count)
+        self._mark = 0.0
+
+    def reset(self):
+        for histogram in self._histograms:
+            for i in range(HISTOGRAM_BUCKETS):
+                histogram[i] = 0
+        for i in range(len(self.sections)):
+            self._counts[i] = 0
+            self._totals[i] = 0.0
+            self._maxima[i] = 0.0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        return self.enabled
+
+    def start(self):
+        """Starts timing the first section of a frame; returns the start time."""
+        self._mark = time.perf_counter()
+        return self._mark
+
+    def lap(self, section):
+        """Charges the time since the last start()/lap() to `section` (an index into sections)."""
+        now = time.perf_counter()
+        self.add(section, now - self._mark)
+        self._mark = now
+
+    def add(self, section, seconds):
+        micros = int(seconds * 1000000.0)
+        bucket = micros.bit_length()
+        if bucket >= HISTOGRAM_BUCKETS:
+            bucket = HISTOGRAM_BUCKETS - 1
+        self._histograms[section][bucket] += 1
+        n = self._counts[section]
+        self._recent[section][n % self.ring_size] = seconds
+        self._counts[section] = n + 1
+        self._totals[section] += seconds
+        if seconds > self._maxima[section]:
+            self._maxima[section] = seconds
+
+    def percentile_us(self, section, pct):
+        """Upper bound (from the histogram) of the pct-th percentile, in microseconds."""
+        count = self._counts[section]
+        if not count:
+            return 0
+        target = count * pct / 100.0
+        seen = 0
+        for bucket, hits in enumerate(self._histograms[section]):
+            seen += hits
+            if seen >= target:
+                return 1 << bucket
+        return 1 << (HISTOGRAM_BUCKETS - 1)
+
+    def summary_lines(self):
+        """Formats one line per section: count, mean, p50/p99 bounds, max and recent mean."""
+        lines = ["{:<16} {:>8} {:>9} {:>9} {:>9} {:>9} {:>10}".format(
+            "section", "count", "mean us", "p50 <us", "p99 <us", "max us", "recent us")]
+        for index, name in enumerate(self.sections):
+            count = self._counts[index]
+            if not count:
+                lines.append("{:<16} {:>8}".format(name, 0))
+                continue
+            recent = self._recent[index]
+            recent_count = min(count, self.ring_size)
+            recent_mean = sum(recent[i] for i in range(recent_count)) / recent_count
+            lines.append("{:<16} {:>8} {:>9.1f} {:>9} {:>9} {:>9.1f} {:>10.1f}".format(
+                name, count, self._totals[index] / count * 1e6,
+                self.percentile_us(index, 50), self.percentile_us(index, 99),
+                self._maxima[index] * 1e6, recent_mean * 1e6))
+        return lines
+
+
+class Hotkeys(object):
+    """
+    Edge-triggered Ctrl+Shift+<key> shortcuts, read with GetAsyncKeyState.
+
+    AC gives Python apps no keyboard events, so the keys are polled; only the
+    main keys are read every poll and the modifiers are checked on a press.
+    Does nothing outside Windows.
+    """
+
+    VK_SHIFT = 0x10
+    VK_CONTROL = 0x11
+
+    def __init__(self, bindings):
+        self.bindings = list(bindings.items())  # [(virtual_key, callback)]
+        self._down = dict((key, False) for key, _ in self.bindings)
+        self._get_key_state = None
+        if sys.platform == "win32":
+            try:
+                import ctypes
+                self._get_key_state = ctypes.windll.user32.GetAsyncKeyState
+            except Exception:
+                self._get_key_state = None
+
+    def poll(self):
+        get_key_state = self._get_key_state
+        if get_key_state is None:
+            return
+        for key, callback in self.bindings:
+            down = bool(get_key_state(key) & 0x8000)
+            if down and not self._down[key]:
+                if get_key_state(self.VK_CONTROL) & 0x8000 and get_key_state(self.VK_SHIFT) & 0x8000:
+                    callback()
+            self._down[key] = down
@@ -0,0 +1,140 @@
+"""
+Frame-budget task scheduler for acUpdate.
+
+Each task has its own period. On every frame the scheduler runs the tasks that
+are due, most overdue first, for as long as the frame budget allows: a task
+only starts if its typical cost (a moving average of its measured run time)
+still fits in what is left of the budget. The first due task of a frame always
+runs, so nothing starves when the budget is tight. A task's next run is
+scheduled from when it actually ran, and `start()` staggers the first runs, so
+tasks that share a period do not keep landing on the same frame.
+
+Costs and the budget are measured with the scheduler's `clock`,
+`time.perf_counter` by default. A replay passes a clock that only moves with
+the recorded frame times, so every task costs nothing, none is deferred and the
+replay runs the same tasks on the same frames every time.
+"""
+import time
+import configparser
+
+# Weight of the newest sample in a task's moving average cost
+COST_SMOOTHING = 0.2
+
+
+class Task(object):
+    __slots__ = ('name', 'func', 'period', 'next_due', 'cost', 'runs', 'deferred', 'profile_section')
+
+    def __init__(self, name, func, period, profile_section=None):
+        self.name = name
+        self.func = func
+        self.period = period
+        self.next_due = 0.0
+        self.cost = 0.0
+        self.runs = 0
+        self.deferred = 0
+        self.profile_section = profile_section
+
+
+class FrameScheduler(object):
+    """Runs periodic `func(now)` tasks within a per-frame time budget."""
+
+    def __init__(self, frame_budget=0.001, profiler=None, clock=time.perf_counter):
+        self.frame_budget = frame_budget  # seconds
+        self.profiler = profiler
+        self.clock = clock  # seconds, for task costs and the budget
+        self.tasks = []
+
+    def add(self, name, func, period, profile_section=None):
+        """Registers a task; a period of 0 runs it every frame."""
+        task = Task(name, func, period, profile_section)
+        self.tasks.append(task)
+        return task
+
+    def task(self, name):
+        for task in self.tasks:
+            if task.name == name:
+                return task
+        return None
+
+    def start(self, now):
+        """Spreads the first run of the periodic tasks evenly over their periods."""
+        periodic = [task for task in self.tasks if task.period > 0]
+        for index, task in enumerate(periodic):
+            task.next_due = now + task.period * index / len(periodic)
+        for task in self.tasks:
+            if task.period <= 0:
+                task.next_due = now
+
+    def run(self, now):
+        """Runs this frame's due tasks; returns how many ran."""
+        clock = self.clock
+        frame_start = clock()
+        profiler = self.profiler
+        tasks = self.tasks
+        ran = 0
+        while True:
+            task = None
+            for candidate in tasks:
+                if candidate.next_due <= now and (task is None or candidate.next_due < task.next_due):
+                    task = candidate
+            if task is None:
+                break
+
+            started = clock()
+            if ran and (started - frame_start) + task.cost > self.frame_budget:
+                # Everything still due waits for the next frame.
+                for candidate in tasks:
+                    if candidate.next_due <= now:
+                        candidate.deferred += 1
+                break
+
+            task.next_due = now + task.period if task.period > 0 else float('inf')
+            task.func(now)
+            elapsed = clock() - started
+            task.cost = elapsed if not task.runs else task.cost + COST_SMOOTHING * (elapsed - task.cost)
+            task.runs += 1
+            ran += 1
+            if profiler is not None and profiler.enabled and task.profile_section is not None:
+                profiler.add(task.profile_section, elapsed)
+
+        # Every-frame tasks become due again on the next frame.
+        for task in tasks:
+            if task.period <= 0 and task.next_due == float('inf'):
+                task.next_due = now
+        return ran
+
+    def configure(self, periods, frame_budget=None):
+        """Applies {task name: period seconds} overrides, e.g. from `load_periods`."""
+        for name, period in periods.items():
+            task = self.task(name)
+            if task is not None:
+                task.period = period
+        if frame_budget is not None:
+            self.frame_budget = frame_budget
+
+
+def load_periods(ini_file, section="scheduler", log=None):
+    """
+    Reads task periods (seconds) and `frame_budget_ms` from an ini file section.
+
+    Returns ({task name: period}, frame_budget_seconds or None). Missing files
+    and unreadable values leave the defaults in place.
+    """
+    parser = configparser.ConfigParser()
+    if not parser.read(ini_file) or not parser.has_section(section):
+        return {}, None
+
+    periods = {}
+    frame_budget = None
+    for name, value in parser.items(section):
+        try:
+            number = float(value)
+        except ValueError:
+            if log:
+                log("TACS Warning: Ignoring [{}] {} = {!r} in {}".format(section, name, value, ini_file))
+            continue
+        if name == "frame_budget_ms":
+            frame_budget = number / 1000.0
+        else:
+            periods[name] = max(0.0, number)
+    return periods, frame_budget
@@ -0,0 +1,84 @@
+"""
+Sector splits for the player's car from the shared-memory graphics page.
+
+AC only publishes split data for the player's car: `currentSectorIndex`
+(which sector the car is in) and `lastSectorTime` (the sector just
+completed). The app compares `currentSectorIndex` with
+`SectorTracker.sector_index` each frame and only calls `change()` when the
+two differ, so the common frame costs one integer compare.
+
+Best splits are kept per track/car as a one-line text file of
+comma-separated milliseconds, 0 for a sector without a time yet.
+"""
+
+
+class SectorTracker(object):
+    """Splits of the lap in progress plus the best split per sector."""
+
+    def __init__(self, sector_count):
+        self.sector_count = max(1, sector_count)
+        self.best = [0] * self.sector_count
+        self.splits = [0] * self.sector_count
+        self.reset()
+
+    def reset(self):
+        """Forgets the lap in progress; the next sector change only re-synchronizes."""
+        self.sector_index = -1
+        self._sector_start = 0
+        self._last_split = 0
+        self._timed = False  # whether the sector in progress started at a seen boundary
+
+    def change(self, index, last_sector_time, current_time, last_lap_time, in_pit=False):
+        """
+        Handles a currentSectorIndex change; returns True if a best split improved.
+
+        `current_time` / `last_lap_time` are iCurrentTime / iLastTime, used to
+        time the sector when lastSectorTime has not been updated yet on this frame.
+        """
+        previous = self.sector_index
+        self.sector_index = index
+        sequential = previous >= 0 and index == (previous + 1) % self.sector_count
+        # Only a sector whose start was seen (not the first sample, a reset or a pit exit) is timed.
+        timed = self._timed and sequential and not in_pit
+        self._timed = sequential and not in_pit
+
+        end = last_lap_time if index == 0 else current_time
+        estimate = end - self._sector_start
+        self._sector_start = 0 if index == 0 else current_time
+        if not timed:
+            return False
+
+        split = last_sector_time
+        if split <= 0 or split == self._last_split or abs(split - estimate) > 1000:
+            split = estimate
+        if split <= 0:
+            return False
+        self._last_split = split
+        self.splits[previous] = split
+        if not self.best[previous] or split < self.best[previous]:
+            self.best[previous] = split
+            return True
+        return False
+
+    def theoretical_best(self):
+        """Sum of the best splits, or 0 until every sector has one."""
+        if not all(self.best):
+            return 0
+        return sum(self.best)
+
+    def to_text(self):
+        return ",".join(str(split) for split in self.best) + "\n"
+
+    def load(self, path):
+        """Reads best splits saved with to_text(); returns False if missing or for a different sector count."""
+        self.best = [0] * self.sector_count
+        try:
+            with open(path, 'r') as f:
+                fields = f.readline().strip().split(",")
+            best = [int(field) for field in fields]
+        except (IOError, OSError, ValueError):
+            return False
+        if len(best) != self.sector_count:
+            return False
+        self.best = best
+        return True
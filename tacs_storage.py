@@ -0,0 +1,752 @@
+"""
+Record persistence for TrackAndCarStats.
+
+Nothing in here imports the `ac` module, so the store can be driven from a
+background thread (and from tools running outside the game, like the viewer).
+
+A track's key is the app's full track name, e.g. 'ks_nordschleife_endurance'.
+CSV stores keep it in `{track}.csv`; files from older versions named
+`rt_{track}.csv` are still read and are replaced by `{track}.csv` on the next
+save. `SqliteRecordStore` keeps every track in one indexed database and can
+import and export that CSV layout:
+
+    python tacs_storage.py import|export [--by-driver] <records dir>
+
+With --by-driver (RECORDS_BY_DRIVER in the app) records are kept per car and
+driver rather than per car.
+"""
+import os
+import csv
+import time
+import queue
+import threading
+import traceback
+
+
+def normalize_path(path):
+    """Normalizes a path to use forward slashes, which is safer across systems."""
+    return path.replace('\\', '/')
+
+
+def _no_log(message):
+    pass
+
+
+LEGACY_PREFIX = "rt_"
+
+
+def track_from_filename(filename):
+    """Track key of a records file: 'rt_suzuka_east.csv' and 'suzuka_east.csv' both give 'suzuka_east'."""
+    track = os.path.splitext(os.path.basename(filename))[0]
+    if track.startswith(LEGACY_PREFIX):
+        track = track[len(LEGACY_PREFIX):]
+    return track
+
+
+def iter_records_csv(records_file):
+    """
+    Yields (car, time_ms, driver) for each row of a `CarName,Time_ms` file, skipping malformed rows.
+
+    driver is "" unless the file has a `Driver` column (written in by-driver mode).
+    """
+    with open(records_file, 'r', newline='') as f:
+        reader = csv.reader(f)
+        try:
+            header = next(reader)
+        except StopIteration:
+            return
+        driver_column = header.index('Driver') if 'Driver' in header else -1
+
+        for row in reader:
+            try:
+                if len(row) >= 2:
+                    driver = row[driver_column] if 0 <= driver_column < len(row) else ""
+                    yield row[0], int(row[1]), driver
+            except (ValueError, IndexError):
+                pass
+
+
+def read_records_csv(records_file, by_driver=False):
+    """
+    Reads a `CarName,Time_ms` file into a {car: time_ms} dict, skipping malformed rows.
+
+    With by_driver the keys are (car, driver). A car listed more than once
+    (one row per driver) keeps its fastest time.
+    """
+    records = {}
+    for car, time_ms, driver in iter_records_csv(records_file):
+        key = (car, driver) if by_driver else car
+        if time_ms < records.get(key, float('inf')):
+            records[key] = time_ms
+    return records
+
+
+def list_records_files(records_dir):
+    """{track: path} of the CSV records files in a directory; `{track}.csv` wins over a legacy `rt_{track}.csv`."""
+    files = {}
+    if not os.path.isdir(records_dir):
+        return files
+    for filename in sorted(os.listdir(records_dir)):
+        if not filename.endswith('.csv'):
+            continue
+        track = track_from_filename(filename)
+        if track not in files or not filename.startswith(LEGACY_PREFIX):
+            files[track] = os.path.join(records_dir, filename)
+    return files
+
+
+def write_file_atomic(path, data):
+    """Writes bytes to a temp file next to `path` and renames it over `path`."""
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    temp_file = path + ".tmp"
+    with open(temp_file, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, path)
+
+
+class CsvRecordStore(object):
+    """
+    One `{track}.csv` per track holding `CarName,Time_ms` rows sorted by time.
+
+    With by_driver, records are keyed by (car, driver) and the file gets a
+    third `Driver` column; readers that only know the first two columns still
+    see each car, once per driver.
+    """
+
+    def __init__(self, records_dir, log=None, by_driver=False):
+        self.records_dir = records_dir
+        self.log = log or _no_log
+        self.by_driver = by_driver
+        self._dir_ready = False
+        self._on_disk = {}  # {track: {car: time_ms}} - worker-side copy of each written file, only touched by writes
+
+    def ensure_dir(self):
+        """Creates the records directory once; returns False if it cannot be created."""
+        if self._dir_ready:
+            return True
+        if not os.path.exists(self.records_dir):
+            try:
+                os.makedirs(self.records_dir)
+                self.log("TACS: Created records directory at {}".format(normalize_path(self.records_dir)))
+            except OSError as e:
+                self.log("TACS Error: Could not create records directory: {}".format(e))
+                return False
+        self._dir_ready = True
+        return True
+
+    def path_for(self, track):
+        """Constructs the full, normalized path to a track's records file."""
+        return normalize_path(os.path.join(self.records_dir, "{}.csv".format(track)))
+
+    def legacy_path_for(self, track):
+        return normalize_path(os.path.join(self.records_dir, "{}{}.csv".format(LEGACY_PREFIX, track)))
+
+    def read(self, track):
+        """Reads a track's records file into a {car: time_ms} dict ({} if missing)."""
+        records_file = self.path_for(track)
+        if not os.path.exists(records_file):
+            records_file = self.legacy_path_for(track)
+            if not os.path.exists(records_file):
+                return {}
+        return read_records_csv(records_file, self.by_driver)
+
+    def load(self, track):
+        """Loads records for a track ({} if there are none yet). Only reads; prepare() does the writes."""
+        try:
+            return self.read(track)
+        except Exception:
+            self.log("TACS Error loading records for {}: {}".format(track, traceback.format_exc()))
+        return {}
+
+    def prepare(self, track):
+        """Run by the saver after a load: creates an empty records file if the track has none yet."""
+        if not self.ensure_dir():
+            return
+        if os.path.exists(self.path_for(track)) or os.path.exists(self.legacy_path_for(track)):
+            return
+        self.write(track, {})
+        self.log("TACS: Created new records file for {}".format(track))
+
+    def write(self, track, records):
+        """Rewrites a track's records file, sorted fastest first.
+
+        The new contents go to a temporary file that is then renamed over the
+        old one, so readers (and crashes) only ever see a complete file.
+        """
+        if not self.ensure_dir():
+            return
+
+        records_file = self.path_for(track)
+        temp_file = records_file + ".tmp"
+        with open(temp_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            ordered = sorted(records.items(), key=lambda item: item[1])
+            if self.by_driver:
+                writer.writerow(['CarName', 'Time_ms', 'Driver'])
+                for (technical_name, driver), time_ms in ordered:
+                    writer.writerow([technical_name, time_ms, driver])
+            else:
+                writer.writerow(['CarName', 'Time_ms'])
+                for technical_name, time_ms in ordered:
+                    writer.writerow([technical_name, time_ms])
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_file, records_file)
+        self._on_disk[track] = records
+
+        legacy_file = self.legacy_path_for(track)
+        if os.path.exists(legacy_file):
+            # Its records were read before this write, so {track}.csv now replaces it.
+            os.remove(legacy_file)
+            self.log("TACS: Replaced {} with {}".format(normalize_path(legacy_file), records_file))
+
+    def commit(self, track, improvements):
+        """Merges {car: time_ms} improvements into a track's file with a single write."""
+        records = self._on_disk.get(track)
+        if records is None:
+            records = self.read(track)
+
+        for technical_name, time_ms in improvements.items():
+            if time_ms < records.get(technical_name, float('inf')):
+                records[technical_name] = time_ms
+
+        self.write(track, records)
+        self.log("TACS: Successfully saved {} records for track {}".format(len(records), track))
+
+    def close(self):
+        """Called once on shutdown after the saver has drained."""
+        pass
+
+
+class JournalRecordStore(CsvRecordStore):
+    """
+    CSV store plus an append-only `{track}.journal` of improvements.
+
+    Each improvement is one `car,time_ms,timestamp` line (plus `,driver` in
+    by-driver mode) appended to the journal. The sorted `{track}.csv` the viewer reads is only rewritten when
+    a track's journal reaches `compact_every` lines and on shutdown. Replaying
+    the journal keeps the minimum per car, so a crash between rewriting the
+    CSV and truncating the journal is harmless.
+    """
+
+    def __init__(self, records_dir, compact_every=50, log=None, by_driver=False):
+        CsvRecordStore.__init__(self, records_dir, log, by_driver)
+        self.compact_every = compact_every
+        self._appends = {}  # {track: journal lines not yet compacted}
+
+    def journal_path_for(self, track):
+        return normalize_path(os.path.join(self.records_dir, "{}.journal".format(track)))
+
+    def replay(self, track, records):
+        """Applies a track's journal to `records`; returns the number of entries read."""
+        journal_file = self.journal_path_for(track)
+        if not os.path.exists(journal_file):
+            return 0
+
+        entries = 0
+        with open(journal_file, 'r', newline='') as f:
+            for row in csv.reader(f):
+                if len(row) < 3:
+                    continue  # e.g. a line cut short by a crash
+                try:
+                    time_ms = int(row[1])
+                except ValueError:
+                    continue
+                key = (row[0], row[3] if len(row) > 3 else "") if self.by_driver else row[0]
+                entries += 1
+                if time_ms < records.get(key, float('inf')):
+                    records[key] = time_ms
+        return entries
+
+    def load(self, track):
+        """Loads a track's CSV and replays its journal on top. Only reads; prepare() does the writes."""
+        records = CsvRecordStore.load(self, track)
+        try:
+            self.replay(track, records)
+        except Exception:
+            self.log("TACS Error replaying journal for {}: {}".format(track, traceback.format_exc()))
+        return records
+
+    def prepare(self, track):
+        """Run by the saver after a load: also compacts a journal left over from an earlier session."""
+        CsvRecordStore.prepare(self, track)
+        journal_file = self.journal_path_for(track)
+        if self._appends.get(track) is None and os.path.exists(journal_file) and os.path.getsize(journal_file):
+            # The session did not shut down cleanly; folding the journal in now
+            # also drops any line a crash cut short before new lines follow it.
+            self.compact(track)
+
+    def commit(self, track, improvements):
+        """Appends improvements to the track's journal, compacting every `compact_every` lines."""
+        if not self.ensure_dir():
+            return
+
+        timestamp = int(time.time())
+        with open(self.journal_path_for(track), 'a', newline='') as f:
+            writer = csv.writer(f)
+            for key, time_ms in improvements.items():
+                if self.by_driver:
+                    writer.writerow([key[0], time_ms, timestamp, key[1]])
+                else:
+                    writer.writerow([key, time_ms, timestamp])
+            f.flush()
+            os.fsync(f.fileno())
+
+        appends = self._appends.get(track, 0) + len(improvements)
+        self._appends[track] = appends
+        if appends >= self.compact_every:
+            self.compact(track)
+
+    def compact(self, track):
+        """Folds a track's journal into its sorted CSV and empties the journal."""
+        records = self.read(track)
+        self.replay(track, records)
+        self.write(track, records)
+        open(self.journal_path_for(track), 'w').close()
+        self._appends[track] = 0
+        self.log("TACS: Compacted journal into {} records for track {}".format(len(records), track))
+
+    def close(self):
+        """Compacts every track that still has journal lines."""
+        for track, appends in list(self._appends.items()):
+            if not appends:
+                continue
+            try:
+                self.compact(track)
+            except Exception:
+                self.log("TACS Error compacting records for {}: {}".format(track, traceback.format_exc()))
+
+
+class SqliteRecordStore(object):
+    """
+    All tracks' records in one SQLite database, `records.db` in the records directory.
+
+    The database runs in WAL mode, so the viewer can read while the game
+    writes. (track, car, driver) is the primary key, and (car, time_ms) and
+    (driver, time_ms) indexes serve cross-track queries like
+    `tracks_for_car()`. Outside by-driver mode every row has driver "", and
+    readers that want one time per car take the fastest of a car's rows. A new
+    database imports the CSV files already in the directory. Requires the
+    sqlite3 module, which not every Python build has; construction raises
+    ImportError without it.
+    """
+
+    FILENAME = "records.db"
+
+    def __init__(self, records_dir, log=None, filename=FILENAME, by_driver=False):
+        import sqlite3
+        self.records_dir = records_dir
+        self.log = log or _no_log
+        self.by_driver = by_driver
+        self.path = os.path.join(records_dir, filename)
+        self._lock = threading.Lock()
+        if not os.path.isdir(records_dir):
+            os.makedirs(records_dir)
+        is_new = not os.path.exists(self.path)
+        # One connection shared by the frame thread (loads) and the saver thread (commits).
+        self._db = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            columns = [row[1] for row in self._db.execute("PRAGMA table_info(records)")]
+            if columns and 'driver' not in columns:
+                # Databases from before by-driver records: rebuild with the wider primary key.
+                self._db.execute("ALTER TABLE records RENAME TO records_old")
+            self._db.execute("CREATE TABLE IF NOT EXISTS records ("
+                             "track TEXT NOT NULL, car TEXT NOT NULL, driver TEXT NOT NULL DEFAULT '', "
+                             "time_ms INTEGER NOT NULL, updated REAL NOT NULL, PRIMARY KEY (track, car, driver))")
+            if columns and 'driver' not in columns:
+                self._db.execute("INSERT INTO records (track, car, time_ms, updated) "
+                                 "SELECT track, car, time_ms, updated FROM records_old")
+                self._db.execute("DROP TABLE records_old")
+            self._db.execute("CREATE INDEX IF NOT EXISTS records_by_car ON records (car, time_ms)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS records_by_driver ON records (driver, time_ms)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS records_by_update ON records (updated)")
+        if is_new:
+            imported = self.import_csv(records_dir)
+            if imported:
+                self.log("TACS: Imported {} records from CSV into {}".format(imported, normalize_path(self.path)))
+
+    def load(self, track):
+        """{car: time_ms} for a track, or {(car, driver): time_ms} in by-driver mode."""
+        with self._lock:
+            if self.by_driver:
+                rows = self._db.execute("SELECT car, driver, time_ms FROM records WHERE track = ?", (track,))
+                return dict(((car, driver), time_ms) for car, driver, time_ms in rows)
+            rows = self._db.execute("SELECT car, MIN(time_ms) FROM records WHERE track = ? GROUP BY car",
+                                    (track,)).fetchall()
+        return dict(rows)
+
+    def prepare(self, track):
+        """Nothing to write after a load; the database was set up when it was opened."""
+        pass
+
+    def commit(self, track, improvements):
+        """Stores improvements keyed like load() returns them; a time only replaces a slower one."""
+        now = time.time()
+        if self.by_driver:
+            rows = [(track, car, driver, time_ms, now) for (car, driver), time_ms in improvements.items()]
+        else:
+            rows = [(track, car, "", time_ms, now) for car, time_ms in improvements.items()]
+        with self._lock, self._db:
+            self._db.executemany("INSERT OR IGNORE INTO records (track, car, driver, time_ms, updated) "
+                                 "VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.executemany("UPDATE records SET time_ms = ?, updated = ? "
+                                 "WHERE track = ? AND car = ? AND driver = ? AND time_ms > ?",
+                                 [(time_ms, now, track, car, driver, time_ms) for track, car, driver, time_ms, now in rows])
+
+    def all_records(self):
+        """[(track, car, time_ms)] with each car's fastest time on every track."""
+        with self._lock:
+            return self._db.execute("SELECT track, car, MIN(time_ms) FROM records GROUP BY track, car").fetchall()
+
+    def tracks(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT DISTINCT track FROM records ORDER BY track")]
+
+    def tracks_for_car(self, car):
+        """[(track, time_ms)] of every track where `car` has a record, fastest first."""
+        with self._lock:
+            return self._db.execute("SELECT track, MIN(time_ms) AS best FROM records WHERE car = ? "
+                                    "GROUP BY track ORDER BY best", (car,)).fetchall()
+
+    def tracks_for_driver(self, driver):
+        """[(track, car, time_ms)] of the driver's fastest car on every track they have a record on, fastest first."""
+        with self._lock:
+            return self._db.execute("SELECT track, car, MIN(time_ms) AS best FROM records WHERE driver = ? "
+                                    "GROUP BY track ORDER BY best", (driver,)).fetchall()
+
+    def changed_since(self, since):
+        """(tracks with a record updated after `since`, newest update time) for change polling."""
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT track FROM records WHERE updated > ?", (since,)).fetchall()
+            newest = self._db.execute("SELECT MAX(updated) FROM records").fetchone()[0]
+        return [row[0] for row in rows], newest or since
+
+    def data_version(self):
+        """Changes whenever another connection commits (PRAGMA data_version)."""
+        with self._lock:
+            return self._db.execute("PRAGMA data_version").fetchone()[0]
+
+    def import_csv(self, csv_dir):
+        """Merges every `{track}.csv` (or legacy `rt_{track}.csv`) in a directory; returns the rows read."""
+        imported = 0
+        for track, path in list_records_files(csv_dir).items():
+            try:
+                records = read_records_csv(path, self.by_driver)
+            except Exception:
+                self.log("TACS Error importing {}: {}".format(normalize_path(path), traceback.format_exc()))
+                continue
+            if records:
+                self.commit(track, records)
+                imported += len(records)
+        return imported
+
+    def export_csv(self, csv_dir):
+        """Writes every track as `{track}.csv` in a directory; returns the number of files."""
+        store = CsvRecordStore(csv_dir, self.log, self.by_driver)
+        tracks = self.tracks()
+        for track in tracks:
+            store.write(track, self.load(track))
+        return len(tracks)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_STOP = object()
+
+
+class RecordSaver(object):
+    """
+    Write-behind persistence worker.
+
+    The frame thread calls `submit()`, which only touches memory. Improvements
+    for a track that is already waiting to be written are merged into that
+    pending write, and the bounded queue only carries wake-ups, so a full queue
+    never loses data: the worker drains every pending track on each wake-up.
+    `submit_file()` does the same for whole files (e.g. reference laps), where
+    a newer submit for the same path replaces the pending one,
+    `submit_append()` queues bytes to add to the end of a file (in order),
+    `submit_lap()` queues a lap for the optional lap history, and
+    `submit_prepare()` queues the writes a store's read-only `load()` left
+    over (creating a new track's file, compacting a leftover journal).
+
+    `request_file()` has the worker read a file, after any writes queued
+    before it; the frame thread collects the bytes with `take_file()`.
+    """
+
+    def __init__(self, store, max_queue=32, log=None, history=None):
+        self.store = store
+        self.history = history  # tacs_history.LapHistory, or None
+        self.log = log or _no_log
+        self._queue = queue.Queue(max_queue)
+        self._pending = {}  # {track: {car: time_ms}}
+        self._pending_files = {}  # {path: bytes}
+        self._pending_appends = {}  # {path: [bytes]} in submit order
+        self._pending_reads = []  # paths to read, in request order
+        self._pending_prepares = []  # tracks loaded since the last drain, for store.prepare()
+        self._loaded = {}  # {path: bytes, or None if unreadable} read but not yet taken
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()  # Held by whichever thread is draining, so no file is written twice at once
+        self._thread = None
+        self.stats = {
+            'records': 0,  # car times submitted
+            'files': 0,    # whole files and appended chunks submitted
+            'laps': 0,     # laps submitted for the history
+            'coalesced': 0,
+            'writes': 0,
+            'errors': 0,
+            'dropped_wakeups': 0,
+            'last_write_ms': 0.0,
+            'max_write_ms': 0.0,
+            'total_write_ms': 0.0,
+        }
+
+    def start(self):
+        """Starts the worker thread if it is not already running."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._run, name="TACS-RecordSaver")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, track, technical_name, time_ms):
+        """Queues a new best time for a car. Never blocks and never touches the disk."""
+        with self._lock:
+            self.stats['records'] += 1
+            pending = self._pending.get(track)
+            if pending is None:
+                pending = self._pending[track] = {}
+                needs_wakeup = True
+            else:
+                self.stats['coalesced'] += 1
+                needs_wakeup = False
+            if time_ms < pending.get(technical_name, float('inf')):
+                pending[technical_name] = time_ms
+
+        if needs_wakeup:
+            self._wake(track)
+
+    def submit_file(self, path, data):
+        """Queues bytes to be written atomically to `path` by the worker."""
+        with self._lock:
+            self.stats['files'] += 1
+            needs_wakeup = path not in self._pending_files
+            if not needs_wakeup:
+                self.stats['coalesced'] += 1
+            self._pending_files[path] = data
+
+        if needs_wakeup:
+            self._wake(path)
+
+    def submit_append(self, path, data):
+        """Queues bytes to be appended to `path` by the worker, after any queued before them."""
+        with self._lock:
+            self.stats['files'] += 1
+            chunks = self._pending_appends.get(path)
+            if chunks is None:
+                chunks = self._pending_appends[path] = []
+                needs_wakeup = True
+            else:
+                self.stats['coalesced'] += 1
+                needs_wakeup = False
+            chunks.append(data)
+
+        if needs_wakeup:
+            self._wake(path)
+
+    def submit_prepare(self, track):
+        """Queues store.prepare(track), run by the worker before any records for it are written."""
+        with self._lock:
+            if track in self._pending_prepares:
+                return
+            self._pending_prepares.append(track)
+        self._wake(track)
+
+    def request_file(self, path):
+        """Queues a read of `path` by the worker; take_file() returns it once done."""
+        with self._lock:
+            self._loaded.pop(path, None)
+            if path not in self._pending_reads:
+                self._pending_reads.append(path)
+        self._wake(path)
+
+    def take_file(self, path):
+        """(True, bytes or None if unreadable) once a requested read is done, else (False, None)."""
+        with self._lock:
+            if path in self._loaded:
+                return True, self._loaded.pop(path)
+        return False, None
+
+    def submit_lap(self, track, timestamp, time_ms, car, driver, session=-1):
+        """Queues a completed lap for the lap history; a no-op without one."""
+        if self.history is None:
+            return
+        self.stats['laps'] += 1
+        needs_wakeup = not self.history.pending()
+        self.history.append(track, timestamp, time_ms, car, driver, session)
+        if needs_wakeup:
+            self._wake(track)
+
+    def _wake(self, item):
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.stats['dropped_wakeups'] += 1
+
+    def queue_depth(self):
+        """Number of car records, files and laps waiting to be written."""
+        with self._lock:
+            depth = sum(len(pending) for pending in self._pending.values()) + len(self._pending_files)
+            depth += sum(len(chunks) for chunks in self._pending_appends.values())
+        return depth + (self.history.pending() if self.history is not None else 0)
+
+    def average_write_ms(self):
+        writes = self.stats['writes']
+        return self.stats['total_write_ms'] / writes if writes else 0.0
+
+    def flush(self):
+        """Writes everything pending on the calling thread."""
+        self._drain()
+
+    def stop(self, timeout=5.0):
+        """
+        Stops the worker after it has written everything pending; returns
+        False if it is still busy after `timeout`, in which case it is left
+        to finish on its own.
+        """
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=timeout)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+            if thread.is_alive():
+                self.log("TACS Warning: Record saver still writing after {:g}s; {} items pending".format(
+                    timeout, self.queue_depth()))
+                return False
+        self._thread = None
+        # Anything the worker did not get to (or never started for) is written here.
+        self._drain()
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            self._drain()
+            if item is _STOP:
+                break
+
+    def _drain(self):
+        with self._write_lock:
+            self._write_pending()
+
+    def _write_pending(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            pending_files, self._pending_files = self._pending_files, {}
+            pending_appends, self._pending_appends = self._pending_appends, {}
+            pending_reads, self._pending_reads = self._pending_reads, []
+            pending_prepares, self._pending_prepares = self._pending_prepares, []
+
+        for track in pending_prepares:
+            try:
+                self.store.prepare(track)
+            except Exception:
+                self.stats['errors'] += 1
+                self.log("TACS Error preparing records for {}: {}".format(track, traceback.format_exc()))
+
+        for track, improvements in pending.items():
+            start = time.perf_counter()
+            try:
+                self.store.commit(track, improvements)
+            except Exception:
+                self.stats['errors'] += 1
+                self.log("TACS Error saving records for {}: {}".format(track, traceback.format_exc()))
+                continue
+            self._count_write(start)
+
+        for path, data in pending_files.items():
+            start = time.perf_counter()
+            try:
+                write_file_atomic(path, data)
+            except Exception:
+                self.stats['errors'] += 1
+                self.log("TACS Error writing {}: {}".format(normalize_path(path), traceback.format_exc()))
+                continue
+            self._count_write(start)
+
+        for path, chunks in pending_appends.items():
+            start = time.perf_counter()
+            try:
+                with open(path, 'ab') as f:
+                    for data in chunks:
+                        f.write(data)
+            except Exception:
+                self.stats['errors'] += 1
+                self.log("TACS Error appending to {}: {}".format(normalize_path(path), traceback.format_exc()))
+                continue
+            self._count_write(start)
+
+        if self.history is not None and self.history.pending():
+            start = time.perf_counter()
+            errors = self.history.errors
+            try:
+                self.history.flush()
+            except Exception:
+                self.stats['errors'] += 1
+                self.log("TACS Error writing lap history: {}".format(traceback.format_exc()))
+            else:
+                # flush() logs a failed track itself and keeps its laps for the next drain.
+                self.stats['errors'] += self.history.errors - errors
+                self._count_write(start)
+
+        for path in pending_reads:
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            except (IOError, OSError):
+                data = None
+            with self._lock:
+                self._loaded[path] = data
+
+    def _count_write(self, start):
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        self.stats['writes'] += 1
+        self.stats['last_write_ms'] = elapsed_ms
+        self.stats['total_write_ms'] += elapsed_ms
+        if elapsed_ms > self.stats['max_write_ms']:
+            self.stats['max_write_ms'] = elapsed_ms
+
+
+def main(argv=None):
+    """Imports a directory of CSV records into its records.db, or exports records.db back to CSV."""
+    import sys
+    argv = sys.argv[1:] if argv is None else list(argv)
+    by_driver = "--by-driver" in argv
+    if by_driver:
+        argv.remove("--by-driver")
+    if len(argv) != 2 or argv[0] not in ("import", "export"):
+        print("usage: tacs_storage.py import|export [--by-driver] <records dir>")
+        return 2
+    command, records_dir = argv
+    store = SqliteRecordStore(records_dir, log=print, by_driver=by_driver)
+    try:
+        if command == "import":
+            print("{} records imported into {}".format(store.import_csv(records_dir), normalize_path(store.path)))
+        else:
+            print("{} tracks exported to {}".format(store.export_csv(records_dir), normalize_path(records_dir)))
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,291 @@
+"""
+Physics-rate telemetry of the player's car, recorded into a ring file.
+
+A background thread watches the physics page's packetId and, for every new
+physics step, copies the wanted fields straight from the shared-memory pages
+into the next fixed-size slot of a preallocated, memory-mapped file with
+`ctypes.memmove`. Source and destination addresses are worked out once (and
+again when the player's slot in the graphics page moves), so a sample creates
+no per-field Python objects and never goes through acUpdate.
+
+AC steps physics at 333 Hz. The thread polls every 2 ms, which sees every
+3 ms step at least once; on Windows it holds the system timer at 1 ms
+resolution (timeBeginPeriod) while recording, as the default 15.6 ms tick
+would cap it at 64 polls a second. Steps that are skipped anyway show up as
+gaps in packetId and are counted in `missed`; `rate()` is the sampling rate
+actually achieved.
+
+File layout: a `RingHeader`, then `capacity` `TelemetryRecord` slots. The
+header's `count` is the number of samples ever written; slot `count %
+capacity` is the next one to be overwritten, so the newest `capacity` samples
+are always on disk.
+
+`TelemetryReader` maps a ring file for offline analysis and returns the
+samples, oldest first, as NumPy record arrays, optionally split per lap.
+"""
+import os
+import mmap
+import time
+import ctypes
+import threading
+from ctypes import c_char, c_float, c_int32, c_uint32, c_uint64
+
+from third_party.sim_info import SPageFilePhysics, SPageFileGraphic, numpy_dtype
+
+MAGIC = b"TACSTEL1"
+MAX_COPY_ATTEMPTS = 4  # Copies of one sample tried before giving it up as torn
+
+
+class RingHeader(ctypes.Structure):
+    _pack_ = 4
+    _fields_ = [
+        ('magic', c_char * 8),
+        ('record_size', c_uint32),
+        ('capacity', c_uint32),
+        ('count', c_uint64),
+    ]
+
+
+class TelemetryRecord(ctypes.Structure):
+    """One physics step. Field names match the page fields they are copied from."""
+    _pack_ = 4
+    _fields_ = [
+        # Physics page, packetId..speedKmh in one copy
+        ('packetId', c_int32),
+        ('gas', c_float),
+        ('brake', c_float),
+        ('fuel', c_float),
+        ('gear', c_int32),
+        ('rpms', c_int32),
+        ('steerAngle', c_float),
+        ('speedKmh', c_float),
+        ('clutch', c_float),
+        # Graphics page
+        ('completedLaps', c_int32),
+        ('iCurrentTime', c_int32),
+        ('normalizedCarPosition', c_float),
+        ('carCoordinates', c_float * 3),  # the player's x, y, z
+    ]
+
+
+def _offset(structure, name):
+    return getattr(structure, name).offset
+
+
+def _copy_plan(physics, graphics, player_index):
+    """[(record offset, source address, size)] for every field of TelemetryRecord."""
+    physics_address = ctypes.addressof(physics)
+    graphics_address = ctypes.addressof(graphics)
+    head_size = _offset(SPageFilePhysics, 'speedKmh') + 4
+    coordinates = _offset(SPageFileGraphic, 'carCoordinates') + player_index * 3 * ctypes.sizeof(c_float)
+    return [
+        (0, physics_address, head_size),
+        (_offset(TelemetryRecord, 'clutch'), physics_address + _offset(SPageFilePhysics, 'clutch'), 4),
+        (_offset(TelemetryRecord, 'completedLaps'), graphics_address + _offset(SPageFileGraphic, 'completedLaps'), 4),
+        (_offset(TelemetryRecord, 'iCurrentTime'), graphics_address + _offset(SPageFileGraphic, 'iCurrentTime'), 4),
+        (_offset(TelemetryRecord, 'normalizedCarPosition'),
+         graphics_address + _offset(SPageFileGraphic, 'normalizedCarPosition'), 4),
+        (_offset(TelemetryRecord, 'carCoordinates'), graphics_address + coordinates, 3 * ctypes.sizeof(c_float)),
+    ]
+
+
+def _timer_resolution(begin):
+    """Holds (or releases) Windows' 1 ms timer resolution; returns False where there is none to set."""
+    if os.name != 'nt':
+        return False
+    try:
+        winmm = ctypes.WinDLL('winmm')
+        (winmm.timeBeginPeriod if begin else winmm.timeEndPeriod)(1)
+    except (AttributeError, OSError):
+        return False
+    return True
+
+
+def player_index(graphics):
+    """Index of the player's car in the graphics page's per-car arrays (0 if not listed)."""
+    player = graphics.playerCarID
+    for index in range(min(max(graphics.activeCars, 1), 60)):
+        if graphics.carID[index] == player:
+            return index
+    return 0
+
+
+class TelemetryRing(object):
+    """A preallocated ring file of TelemetryRecords, opened for writing (any previous recording is discarded)."""
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = capacity
+        self.record_size = ctypes.sizeof(TelemetryRecord)
+        size = ctypes.sizeof(RingHeader) + capacity * self.record_size
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self._file = open(path, 'w+b')
+        self._file.truncate(size)
+        self._map = mmap.mmap(self._file.fileno(), size)
+        self.header = RingHeader.from_buffer(self._map)
+        self.header.magic = MAGIC
+        self.header.record_size = self.record_size
+        self.header.capacity = capacity
+        self.header.count = 0
+        self._slots = c_char.from_buffer(self._map, ctypes.sizeof(RingHeader))
+        self.slots_address = ctypes.addressof(self._slots)
+
+    def close(self):
+        if self._map is None:
+            return
+        self.header = self._slots = None
+        self._map.flush()
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+        self._file.close()
+        self._map = None
+
+
+class TelemetryRecorder(object):
+    """Copies a TelemetryRecord per physics step into a TelemetryRing from a background thread."""
+
+    def __init__(self, ring, physics, graphics, interval=0.002):
+        self.ring = ring
+        self.physics = physics
+        self.graphics = graphics
+        self.interval = interval
+        self.samples = 0
+        self.torn = 0     # copies redone because the sim stepped during them
+        self.missed = 0   # physics steps never sampled (gaps in packetId)
+        self.replans = 0  # times the player's slot moved
+        self._started = None
+        self._stopped = None
+        self._player_index = 0
+        self._copies = None
+        self.plan()
+        self._last_packet = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def plan(self):
+        """Works out the copies for the player's current slot in the graphics page."""
+        self._player_index = player_index(self.graphics)
+        self._copies = _copy_plan(self.physics, self.graphics, self._player_index)
+
+    def sample(self):
+        """Records the current physics step unless it was already recorded; returns True if it did."""
+        physics = self.physics
+        packet = physics.packetId
+        if packet == self._last_packet:
+            return False
+        graphics = self.graphics
+        if graphics.carID[self._player_index] != graphics.playerCarID:
+            # Someone joined or left and the player's coordinates moved.
+            self.replans += 1
+            self.plan()
+        ring = self.ring
+        header = ring.header
+        count = header.count
+        slot = ring.slots_address + (count % ring.capacity) * ring.record_size
+        memmove = ctypes.memmove
+        copies = self._copies
+        for _ in range(MAX_COPY_ATTEMPTS):
+            for offset, source, size in copies:
+                memmove(slot + offset, source, size)
+            copied = physics.packetId
+            if copied == packet:
+                break
+            # The sim stepped during the copy: copy the newer step instead.
+            self.torn += 1
+            packet = copied
+        else:
+            return False  # Still stepping under every copy; the next poll tries again
+        if self._last_packet is not None and packet > self._last_packet + 1:
+            self.missed += packet - self._last_packet - 1
+        header.count = count + 1
+        self._last_packet = packet
+        self.samples += 1
+        return True
+
+    def rate(self):
+        """Samples per second since start(), up to stop() if it has been called."""
+        if self._started is None:
+            return 0.0
+        elapsed = (self._stopped or time.time()) - self._started
+        return self.samples / elapsed if elapsed > 0 else 0.0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._started = time.time()
+        self._stopped = None
+        self._thread = threading.Thread(target=self._run, name="TACS-Telemetry")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+            self._stopped = time.time()
+
+    def _run(self):
+        sample, wait, interval = self.sample, self._stop.wait, self.interval
+        fine_timer = _timer_resolution(True)
+        try:
+            while not wait(interval):
+                sample()
+        finally:
+            if fine_timer:
+                _timer_resolution(False)
+
+
+class TelemetryReader(object):
+    """Read-only view of a ring file written by TelemetryRecorder (requires NumPy)."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = RingHeader.from_buffer_copy(self._map)
+        if header.magic != MAGIC or header.record_size != ctypes.sizeof(TelemetryRecord):
+            self._map.close()
+            raise ValueError("{} is not a telemetry ring file of this version".format(path))
+        self.capacity = header.capacity
+        self.count = header.count
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def records(self):
+        """Every sample still in the ring, oldest first, as a NumPy record array."""
+        import numpy
+        dtype = numpy_dtype(TelemetryRecord)
+        slots = numpy.frombuffer(self._map, dtype=dtype, count=self.capacity, offset=ctypes.sizeof(RingHeader))
+        if self.count <= self.capacity:
+            return slots[:self.count]
+        start = self.count % self.capacity
+        return numpy.concatenate((slots[start:], slots[:start]))
+
+    def laps(self):
+        """[(completedLaps, records)] for each run of samples with the same lap count."""
+        import numpy
+        records = self.records()
+        if not len(records):
+            return []
+        boundaries = numpy.flatnonzero(numpy.diff(records['completedLaps'])) + 1
+        return [(int(chunk['completedLaps'][0]), chunk) for chunk in numpy.split(records, boundaries)]
+
+    def close(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass  # an array from records() still points into the map
+            self._map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
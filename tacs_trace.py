@@ -0,0 +1,310 @@
+"""
+Capture and replay of the values the app reads from the ac API.
+
+A `TraceRecorder` stands in for the `ac` module while capturing: every getter
+call is forwarded to the real module and its result is written to a compact
+binary trace, together with each frame's clock and deltaT, the session's
+starting records and every console message (which is how PBs are announced).
+Only changes are written, so values that stay put (car names, LastLap between
+laps) cost nothing after the first frame they are read.
+
+A `TraceReplay` reads the trace back frame by frame, and `ReplayAc` answers
+the same getter calls from it, so the app's entry points can be driven
+offline. A value is looked up by (function, arguments) and carries forward
+until the trace changes it; code that asks for something the capture never
+read gets `None`-like defaults (0 or ""), so replays stay deterministic even
+after the app's call pattern has changed.
+
+Trace layout (little endian): the magic, the capture start time, the
+acsys.CS names and values, then tagged records:
+
+    K key_id name args   - defines key_id as the call name(*args)
+    V key_id value       - the call last returned value
+    F now deltaT         - a new acUpdate frame starts
+    M text               - a console message
+    R track car time_ms  - a record that existed when capture started
+
+Values are tagged: n (None), i (int64), f (double), s (utf-8 string) or
+t (tuple of values).
+
+The recorder buffers the trace in memory and hands every 256 KB to an
+`append(path, data)` callable; the app passes its RecordSaver's
+submit_append, so the disk write happens on the saver thread and not in
+acUpdate. A capture comes to about 2.5 KB per second with one car and 9 KB
+per second with 20, most of it the per-car spline positions and lap timers
+that change every frame.
+"""
+import struct
+
+MAGIC = b"TACSTRC1"
+
+_U8 = struct.Struct("<B")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_I32 = struct.Struct("<i")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+_FRAME = struct.Struct("<dd")
+
+_MISSING = object()
+_STRING_GETTERS = ("getCarName", "getDriverName", "getCarSkin", "getTrackName", "getTrackConfiguration")
+_FLUSH_BYTES = 1 << 18
+
+
+class TraceError(Exception):
+    """The file is not a trace, or is damaged."""
+
+
+def is_traced(name):
+    """Getter calls whose results feed the app's logic (label read-backs are UI state, not input)."""
+    return (name.startswith("get") and name != "getText") or name == "isConnected"
+
+
+def _encode_value(out, value):
+    if value is None:
+        out += b"n"
+    elif isinstance(value, (bool, int)):
+        out += b"i"
+        out += _I64.pack(int(value))
+    elif isinstance(value, float):
+        out += b"f"
+        out += _F64.pack(value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        out += b"s"
+        out += _U32.pack(len(data))
+        out += data
+    elif isinstance(value, (tuple, list)):
+        out += b"t"
+        out += _U8.pack(len(value))
+        for item in value:
+            _encode_value(out, item)
+    else:
+        _encode_value(out, str(value))
+
+
+def _append_file(path, data):
+    with open(path, "ab") as f:
+        f.write(data)
+
+
+def _encode_str(out, text):
+    data = text.encode("utf-8")
+    out += _U8.pack(len(data))
+    out += data
+
+
+class TraceRecorder(object):
+    """Proxy for the `ac` module that writes every getter result to a trace file."""
+
+    def __init__(self, ac_module, path, cs, start_time, append=None):
+        """append(path, data) adds a chunk to the end of the trace file; by default it writes on the calling thread."""
+        self._ac = ac_module
+        self.path = path
+        self._append = append or _append_file
+        open(path, "wb").close()
+        self.closed = False
+        self._out = bytearray(MAGIC)
+        self._out += _F64.pack(start_time)
+        names = sorted(name for name in dir(cs) if not name.startswith("_") and isinstance(getattr(cs, name), int))
+        self._out += _U16.pack(len(names))
+        for name in names:
+            _encode_str(self._out, name)
+            self._out += _I32.pack(int(getattr(cs, name)))
+        self._keys = {}  # {(name, args): key_id}
+        self._last = {}  # {key_id: value last written}
+        self.frames = 0
+
+    def __getattr__(self, name):
+        target = getattr(self._ac, name)
+        if is_traced(name):
+            wrapper = self._recording(name, target)
+        elif name == "console":
+            wrapper = self._console(target)
+        else:
+            wrapper = target
+        setattr(self, name, wrapper)
+        return wrapper
+
+    def _recording(self, name, target):
+        keys, last, out = self._keys, self._last, self._out
+
+        def call(*args):
+            value = target(*args)
+            key = (name, args)
+            key_id = keys.get(key)
+            if key_id is None:
+                key_id = keys[key] = len(keys)
+                out.extend(b"K")
+                out.extend(_U32.pack(key_id))
+                _encode_str(out, name)
+                out.extend(_U8.pack(len(args)))
+                for arg in args:
+                    _encode_value(out, arg)
+            if last.get(key_id, _MISSING) != value:
+                last[key_id] = value
+                out.extend(b"V")
+                out.extend(_U32.pack(key_id))
+                _encode_value(out, value)
+            return value
+        return call
+
+    def _console(self, target):
+        out = self._out
+
+        def console(message):
+            out.extend(b"M")
+            _encode_value(out, message)
+            return target(message)
+        return console
+
+    def records_snapshot(self, track, records):
+        """Stores the records a session started with, so a replay can start from the same state."""
+        out = self._out
+        for technical_name, time_ms in records.items():
+            out.extend(b"R")
+            _encode_value(out, track)
+            _encode_value(out, technical_name)
+            out.extend(_I32.pack(time_ms))
+
+    def frame(self, now, delta_t):
+        """Marks the start of an acUpdate frame; call before the frame's first ac call."""
+        out = self._out
+        if len(out) >= _FLUSH_BYTES:
+            self._append(self.path, bytes(out))
+            del out[:]
+        out.extend(b"F")
+        out.extend(_FRAME.pack(now, delta_t))
+        self.frames += 1
+
+    def close(self):
+        """Hands over what is still buffered; the trace is complete once the append callable has written it."""
+        if self.closed:
+            return
+        self._append(self.path, bytes(self._out))
+        del self._out[:]
+        self.closed = True
+
+
+class TraceReplay(object):
+    """Reads a trace back one frame at a time, keeping the current value of every key."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._data = memoryview(f.read())
+        if bytes(self._data[:len(MAGIC)]) != MAGIC:
+            raise TraceError("{} is not a TACS trace".format(path))
+        self._pos = len(MAGIC)
+        self.start_time = self._read(_F64)
+        self.cs = {}
+        for _ in range(self._read(_U16)):
+            name = self._read_str()
+            self.cs[name] = self._read(_I32)
+        self.now = self.start_time
+        self.delta_t = 0.0
+        self.values = {}           # {(name, args): value}
+        self.messages = []         # [(frame, text)] console messages seen at capture
+        self.initial_records = {}  # {track: {car: time_ms}}
+        self.frame_index = 0
+        self._keys = {}            # {key_id: (name, args)}
+        self._read_block()
+
+    def _read(self, packer):
+        value = packer.unpack_from(self._data, self._pos)[0]
+        self._pos += packer.size
+        return value
+
+    def _read_str(self):
+        length = self._read(_U8)
+        text = bytes(self._data[self._pos:self._pos + length]).decode("utf-8")
+        self._pos += length
+        return text
+
+    def _read_value(self):
+        tag = self._data[self._pos:self._pos + 1].tobytes()
+        self._pos += 1
+        if tag == b"n":
+            return None
+        if tag == b"i":
+            return self._read(_I64)
+        if tag == b"f":
+            return self._read(_F64)
+        if tag == b"s":
+            length = self._read(_U32)
+            text = bytes(self._data[self._pos:self._pos + length]).decode("utf-8")
+            self._pos += length
+            return text
+        if tag == b"t":
+            return tuple(self._read_value() for _ in range(self._read(_U8)))
+        raise TraceError("Unknown value tag {!r} at byte {}".format(tag, self._pos - 1))
+
+    def _read_block(self):
+        """Applies records up to the next frame marker (or the end); False at the end."""
+        data, end = self._data, len(self._data)
+        while self._pos < end:
+            tag = data[self._pos:self._pos + 1].tobytes()
+            if tag == b"F":
+                return True
+            self._pos += 1
+            if tag == b"V":
+                key_id = self._read(_U32)
+                self.values[self._keys[key_id]] = self._read_value()
+            elif tag == b"K":
+                key_id = self._read(_U32)
+                name = self._read_str()
+                args = tuple(self._read_value() for _ in range(self._read(_U8)))
+                self._keys[key_id] = (name, args)
+            elif tag == b"M":
+                self.messages.append((self.frame_index, self._read_value()))
+            elif tag == b"R":
+                track = self._read_value()
+                technical_name = self._read_value()
+                self.initial_records.setdefault(track, {})[technical_name] = self._read(_I32)
+            else:
+                raise TraceError("Unknown record tag {!r} at byte {}".format(tag, self._pos - 1))
+        return False
+
+    def next_frame(self):
+        """Moves to the next frame and applies its values; False once the trace is exhausted."""
+        if self._pos >= len(self._data):
+            return False
+        self._pos += 1  # the F tag
+        self.now, self.delta_t = _FRAME.unpack_from(self._data, self._pos)
+        self._pos += _FRAME.size
+        self.frame_index += 1
+        self._read_block()
+        return True
+
+    def lookup(self, name, args):
+        value = self.values.get((name, args), _MISSING)
+        if value is _MISSING:
+            return "" if name in _STRING_GETTERS else 0
+        return value
+
+
+class ReplayAc(object):
+    """
+    Stand-in `ac` module serving getters from a TraceReplay.
+
+    Everything else (labels, logging) goes to `sink`, and console messages are
+    collected in `messages` as (frame, text) so they can be compared with the
+    ones seen at capture time.
+    """
+
+    def __init__(self, replay, sink):
+        self._replay = replay
+        self._sink = sink
+        self.messages = []
+
+    def __getattr__(self, name):
+        if is_traced(name):
+            replay = self._replay
+
+            def call(*args):
+                return replay.lookup(name, args)
+            setattr(self, name, call)
+            return call
+        return getattr(self._sink, name)
+
+    def console(self, message):
+        self.messages.append((self._replay.frame_index, message))
@@ -0,0 +1,105 @@
+"""
+Retained-mode model of the app window's labels.
+
+The app writes label text into `LabelView`s during a frame; `LabelModel.flush()`
+then pushes only the views whose text actually changed to ac.setText, once per
+frame. Nothing is ever read back from the UI.
+"""
+from collections import deque
+
+
+class LabelView(object):
+    """What one label should show."""
+    __slots__ = ('control', 'text', 'dirty')
+
+    def __init__(self, control, text=""):
+        self.control = control
+        self.text = text
+        self.dirty = False
+
+
+class LabelModel(object):
+    """All label views of the window plus the list of those changed since the last flush."""
+
+    def __init__(self):
+        self.views = {}   # {control: LabelView}
+        self._dirty = []  # [LabelView] changed since the last flush
+
+    def view(self, control, text=""):
+        """Returns the view for a control, creating it with the text the control was created with."""
+        view = self.views.get(control)
+        if view is None:
+            view = self.views[control] = LabelView(control, text)
+        return view
+
+    def set(self, control, text):
+        view = self.views.get(control)
+        if view is None:
+            view = self.view(control, None)
+        if view.text != text:
+            view.text = text
+            if not view.dirty:
+                view.dirty = True
+                self._dirty.append(view)
+
+    def invalidate(self):
+        """Marks every view dirty so the next flush re-sends all of them."""
+        for view in self.views.values():
+            if not view.dirty:
+                view.dirty = True
+                self._dirty.append(view)
+
+    def flush(self, set_text):
+        """Pushes changed views through set_text(control, text); returns how many were sent."""
+        dirty = self._dirty
+        if not dirty:
+            return 0
+        for view in dirty:
+            set_text(view.control, view.text)
+            view.dirty = False
+        sent = len(dirty)
+        del dirty[:]
+        return sent
+
+
+class ValueLabel(object):
+    """A label derived from one value, formatted only when the value changes."""
+    __slots__ = ('model', 'control', 'formatter', 'value')
+
+    def __init__(self, model, control, formatter):
+        self.model = model
+        self.control = control
+        self.formatter = formatter
+        self.value = None
+
+    def update(self, value):
+        if value == self.value:
+            return
+        self.value = value
+        self.model.set(self.control, self.formatter(value))
+
+    def reset(self):
+        self.value = None
+
+
+class RecentRecords(object):
+    """Ring buffer of the newest announcements, shown newest first in a column of labels."""
+
+    def __init__(self, model, controls):
+        self.model = model
+        self.controls = list(controls)
+        self.messages = deque(maxlen=len(self.controls))
+
+    def push(self, message):
+        self.messages.appendleft(message)
+        self._show()
+
+    def clear(self):
+        self.messages.clear()
+        self._show()
+
+    def _show(self):
+        messages = self.messages
+        count = len(messages)
+        for index, control in enumerate(self.controls):
+            self.model.set(control, messages[index] if index < count else "")
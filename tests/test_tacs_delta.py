@@ -0,0 +1,77 @@
+"""Reference-lap recording in tacs_delta.DeltaTracker, driven by a simulated timer and spline."""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tacs_delta
+
+FRAME_MS = 1000.0 / 60.0
+
+
+def drive(tracker, laps_ms, spline_offset_frames=0):
+    """
+    Runs laps of the given lengths through a tracker at 60 fps; returns the laps it took as references.
+
+    The spline crosses the line `spline_offset_frames` frames after LapTime resets
+    (earlier when negative), as it does at real start lines. A short lap is
+    driven after the given ones, so the last of them ends with a reset.
+    """
+    laps_ms = list(laps_ms) + [1000]
+    starts = [0.0]
+    for lap_ms in laps_ms:
+        starts.append(starts[-1] + lap_ms)
+
+    def lap_at(t):
+        for lap in range(len(laps_ms)):
+            if t < starts[lap + 1]:
+                return lap
+        return len(laps_ms) - 1
+
+    references = []
+    t = 0.0
+    while t < starts[-1]:
+        lap = lap_at(t)
+        position = t - spline_offset_frames * FRAME_MS
+        spline_lap = lap_at(position) if position >= 0 else 0
+        spline = ((position - starts[spline_lap]) / laps_ms[spline_lap]) % 1.0
+        last_lap = int(laps_ms[lap - 1]) if lap else 0
+        improved = tracker.update(spline, int(t - starts[lap]), last_lap)
+        if improved:
+            references.append(improved)
+        t += FRAME_MS
+    return references
+
+
+class DeltaTrackerTest(unittest.TestCase):
+    def test_reference_recorded_when_wrap_and_reset_are_frames_apart(self):
+        for offset in (-3, -1, 0, 1, 3):
+            with self.subTest(offset=offset):
+                tracker = tacs_delta.DeltaTracker()
+                # The first lap is joined mid-way and never counts; the third is slower than the second.
+                self.assertEqual(drive(tracker, [61000, 60000, 60500], offset), [60000])
+                self.assertEqual(tracker.reference.lap_ms, 60000)
+                # The timer and the spline disagree by the offset, so the recorded times do too.
+                self.assertAlmostEqual(tracker.reference.time_at(0.5), 30000, delta=(abs(offset) + 1) * FRAME_MS)
+
+    def test_faster_lap_replaces_reference(self):
+        tracker = tacs_delta.DeltaTracker()
+        self.assertEqual(drive(tracker, [61000, 60000, 59000], 2), [60000, 59000])
+
+    def test_going_backwards_spoils_the_lap(self):
+        tracker = tacs_delta.DeltaTracker()
+        tracker.update(0.0, 0, 0)
+        tracker.update(0.001, 16, 0)  # a clean start needs a LapTime reset first
+        tracker.update(0.999, 60000, 0)
+        tracker.update(0.001, 17, 0)
+        self.assertEqual(tracker.update(0.5, 30000, 0), 0)
+        tracker.update(0.4, 30016, 0)
+        for i in range(1, 60):
+            tracker.update(0.4 + i * 0.01, 30016 + i * 500, 0)
+        self.assertEqual(tracker.update(0.001, 16, 60000), 0)
+        self.assertEqual(tracker.reference.lap_ms, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
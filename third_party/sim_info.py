@@ -3,7 +3,13 @@ Assetto Corsa shared memory for Python applications
 
 _ctypes.pyd, _ctypes.so or _ctypes.dylib is required depending on target platform
 ctypes.h from the Windows SDK is required for the Unicode API
+
+The page names are configurable: on Windows they are the shared-memory tag
+names AC publishes, anywhere else they are paths to plain files laid out the
+same way, which lets the structures be exercised against stand-in files.
 """
+import os
+import sys
 import mmap
 import functools
 import ctypes
@@ -87,6 +93,20 @@ class SPageFilePhysics(ctypes.Structure):
         ('tyreContactHeading', c_float * 12),
         ('brakeBias', c_float),
         ('localVelocity', c_float * 3),
+        ('P2PActivations', c_int32),
+        ('P2PStatus', c_int32),
+        ('currentMaxRpm', c_int32),
+        ('mz', c_float * 4),
+        ('fx', c_float * 4),
+        ('fy', c_float * 4),
+        ('slipRatio', c_float * 4),
+        ('slipAngle', c_float * 4),
+        ('tcinAction', c_int32),
+        ('absInAction', c_int32),
+        ('suspensionDamage', c_float * 4),
+        ('tyreTemp', c_float * 4),
+        # AC's layout ends here. ACC's page goes on (waterTemp ... absVibrations), but
+        # AC leaves those bytes unset, so they are not declared.
     ]
 
 class SPageFileGraphic(ctypes.Structure):
@@ -175,21 +195,103 @@ class SPageFileStatic(ctypes.Structure):
         ('PitWindowEnd', c_int32),
     ]
 
+def numpy_dtype(structure):
+    """NumPy dtype matching a page structure's layout, for numpy.frombuffer() over a snapshot."""
+    import numpy
+
+    names, formats, offsets = [], [], []
+    for name, ctype in structure._fields_:
+        shape = ()
+        while hasattr(ctype, '_length_'):
+            shape += (ctype._length_,)
+            ctype = ctype._type_
+        base = numpy.dtype(ctype)
+        names.append(name)
+        formats.append((base, shape) if shape else base)
+        offsets.append(getattr(structure, name).offset)
+    return numpy.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                        'itemsize': ctypes.sizeof(structure)})
+
+class PageSnapshot:
+    """
+    Consistent copy of a live page in a buffer allocated once up front.
+
+    `take()` reads packetId, copies the whole page with one memmove and checks
+    packetId again; if the sim wrote the page in between the copy is retried.
+    Afterwards `data` gives ctypes field access over the copy, `view` is a
+    memoryview of the raw bytes, and numpy.frombuffer(snapshot.buffer,
+    numpy_dtype(...)) gives a NumPy record over the same memory. None of
+    these are rebuilt per take, so a take allocates no Python objects per field.
+    """
+
+    def __init__(self, structure, live, max_retries=4):
+        self.structure = structure
+        self.size = ctypes.sizeof(structure)
+        self.buffer = bytearray(self.size)
+        self.view = memoryview(self.buffer)
+        self.data = structure.from_buffer(self.buffer)
+        self.max_retries = max_retries
+        self.torn_reads = 0
+        self._live = live
+        self._live_address = ctypes.addressof(live)
+        self._address = ctypes.addressof(self.data)
+
+    def field_view(self, name, fmt):
+        """memoryview over one field of the copy, cast to a struct format such as 'f' or 'i'."""
+        offset = getattr(self.structure, name).offset
+        size = ctypes.sizeof(dict(self.structure._fields_)[name])
+        return self.view[offset:offset + size].cast(fmt)
+
+    def take(self):
+        """Refreshes the copy; returns False if every attempt overlapped a write."""
+        live, data = self._live, self.data
+        for _ in range(self.max_retries + 1):
+            packet_id = live.packetId
+            ctypes.memmove(self._address, self._live_address, self.size)
+            if data.packetId == packet_id and live.packetId == packet_id:
+                return True
+            self.torn_reads += 1
+        return False
+
+def _open_page(name, size):
+    if sys.platform == "win32":
+        return mmap.mmap(0, size, name)
+    with open(name, "r+b") as f:
+        if os.fstat(f.fileno()).st_size < size:
+            f.truncate(size)
+        return mmap.mmap(f.fileno(), size)
+
 class SimInfo:
-    def __init__(self):
-        self._acpmf_physics = mmap.mmap(0, ctypes.sizeof(SPageFilePhysics), "acpmf_physics")
-        self._acpmf_graphics = mmap.mmap(0, ctypes.sizeof(SPageFileGraphic), "acpmf_graphics")
-        self._acpmf_static = mmap.mmap(0, ctypes.sizeof(SPageFileStatic), "acpmf_static")
+    def __init__(self, physics_name="acpmf_physics", graphics_name="acpmf_graphics", static_name="acpmf_static"):
+        self._acpmf_physics = _open_page(physics_name, ctypes.sizeof(SPageFilePhysics))
+        self._acpmf_graphics = _open_page(graphics_name, ctypes.sizeof(SPageFileGraphic))
+        self._acpmf_static = _open_page(static_name, ctypes.sizeof(SPageFileStatic))
         self.physics = SPageFilePhysics.from_buffer(self._acpmf_physics)
         self.graphics = SPageFileGraphic.from_buffer(self._acpmf_graphics)
         self.static = SPageFileStatic.from_buffer(self._acpmf_static)
 
+    def physics_snapshot(self, max_retries=4):
+        """PageSnapshot of the physics page; keep it and call take() each tick."""
+        return PageSnapshot(SPageFilePhysics, self.physics, max_retries)
+
+    def graphics_snapshot(self, max_retries=4):
+        """PageSnapshot of the graphics page; keep it and call take() each tick."""
+        return PageSnapshot(SPageFileGraphic, self.graphics, max_retries)
+
     def close(self):
-        self._acpmf_physics.close()
-        self._acpmf_graphics.close()
-        self._acpmf_static.close()
+        # The structures export the maps' buffers and must go before the maps can close.
+        self.physics = self.graphics = self.static = None
+        for page in ('_acpmf_physics', '_acpmf_graphics', '_acpmf_static'):
+            mapped = getattr(self, page, None)
+            if mapped is not None:
+                setattr(self, page, None)
+                try:
+                    mapped.close()
+                except BufferError:
+                    pass  # a snapshot or poller still holds a view; the map goes with it
 
     def __del__(self):
         self.close()
 
-info = SimInfo()
+# Only Windows has AC's named pages; elsewhere build a SimInfo over stand-in files.
+info = SimInfo() if sys.platform == "win32" else None
@@ -1,15 +1,783 @@
 import os
-import csv
+import json
+import queue
+import sqlite3
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
-from operator import itemgetter
+from array import array
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 
-def normalize_path(path):
-    """Normalize a path to use forward slashes for consistency."""
-    return path.replace('\\', '/')
+import tacs_storage
+
+CACHE_FILE = "viewer_cache.json"  # Parsed records per CSV, next to this script
+PARSE_CHUNK = 64                  # Files per parse job
+PROCESS_POOL_MIN_FILES = 256      # Below this many changed files a thread pool is cheaper than starting processes
+POLL_MS = 50                      # How often the UI picks up parse results
+ROW_HEIGHT = 25                   # Treeview row height in pixels; also used to work out how many rows are visible
+WHEEL_ROWS = 3                    # Rows scrolled per mouse wheel notch
+SEARCH_DELAY_MS = 120             # Type-ahead waits this long after the last key before filtering
+GRAM = 3                          # Substring search indexes names by n-grams of this length
+WATCH_INTERVAL_S = 2.0            # Default rescan interval of watch mode; --watch SECONDS overrides it
+DATABASE_COLUMNS = {'track', 'car', 'driver', 'time_ms', 'updated'}  # Schema of records.db the viewer can read
+
+normalize_path = tacs_storage.normalize_path
+
+def track_title(track):
+    """Display name of a track key, e.g. 'suzuka_suzukaeast' -> 'Suzuka Suzukaeast'."""
+    return track.replace('_', ' ').title()
+
+def track_display_name(filename):
+    """Display name of a records file; 'rt_suzuka_suzukaeast.csv' and 'suzuka_suzukaeast.csv' both give 'Suzuka Suzukaeast'."""
+    return track_title(tacs_storage.track_from_filename(filename))
+
+def parse_records_file(track_file):
+    """Returns [[car, time_ms], ...] for the valid rows of one records CSV."""
+    return [[car, time_ms] for car, time_ms in tacs_storage.read_records_csv(track_file).items() if time_ms > 0]
+
+class IncompleteFile(Exception):
+    """A records file that was still being written when it was read."""
+
+def parse_complete_file(path, signature):
+    """
+    parse_records_file for a file scanned as (mtime, size) `signature`.
+
+    Raises IncompleteFile if the file changed while it was read, or is empty
+    or ends mid-line: a writer that does not replace files atomically is still
+    at it, and the rows read so far may be cut short.
+    """
+    rows = parse_records_file(path)
+    stat = os.stat(path)
+    if (stat.st_mtime, stat.st_size) != tuple(signature):
+        raise IncompleteFile("changed while being read")
+    if not stat.st_size:
+        raise IncompleteFile("empty")
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b'\n':
+            raise IncompleteFile("ends mid-line")
+    return rows
+
+def parse_records_files(entries):
+    """Parses [(path, mtime, size)]; returns [(path, mtime, size, rows or None)]. Runs in a pool worker."""
+    results = []
+    for path, mtime, size in entries:
+        try:
+            rows = parse_complete_file(path, (mtime, size))
+        except Exception as e:
+            print(f"Error processing {os.path.basename(path)}: {str(e)}")
+            rows = None
+        results.append((path, mtime, size, rows))
+    return results
+
+class RecordIndexCache:
+    """Parsed rows of every records CSV, keyed by path and valid while the file's mtime and size match."""
+
+    def __init__(self, cache_file):
+        self.cache_file = cache_file
+        self.entries = {}  # {normalized path: {'mtime': float, 'size': int, 'rows': [[car, time_ms]]}}
+        self.dirty = False
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f).get('files', {})
+        except (OSError, ValueError, AttributeError):
+            self.entries = {}
+
+    def lookup(self, path, mtime, size):
+        """Cached rows for a file, or None if it is new or changed since it was cached."""
+        entry = self.entries.get(normalize_path(path))
+        if entry is None or entry['mtime'] != mtime or entry['size'] != size:
+            return None
+        return entry['rows']
+
+    def store(self, path, mtime, size, rows):
+        self.entries[normalize_path(path)] = {'mtime': mtime, 'size': size, 'rows': rows}
+        self.dirty = True
+
+    def remove(self, path):
+        if self.entries.pop(normalize_path(path), None) is not None:
+            self.dirty = True
+
+    def prune(self, paths):
+        """Drops entries for files that no longer exist."""
+        keep = set(normalize_path(path) for path in paths)
+        for path in list(self.entries):
+            if path not in keep:
+                del self.entries[path]
+                self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        temp_file = self.cache_file + ".tmp"
+        try:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'files': self.entries}, f, separators=(',', ':'))
+            os.replace(temp_file, self.cache_file)
+            self.dirty = False
+        except OSError as e:
+            print(f"Could not write the viewer cache {self.cache_file}: {str(e)}")
+
+def name_grams(name):
+    """The GRAM-long substrings of a lower-cased name."""
+    return set(name[i:i + GRAM] for i in range(len(name) - GRAM + 1))
+
+def parse_search(text):
+    """
+    Splits a search into (car terms, track terms, either terms), lower-cased.
+
+    'car:f1 track:monza' needs a car containing 'f1' on a track containing
+    'monza'; a bare term may match either.
+    """
+    cars, tracks, either = [], [], []
+    for term in text.lower().split():
+        if term.startswith('car:'):
+            cars.append(term[4:])
+        elif term.startswith('track:'):
+            tracks.append(term[6:])
+        else:
+            either.append(term)
+    return [t for t in cars if t], [t for t in tracks if t], either
+
+def scan_records_dir(records_dir):
+    """
+    {path: (mtime, size)} of the CSV files in a records directory.
+
+    As in CsvRecordStore, `{track}.csv` wins over a legacy `rt_{track}.csv`:
+    the legacy file is left out while both exist, so no track is loaded twice.
+    """
+    files = {}
+    legacy = {}  # {track: (path, signature)} of the rt_ files
+    with os.scandir(records_dir) as it:
+        for entry in it:
+            if entry.name.endswith('.csv') and entry.is_file():
+                stat = entry.stat()
+                if entry.name.startswith(tacs_storage.LEGACY_PREFIX):
+                    legacy[tacs_storage.track_from_filename(entry.name)] = (entry.path, (stat.st_mtime, stat.st_size))
+                else:
+                    files[entry.path] = (stat.st_mtime, stat.st_size)
+    if legacy:
+        tracks = set(tacs_storage.track_from_filename(os.path.basename(path)) for path in files)
+        for track, (path, signature) in legacy.items():
+            if track not in tracks:
+                files[path] = signature
+    return files
+
+class DatabaseUnavailable(Exception):
+    """records.db cannot be shown; the message says why, for the status line."""
+
+def open_database(records_dir):
+    """
+    Opens records.db read-only.
+
+    The viewer never creates, migrates or imports into the database, that is
+    left to the app. Raises DatabaseUnavailable if the file is missing, cannot
+    be opened or was written by an app version with another schema.
+    """
+    path = os.path.join(records_dir, tacs_storage.SqliteRecordStore.FILENAME)
+    if not os.path.exists(path):
+        raise DatabaseUnavailable("is missing")
+    try:
+        db = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True, timeout=5.0)
+        columns = {row[1] for row in db.execute("PRAGMA table_info(records)")}
+    except sqlite3.Error as e:
+        raise DatabaseUnavailable(f"could not be read: {str(e)}")
+    if not DATABASE_COLUMNS <= columns:
+        db.close()
+        raise DatabaseUnavailable("has an old schema, not shown" if columns else "has no records")
+    return db
+
+def read_database(db, since=None):
+    """
+    Best time per car of every track in an open records.db, or only of the
+    tracks updated after `since`, as ({track: [[car, time_ms]]}, newest update).
+    """
+    query = "SELECT track, car, MIN(time_ms) FROM records"
+    params = ()
+    if since is not None:
+        query += " WHERE track IN (SELECT DISTINCT track FROM records WHERE updated > ?)"
+        params = (since,)
+    with db:
+        # One read transaction, so the rows and the newest update time agree.
+        db.execute("BEGIN")
+        rows = db.execute(query + " GROUP BY track, car", params).fetchall()
+        newest = db.execute("SELECT MAX(updated) FROM records").fetchone()[0]
+    by_track = {}
+    for track, car, time_ms in rows:
+        # A track with only unset times still gets an entry, so watch mode clears its rows.
+        cars = by_track.setdefault(track, [])
+        if time_ms > 0:
+            cars.append([car, time_ms])
+    return by_track, newest or 0.0
+
+def database_mtime(records_dir):
+    """Last change to records.db (including its write-ahead log), or None if there is no database."""
+    db_path = os.path.join(records_dir, tacs_storage.SqliteRecordStore.FILENAME)
+    if not os.path.exists(db_path):
+        return None
+    mtime = os.path.getmtime(db_path)
+    wal_path = db_path + "-wal"
+    # A read-only connection leaves an empty write-ahead log behind, which is no change.
+    if os.path.exists(wal_path) and os.path.getsize(wal_path):
+        mtime = max(mtime, os.path.getmtime(wal_path))
+    return mtime
+
+class RecordsWatcher:
+    """
+    Rescans a records directory every `interval` seconds on a background thread.
+
+    Only directory entries are read on a scan; a file is parsed only when its
+    mtime or size differs from the last scan. Results go into `results` as
+    ('changed', path, track name, mtime, size, rows) or ('removed', path).
+    A file that fails to parse, or is caught mid-write, is not remembered and
+    is tried again on every scan until it reads cleanly.
+    """
+
+    def __init__(self, records_dir, known, interval, results):
+        self.records_dir = records_dir
+        self.known = dict(known)  # {path: (mtime, size)} as of the last scan
+        self.failed = {}          # {path: (mtime, size)} that last failed to parse, so the error is printed once
+        self.interval = interval
+        self.results = results
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="TACS-ViewerWatch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.scan()
+
+    def scan(self):
+        try:
+            current = scan_records_dir(self.records_dir)
+        except OSError as e:
+            print(f"Error scanning {self.records_dir}: {str(e)}")
+            return
+        for path, signature in current.items():
+            if self.known.get(path) == signature:
+                continue
+            try:
+                rows = parse_complete_file(path, signature)
+            except Exception as e:
+                # Left out of `known`, so the next scan tries again.
+                if self.failed.get(path) != signature:
+                    print(f"Error processing {os.path.basename(path)}: {str(e)}")
+                    self.failed[path] = signature
+                continue
+            self.failed.pop(path, None)
+            self.known[path] = signature
+            self.results.put(('changed', path, track_display_name(path), signature[0], signature[1], rows))
+        for path in list(self.known):
+            if path not in current:
+                del self.known[path]
+                self.results.put(('removed', path))
+        for path in list(self.failed):
+            if path not in current:
+                del self.failed[path]
+
+class DatabaseWatcher:
+    """
+    Polls a records database every `interval` seconds on a background thread.
+
+    A poll costs one `PRAGMA data_version`; only when another connection has
+    committed are the tracks updated after `since` read back. Results go into
+    `results` as ('changed', track, track name, None, None, rows).
+    """
+
+    def __init__(self, records_dir, since, interval, results):
+        self.records_dir = records_dir
+        self.since = since  # newest `updated` time already shown
+        self.interval = interval
+        self.results = results
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="TACS-ViewerWatch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread = None
+
+    def _run(self):
+        try:
+            db = open_database(self.records_dir)
+        except DatabaseUnavailable as e:
+            print(f"Not watching {tacs_storage.SqliteRecordStore.FILENAME}: it {str(e)}")
+            return
+        try:
+            version = db.execute("PRAGMA data_version").fetchone()[0]
+            while not self._stop.wait(self.interval):
+                current = db.execute("PRAGMA data_version").fetchone()[0]
+                if current != version:
+                    version = current
+                    self.poll(db)
+        except sqlite3.Error as e:
+            print(f"Error watching the records database: {str(e)}")
+        finally:
+            db.close()
+
+    def poll(self, db):
+        try:
+            changed, newest = read_database(db, self.since)
+        except sqlite3.Error as e:
+            print(f"Error reading the records database: {str(e)}")
+            return
+        self.since = newest
+        for track, rows in changed.items():
+            self.results.put(('changed', track, track_title(track), None, None, rows))
+
+class SortState:
+    """Which column the records are sorted by and in which direction."""
+
+    def __init__(self, key=None, descending=False):
+        self.key = key
+        self.descending = descending
+
+    def toggle(self, key):
+        """Header click: flips the direction of the active column; another column starts descending."""
+        self.descending = not self.descending if key == self.key else True
+        self.key = key
+
+class RecordTable:
+    """
+    All loaded records as flat parallel columns.
+
+    The display text of every row is built once when the row is added, and
+    the ascending sort permutation of each column is computed on first use
+    and kept until more rows arrive, so re-sorting and filtering never sort
+    or format anything again.
+
+    Each distinct track and car name has an inverted index entry (the rows it
+    appears in), and the lower-cased names are indexed by n-grams, so a
+    substring search only checks the few names sharing all of its n-grams.
+
+    `replace_file()` applies a reloaded file as a row diff: changed times are
+    updated in place, new cars appended, and removed cars left as dead rows
+    that are dropped from the indexes and skipped when listing.
+
+    The 'rank' and 'gap' columns are filled in by RecordAggregates for the
+    tracks listed in `dirty_tracks`. An order key can also be a (primary,
+    secondary) pair of columns.
+    """
+
+    def __init__(self, format_time):
+        self.format_time = format_time
+        self.columns = {'track': [], 'car': [], 'time_ms': array('i'), 'rank': array('i'), 'gap': array('d')}
+        self.time_texts = []
+        self.rows_by = {'track': {}, 'car': {}}  # {column: {name: array('i') of rows}}
+        self._grams = {'track': {}, 'car': {}}   # {column: {n-gram: set of names}}
+        self._lower = {'track': {}, 'car': {}}   # {column: {name: lower-cased name}}
+        self._orders = {}  # {column key: array('i') of row indices, ascending}
+        self._ranks = {}   # {column key: array('i'), row index -> position in the order}
+        self._last_match = {}  # {column: (text, names)} of the previous search, for type-ahead
+        self.file_rows = {}  # {file path: {car: row index}}
+        self.dead = set()    # Rows removed by replace_file/remove_file
+        self.dirty_tracks = set()  # Tracks whose rows changed since RecordAggregates last refreshed
+
+    @property
+    def track_names(self):
+        return self.rows_by['track'].keys()
+
+    def __len__(self):
+        """Number of live records."""
+        return len(self.time_texts) - len(self.dead)
+
+    def extend(self, track_name, rows, path=None):
+        """Adds one file's [[car, time_ms]] rows under a track display name."""
+        if not rows:
+            return
+        tracks, cars, times = self.columns['track'], self.columns['car'], self.columns['time_ms']
+        ranks, gaps = self.columns['rank'], self.columns['gap']
+        format_time = self.format_time
+        file_rows = self.file_rows.setdefault(path, {})
+        track_rows = self._index_name('track', track_name)
+        for car, time_ms in rows:
+            index = len(self.time_texts)
+            tracks.append(track_name)
+            cars.append(car)
+            times.append(time_ms)
+            ranks.append(0)
+            gaps.append(0.0)
+            self.time_texts.append(format_time(time_ms))
+            track_rows.append(index)
+            self._index_name('car', car).append(index)
+            file_rows[car] = index
+        self.dirty_tracks.add(track_name)
+        self._changed()
+
+    def _changed(self, *keys):
+        """Drops cached orders (of `keys` and the pairs using them, or all) and search state after the rows changed."""
+        if keys:
+            keys = [key for key in self._orders if key in keys or (isinstance(key, tuple) and set(key) & set(keys))]
+        else:
+            keys = list(self._orders)
+        for key in keys:
+            self._orders.pop(key, None)
+            self._ranks.pop(key, None)
+        self._last_match.clear()
+
+    def replace_file(self, path, track_name, rows):
+        """Brings a loaded file's rows in line with its new contents; returns True if anything changed."""
+        old = self.file_rows.get(path, {})
+        new = dict((car, time_ms) for car, time_ms in rows)
+        times = self.columns['time_ms']
+        updated = False
+        for car, index in list(old.items()):
+            if car not in new:
+                self._kill(path, car)
+                updated = True
+            elif times[index] != new[car]:
+                times[index] = new[car]
+                self.time_texts[index] = self.format_time(new[car])
+                self.dirty_tracks.add(self.columns['track'][index])
+                self._changed('time_ms')
+                updated = True
+        added = [[car, time_ms] for car, time_ms in new.items() if car not in old]
+        if added:
+            self.extend(track_name, added, path)
+            updated = True
+        return updated
+
+    def remove_file(self, path):
+        """Drops every row of a file that no longer exists."""
+        for car in list(self.file_rows.get(path, {})):
+            self._kill(path, car)
+        self.file_rows.pop(path, None)
+
+    def _kill(self, path, car):
+        index = self.file_rows[path].pop(car)
+        self.dead.add(index)
+        self.dirty_tracks.add(self.columns['track'][index])
+        for column in ('track', 'car'):
+            name = self.columns[column][index]
+            rows = self.rows_by[column][name]
+            rows.remove(index)
+            if not rows:
+                # Last row of this name: forget the name entirely.
+                del self.rows_by[column][name]
+                lower = self._lower[column].pop(name)
+                for gram in name_grams(lower):
+                    names = self._grams[column].get(gram)
+                    if names is not None:
+                        names.discard(name)
+        self._last_match.clear()
+
+    def _index_name(self, column, name):
+        """The inverted index entry for a name, adding the name to the n-gram index if it is new."""
+        rows = self.rows_by[column].get(name)
+        if rows is None:
+            rows = self.rows_by[column][name] = array('i')
+            lower = self._lower[column][name] = name.lower()
+            grams = self._grams[column]
+            for gram in name_grams(lower):
+                grams.setdefault(gram, set()).add(name)
+        return rows
+
+    def order(self, key):
+        """Row indices sorted ascending by one column or a (primary, secondary) pair (stable, so ties keep their load order)."""
+        order = self._orders.get(key)
+        if order is None:
+            if isinstance(key, tuple):
+                primary, secondary = key
+                order = array('i', sorted(self.order(secondary), key=self.columns[primary].__getitem__))
+            else:
+                order = array('i', sorted(range(len(self.time_texts)), key=self.columns[key].__getitem__))
+            self._orders[key] = order
+        return order
+
+    def rank(self, key):
+        """Position of every row in order(key)."""
+        rank = self._ranks.get(key)
+        if rank is None:
+            rank = array('i', bytes(4 * len(self.time_texts)))
+            for position, index in enumerate(self.order(key)):
+                rank[index] = position
+            self._ranks[key] = rank
+        return rank
+
+    def names_matching(self, column, text):
+        """Distinct names in a column containing `text` (lower-case)."""
+        lower = self._lower[column]
+        previous = self._last_match.get(column)
+        if previous is not None and previous[0] in text:
+            # Type-ahead: the longer text can only match names the shorter one did.
+            candidates = previous[1]
+        elif len(text) >= GRAM:
+            grams = self._grams[column]
+            sets = sorted((grams.get(gram, set()) for gram in name_grams(text)), key=len)
+            candidates = set.intersection(*sets) if sets else set()
+        else:
+            candidates = lower.keys()
+        names = [name for name in candidates if text in lower[name]]
+        self._last_match[column] = (text, names)
+        return names
+
+    def rows_for_names(self, column, names):
+        """Set of the rows of any of the names."""
+        rows = set()
+        by_name = self.rows_by[column]
+        for name in names:
+            rows.update(by_name[name])
+        return rows
+
+    def select(self, track=None, search=""):
+        """Rows on `track` (None = any) matching a parse_search() query; None means every row."""
+        car_terms, track_terms, either_terms = parse_search(search)
+        selected = None
+        facets = []
+        if track is not None:
+            facets.append(set(self.rows_by['track'].get(track, ())))
+        for term in car_terms:
+            facets.append(self.rows_for_names('car', self.names_matching('car', term)))
+        for term in track_terms:
+            facets.append(self.rows_for_names('track', self.names_matching('track', term)))
+        for term in either_terms:
+            rows = self.rows_for_names('car', self.names_matching('car', term))
+            rows |= self.rows_for_names('track', self.names_matching('track', term))
+            facets.append(rows)
+        # Smallest facet first keeps the intersections cheap.
+        for rows in sorted(facets, key=len):
+            selected = rows if selected is None else selected & rows
+            if not selected:
+                break
+        return selected
+
+    def ordered(self, key, descending, rows=None):
+        """`rows` (None = all live rows) as an array in the order of one column (None = load order)."""
+        order = self.order(key) if key is not None else range(len(self.time_texts))
+        if rows is None:
+            walk = reversed(order) if descending else order
+            if self.dead:
+                dead = self.dead
+                return array('i', (index for index in walk if index not in dead))
+            return array('i', walk)
+        if len(rows) * 8 < len(order):
+            # Few matches: sort them by their precomputed rank rather than walking the whole order.
+            rank = self.rank(key).__getitem__ if key is not None else None
+            return array('i', sorted(rows, key=rank, reverse=descending))
+        walk = reversed(order) if descending else order
+        return array('i', (index for index in walk if index in rows))
+
+    def row_values(self, index):
+        """Treeview values for one row."""
+        return (self.columns['track'][index], self.time_texts[index], self.columns['car'][index])
+
+    def rank_values(self, index):
+        """Treeview values for one row of the Ranks tab."""
+        columns = self.columns
+        return (columns['track'][index], columns['rank'][index], columns['car'][index], self.time_texts[index],
+                "+{:.2f}%".format(columns['gap'][index]))
+
+class RecordAggregates:
+    """
+    Cross-track figures over a RecordTable, kept up to date track by track.
+
+    For every row: its rank on its track (ties share a rank) and its gap to
+    the track record in percent, stored in the table's 'rank' and 'gap'
+    columns. For every car: how many track records it holds, how many tracks
+    it has a time on, and the sum of its gaps. `refresh()` only recomputes the
+    tracks in `table.dirty_tracks`, taking each one's previous contribution
+    back out of the per-car totals first.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.track_rows = {}     # {track: array('i') of its rows, fastest first, as of the last refresh}
+        self.record_counts = {}  # {car: track records held}
+        self.track_counts = {}   # {car: tracks with a time}
+        self.gap_sums = {}       # {car: sum of gap percentages}
+        self.version = 0         # Bumped by every refresh that changed something
+
+    def refresh(self):
+        """Recomputes the tracks changed since the last refresh; returns True if there were any."""
+        table = self.table
+        if not table.dirty_tracks:
+            return False
+        dirty, table.dirty_tracks = table.dirty_tracks, set()
+        for track in dirty:
+            self._withdraw(track)
+            self._add(track)
+        table._changed('rank', 'gap')
+        self.version += 1
+        return True
+
+    def _withdraw(self, track):
+        rows = self.track_rows.pop(track, None)
+        if rows is None:
+            return
+        cars, ranks, gaps = self.table.columns['car'], self.table.columns['rank'], self.table.columns['gap']
+        for index in rows:
+            car = cars[index]
+            if ranks[index] == 1:
+                self.record_counts[car] -= 1
+            self.gap_sums[car] -= gaps[index]
+            self.track_counts[car] -= 1
+            if not self.track_counts[car]:
+                del self.track_counts[car], self.gap_sums[car], self.record_counts[car]
+
+    def _add(self, track):
+        rows = self.table.rows_by['track'].get(track)
+        if not rows:
+            return
+        columns = self.table.columns
+        cars, times, ranks, gaps = columns['car'], columns['time_ms'], columns['rank'], columns['gap']
+        ordered = array('i', sorted(rows, key=times.__getitem__))
+        self.track_rows[track] = ordered
+        best = times[ordered[0]]
+        rank, previous = 0, None
+        for position, index in enumerate(ordered, 1):
+            time_ms = times[index]
+            if time_ms != previous:
+                rank, previous = position, time_ms
+            gap = (time_ms - best) * 100.0 / best if best > 0 else 0.0
+            ranks[index] = rank
+            gaps[index] = gap
+            car = cars[index]
+            self.record_counts[car] = self.record_counts.get(car, 0) + (rank == 1)
+            self.track_counts[car] = self.track_counts.get(car, 0) + 1
+            self.gap_sums[car] = self.gap_sums.get(car, 0.0) + gap
+
+    def car_values(self, car):
+        """Treeview values for one row of the Cars tab."""
+        tracks = self.track_counts[car]
+        return (car, self.record_counts[car], tracks, "+{:.2f}%".format(self.gap_sums[car] / tracks))
+
+    def car_sort_key(self, key):
+        """Sort key function over car names for a Cars tab column."""
+        if key == 'records':
+            return self.record_counts.__getitem__
+        if key == 'tracks':
+            return self.track_counts.__getitem__
+        if key == 'gap':
+            return lambda car: self.gap_sums[car] / self.track_counts[car]
+        return None  # by name
+
+class VirtualTreeview:
+    """
+    A Treeview and scrollbar showing an arbitrarily long sequence of rows.
+
+    Only the rows in view are asked for their values (`row_values(row)`), and
+    the same few Treeview items are reused for whichever rows those are.
+    """
+
+    def __init__(self, parent, columns, row_values, sort):
+        """columns is [(sort key, heading, width)]; clicking a heading calls sort(key)."""
+        self.columns = columns
+        self.row_values = row_values
+        self.rows = ()            # Entries passed to row_values, in display order
+        self.first_row = 0        # Index into rows of the top visible row
+        self.visible_rows = 16    # Updated from the Treeview's height once it is shown
+        self.row_items = []       # Treeview items reused for whatever rows are in view
+        self.sort_state = None
+
+        self.tree = ttk.Treeview(parent, columns=[heading for _, heading, _ in columns], show="headings")
+        self.tree.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # Scrollbar - drives the virtual row window rather than the Treeview itself
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.scroll_rows)
+        self.scrollbar.grid(row=0, column=1, sticky=(tk.N, tk.S))
+        self.tree.bind("<Configure>", self.on_tree_resize)
+        self.tree.bind("<MouseWheel>", self.on_mouse_wheel)
+        self.tree.bind("<Button-4>", self.on_mouse_wheel)
+        self.tree.bind("<Button-5>", self.on_mouse_wheel)
+        parent.columnconfigure(0, weight=1)
+        parent.rowconfigure(0, weight=1)
+
+        for key, heading, width in columns:
+            self.tree.heading(heading, text=heading, command=lambda key=key: sort(key))
+            self.tree.column(heading, width=width, anchor=tk.W)
+
+    def show(self, rows, sort_state, keep_position=False):
+        self.rows = rows
+        self.sort_state = sort_state
+        if not keep_position:
+            self.first_row = 0
+        self.update_treeview()
+
+    def row_at(self, y):
+        """The entry of `rows` shown at a y position of the Treeview, or None."""
+        item = self.tree.identify_row(y)
+        if item not in self.row_items:
+            return None
+        index = self.first_row + self.row_items.index(item)
+        return self.rows[index] if index < len(self.rows) else None
+
+    def update_treeview(self):
+        """Show the rows that are in view, reusing a fixed set of Treeview items."""
+        total = len(self.rows)
+        visible = self.visible_rows
+        self.first_row = max(0, min(self.first_row, total - visible))
+
+        # One item per visible row (plus a partly visible last one), created or dropped as the window resizes
+        wanted = visible + 1
+        while len(self.row_items) < wanted:
+            self.row_items.append(self.tree.insert("", "end", values=("",) * len(self.columns)))
+        while len(self.row_items) > wanted:
+            self.tree.delete(self.row_items.pop())
+
+        row_values = self.row_values
+        for slot, item in enumerate(self.row_items):
+            index = self.first_row + slot
+            if index < total:
+                self.tree.item(item, values=row_values(self.rows[index]))
+                self.tree.move(item, "", slot)
+            else:
+                self.tree.detach(item)
+
+        if total > visible:
+            self.scrollbar.set(self.first_row / total, (self.first_row + visible) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+        # Update column headers to show sort direction
+        for key, heading, _ in self.columns:
+            text = heading
+            if self.sort_state is not None and key == self.sort_state.key:
+                text += " ↑" if self.sort_state.descending else " ↓"
+            self.tree.heading(heading, text=text)
+
+    def scroll_rows(self, *args):
+        """Scrollbar command: ('moveto', fraction) or ('scroll', count, 'units' | 'pages')."""
+        total = len(self.rows)
+        if args[0] == "moveto":
+            self.first_row = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            count = int(args[1])
+            self.first_row += count * self.visible_rows if args[2] == "pages" else count
+        self.update_treeview()
+
+    def on_mouse_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_rows("scroll", -WHEEL_ROWS, "units")
+        else:
+            self.scroll_rows("scroll", WHEEL_ROWS, "units")
+        return "break"
+
+    def on_tree_resize(self, event):
+        # Everything below the heading row holds records
+        visible = max(1, (event.height - ROW_HEIGHT) // ROW_HEIGHT)
+        if visible != self.visible_rows:
+            self.visible_rows = visible
+            self.update_treeview()
 
 class TrackAndCarStatsViewer:
-    def __init__(self, root):
+    def __init__(self, root, watch_interval=None, records_dir=None, cache_file=None):
+        """records_dir and cache_file default to 'records' and CACHE_FILE next to this script."""
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        self.records_dir = records_dir or os.path.join(script_dir, "records")
+        self.cache_file = cache_file or os.path.join(script_dir, CACHE_FILE)
         self.root = root
         self.root.title("TACS Records Viewer")
         self.root.geometry("650x450") # Slightly larger for better viewing
@@ -27,54 +795,81 @@ class TrackAndCarStatsViewer:
         self.track_var = tk.StringVar(value="All Tracks")
         self.track_combo = ttk.Combobox(track_frame, textvariable=self.track_var, state="readonly")
         self.track_combo.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Label(track_frame, text="Search:").pack(side=tk.LEFT, padx=(10, 5))
+        self.search_var = tk.StringVar(value="")
+        search_entry = ttk.Entry(track_frame, textvariable=self.search_var, width=24)
+        search_entry.pack(side=tk.LEFT)
+        search_entry.bind("<KeyRelease>", self.schedule_search)
+        self.watch_var = tk.BooleanVar(value=watch_interval is not None)
+        ttk.Checkbutton(track_frame, text="Watch", variable=self.watch_var,
+                        command=self.toggle_watch).pack(side=tk.LEFT, padx=(10, 0))
         
-        # --- Records Treeview ---
-        self.tree = ttk.Treeview(main_frame, columns=("Track", "Time", "Car"), show="headings")
-        self.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
-        
-        # Scrollbar
-        scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=self.tree.yview)
-        scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
-        self.tree.configure(yscrollcommand=scrollbar.set)
-        
-        # --- Sorting State Management ---
+        # --- Tabs ---
+        # Records lists every record; Ranks adds each record's place on its track and its gap to the
+        # track record; Cars ranks the cars by track records held. The last two come from RecordAggregates.
+        self.notebook = ttk.Notebook(main_frame)
+        self.notebook.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         self.sort_states = {
-            "track": False,  # False = ascending, True = descending
-            "time_ms": False,
-            "car": False
+            'records': SortState(),
+            'ranks': SortState(('track', 'rank')),  # Each track's rank table in turn
+            'cars': SortState('records', descending=True),
         }
-        
-        # Map between internal keys and display columns for clarity
-        self.column_map = {
-            "track": "Track",
-            "time_ms": "Time",
-            "car": "Car"
-        }
-        
-        # --- Configure Treeview Columns and Headings ---
-        self.tree.heading("Track", text="Track", command=lambda: self.sort_records("track"))
-        self.tree.heading("Time", text="Time", command=lambda: self.sort_records("time_ms"))
-        self.tree.heading("Car", text="Car", command=lambda: self.sort_records("car"))
-        
-        self.tree.column("Track", width=220, anchor=tk.W)
-        self.tree.column("Time", width=100, anchor=tk.W)
-        self.tree.column("Car", width=280, anchor=tk.W)
+        self.views = {}
+        self.tabs = {}       # {view name: notebook tab}
+        self.tab_views = {}  # {notebook tab id: view name}
+        for name, title, columns, row_values in (
+            ('records', "Records",
+             [("track", "Track", 220), ("time_ms", "Time", 100), ("car", "Car", 280)],
+             lambda index: self.table.row_values(index)),
+            ('ranks', "Ranks",
+             [("track", "Track", 180), ("rank", "Rank", 50), ("car", "Car", 220), ("time_ms", "Time", 90),
+              ("gap", "Gap", 80)],
+             lambda index: self.table.rank_values(index)),
+            ('cars', "Cars",
+             [("car", "Car", 280), ("records", "Records", 90), ("tracks", "Tracks", 90), ("gap", "Avg Gap", 100)],
+             lambda car: self.aggregates.car_values(car)),
+        ):
+            frame = self.tabs[name] = ttk.Frame(self.notebook)
+            self.notebook.add(frame, text=title)
+            self.views[name] = VirtualTreeview(frame, columns, row_values, lambda key, name=name: self.sort_records(key, name))
+            self.tab_views[str(frame)] = name
+        self.views['cars'].tree.bind("<Double-1>", self.show_car_ranks)
         
         # Make the treeview expandable
         main_frame.columnconfigure(0, weight=1)
         main_frame.rowconfigure(1, weight=1)
         
+        # --- Status Line ---
+        self.status_var = tk.StringVar(value="")
+        ttk.Label(main_frame, textvariable=self.status_var).grid(row=2, column=0, sticky=tk.W, pady=(5, 0))
+
         # --- Data and Initialization ---
-        self.all_records = []
-        self.displayed_records = []
+        self.table = RecordTable(self.format_time)
+        self.aggregates = RecordAggregates(self.table)
+        self.search_job = None            # Pending root.after id of a type-ahead search
+        self.file_signatures = {}         # {path: (mtime, size)} of the files loaded at startup
+        self.database = False             # Whether records come from records.db rather than CSV files
+        self.source = "CSV files"         # Where the records came from, for the status line
+        self.database_since = 0.0         # Newest record update loaded from records.db
+        self.watch_interval = watch_interval or WATCH_INTERVAL_S
+        self.watcher = None
+        self.watch_results = queue.Queue()
+        self.loading = False
+        root.protocol("WM_DELETE_WINDOW", self.close)
+        self.cache = None
+        self.pool = None
+        self.results = queue.Queue()  # Lists of parse results from the pool, picked up by poll_loading
+        self.pending_jobs = 0
+        self.load_errors = 0
         self.load_records()
         
-        # Bind track selection change to the filter function
+        # Bind track selection and tab changes to the filter function
         self.track_combo.bind("<<ComboboxSelected>>", self.filter_records)
+        self.notebook.bind("<<NotebookTabChanged>>", self.filter_records)
         
         # --- Style Configuration ---
         style = ttk.Style()
-        style.configure("Treeview", rowheight=25, font=("TkDefaultFont", 9))
+        style.configure("Treeview", rowheight=ROW_HEIGHT, font=("TkDefaultFont", 9))
         style.configure("Treeview.Heading", font=("TkDefaultFont", 10, "bold"))
         
         # Set initial sort
@@ -92,139 +887,292 @@ class TrackAndCarStatsViewer:
         return "{:d}:{:06.3f}".format(minutes, seconds)
 
     def load_records(self):
-        """Load records from all track CSV files located in the 'records' subdirectory."""
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        records_dir = os.path.join(script_dir, "records")
-        self.all_records = []
+        """
+        Load records from the records directory.
+
+        If it holds a records database, every record comes from that in one
+        query, unless a CSV file was written after the database last changed
+        (the app has been switched back to CSV storage, or the database is a
+        leftover). Otherwise CSV files whose mtime and size match the index
+        cache are shown right away; the rest are parsed by a worker pool and
+        added as their results arrive. The status line names the source.
+        """
+        records_dir = self.records_dir
+        self.table = RecordTable(self.format_time)
+        self.aggregates = RecordAggregates(self.table)
         
         if not os.path.exists(records_dir):
             messagebox.showerror("Directory Not Found", 
                              f"The records directory was not found at:\n{records_dir}")
             return
-        
-        csv_files = [f for f in os.listdir(records_dir) if f.endswith('.csv')]
+
+        self.file_signatures = scan_records_dir(records_dir)
+        db_mtime = database_mtime(records_dir)
+        if db_mtime is not None:
+            newest_csv = max((mtime for mtime, _ in self.file_signatures.values()), default=0.0)
+            if newest_csv > db_mtime:
+                self.source = f"CSV files ({tacs_storage.SqliteRecordStore.FILENAME} is older, not shown)"
+            elif self.load_database():
+                return
+
+        self.cache = RecordIndexCache(self.cache_file)
+        csv_files = [(path, mtime, size) for path, (mtime, size) in self.file_signatures.items()]
         if not csv_files:
+            if self.watch_var.get():
+                self.status_var.set("Watching for records...")
+                self.start_watch()
+                return
             messagebox.showwarning("No Records Found", 
                            f"No CSV files found in:\n{records_dir}")
             return
-        
-        for filename in csv_files:
-            # Extract track name from filename (remove rt_ prefix and .csv extension)
-            track_name = os.path.splitext(filename)[0]
-            if track_name.startswith('rt_'):
-                track_name = track_name[3:]  # Remove 'rt_' prefix
-            track_name = track_name.replace('_', ' ').title()  # Format for display
-            
-            track_file = os.path.join(records_dir, filename)
-            
+
+        self.cache.prune(path for path, _, _ in csv_files)
+        changed = []
+        for path, mtime, size in csv_files:
+            rows = self.cache.lookup(path, mtime, size)
+            if rows is None:
+                changed.append((path, mtime, size))
+            else:
+                self.add_file_records(path, rows)
+
+        self.refresh_tracks()
+        self.loading = True
+        if not changed:
+            self.finish_loading()
+            return
+
+        self.status_var.set(f"Loading {len(changed)} of {len(csv_files)} record files...")
+        if len(changed) >= PROCESS_POOL_MIN_FILES:
+            try:
+                self.pool = ProcessPoolExecutor()
+            except (OSError, NotImplementedError):
+                self.pool = None
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=min(8, (os.cpu_count() or 1) + 4))
+        for start in range(0, len(changed), PARSE_CHUNK):
+            future = self.pool.submit(parse_records_files, changed[start:start + PARSE_CHUNK])
+            future.add_done_callback(self.results.put)
+            self.pending_jobs += 1
+        self.root.after(POLL_MS, self.poll_loading)
+
+    def load_database(self):
+        """
+        Loads every record from records.db, read-only. Returns False if it
+        cannot be shown, with the reason in the source, to fall back to the CSV files.
+        """
+        try:
+            db = open_database(self.records_dir)
+            try:
+                by_track, self.database_since = read_database(db)
+            except sqlite3.Error as e:
+                raise DatabaseUnavailable(f"could not be read: {str(e)}")
+            finally:
+                db.close()
+        except DatabaseUnavailable as e:
+            print(f"Not loading {tacs_storage.SqliteRecordStore.FILENAME}: it {str(e)}")
+            self.source = f"CSV files ({tacs_storage.SqliteRecordStore.FILENAME} {str(e)})"
+            return False
+
+        for track, rows in by_track.items():
+            # The track key stands in for the file path, so watch mode can replace a track's rows.
+            if rows:
+                self.table.extend(track_title(track), rows, track)
+        self.database = True
+        self.source = tacs_storage.SqliteRecordStore.FILENAME
+        self.refresh_tracks()
+        self.loading = True
+        self.finish_loading()
+        return True
+
+    def add_file_records(self, path, rows):
+        """Appends one file's [[car, time_ms]] rows to the record table."""
+        self.table.extend(track_display_name(path), rows, path)
+
+    def poll_loading(self):
+        """Adds the parse results that arrived since the last poll and refreshes the view once."""
+        arrived = False
+        while True:
+            try:
+                future = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending_jobs -= 1
             try:
-                with open(track_file, 'r', newline='', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)  # Use DictReader to read by column names
-                    for row in reader:
-                        try:
-                            car_name = row['CarName']
-                            time_ms = int(row['Time_ms'])
-                            
-                            if time_ms <= 0:
-                                continue
-                                
-                            self.all_records.append({
-                                'track': track_name,
-                                'car': car_name,
-                                'time_ms': time_ms
-                            })
-                        except (KeyError, ValueError) as e:
-                            print(f"Error processing row in {filename}: {str(e)}")
-                            continue
-                        
+                results = future.result()
             except Exception as e:
-                print(f"Error processing {filename}: {str(e)}")
+                print(f"Error loading records: {str(e)}")
+                self.load_errors += 1
                 continue
-    
-        if not self.all_records:
+            for path, mtime, size, rows in results:
+                if rows is None:
+                    # Forgotten, so watch mode parses it again on its first scan.
+                    self.file_signatures.pop(path, None)
+                    self.load_errors += 1
+                    continue
+                self.cache.store(path, mtime, size, rows)
+                self.add_file_records(path, rows)
+                arrived = True
+
+        if arrived:
+            self.refresh_tracks()
+        if self.pending_jobs:
+            self.root.after(POLL_MS, self.poll_loading)
+        else:
+            self.finish_loading()
+
+    def finish_loading(self):
+        self.loading = False
+        self.aggregates.refresh()
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+        if self.cache is not None:
+            self.cache.save()
+        errors = f", {self.load_errors} files could not be read" if self.load_errors else ""
+        self.status_var.set(f"{len(self.table)} records from {self.source}{errors}")
+        if not len(self.table) and not self.watch_var.get():
             messagebox.showwarning("No Valid Records", 
-                           "No valid records were found in any of the CSV files.")
+                           "No valid records were found in the records directory.")
+        if self.watch_var.get():
+            self.start_watch()
+
+    # --- Watch Mode ---
+    def toggle_watch(self):
+        if self.watch_var.get():
+            if not self.loading:
+                self.start_watch()
+        else:
+            self.stop_watch()
+
+    def start_watch(self):
+        if self.watcher is not None or not os.path.isdir(self.records_dir):
             return
-        
-        # Update track list in the combobox
-        track_names = sorted(list(set(r['track'] for r in self.all_records)))
+        if self.database:
+            self.watcher = DatabaseWatcher(self.records_dir, self.database_since, self.watch_interval, self.watch_results)
+        else:
+            self.watcher = RecordsWatcher(self.records_dir, self.file_signatures, self.watch_interval, self.watch_results)
+        self.watcher.start()
+        self.root.after(POLL_MS, self.poll_watch)
+
+    def stop_watch(self):
+        if self.watcher is not None:
+            # Carry on from what it saw if watching is turned back on.
+            if self.database:
+                self.database_since = self.watcher.since
+            else:
+                self.file_signatures = dict(self.watcher.known)
+            self.watcher.stop()
+            self.watcher = None
+
+    def poll_watch(self):
+        """Applies the watcher's results as row diffs, keeping the sort, filter and scroll position."""
+        if self.watcher is None:
+            return
+        updated = []
+        while True:
+            try:
+                result = self.watch_results.get_nowait()
+            except queue.Empty:
+                break
+            if result[0] == 'changed':
+                _, path, track_name, mtime, size, rows = result
+                if mtime is not None:
+                    self.cache.store(path, mtime, size, rows)
+                if self.table.replace_file(path, track_name, rows):
+                    updated.append(track_name)
+            else:
+                path = result[1]
+                self.table.remove_file(path)
+                self.cache.remove(path)
+                updated.append(track_display_name(path))
+        if updated:
+            self.aggregates.refresh()
+            self.refresh_tracks()
+            self.status_var.set(f"{len(self.table)} records from {self.source}, updated {', '.join(updated[:3])}"
+                                + (f" and {len(updated) - 3} more" if len(updated) > 3 else ""))
+        self.root.after(max(POLL_MS, int(self.watch_interval * 250)), self.poll_watch)
+
+    def close(self):
+        self.stop_watch()
+        if self.cache is not None:
+            self.cache.save()
+        self.root.destroy()
+
+    def refresh_tracks(self):
+        """Updates the track list in the combobox and redisplays the current filter."""
+        track_names = sorted(self.table.track_names)
         track_names.insert(0, "All Tracks")
         self.track_combo['values'] = track_names
-        self.track_var.set("All Tracks")
+        if self.track_var.get() not in track_names:
+            self.track_var.set("All Tracks")
+        self.filter_records(keep_position=True)
         
-        # Initial filter and display
+    def sort_records(self, key, view='records'):
+        """Sort the records of one tab by the given key and update its treeview."""
+        self.sort_states[view].toggle(key)
         self.filter_records()
-        
-    def sort_records(self, key):
-        """Sort currently displayed records by the given key and update the treeview."""
-        # Toggle sort state for the clicked column
-        is_reverse = self.sort_states.get(key, False)
-        self.sort_states[key] = not is_reverse
-        
-        # Reset other columns' sort state
-        for col_key in self.sort_states:
-            if col_key != key:
-                self.sort_states[col_key] = False
 
-        # Sort the currently displayed records
-        self.displayed_records.sort(key=itemgetter(key), reverse=self.sort_states[key])
-        
-        self.update_treeview()
+    def current_view(self):
+        return self.tab_views.get(str(self.notebook.select()), 'records')
+
+    def show_car_ranks(self, event):
+        """Double-clicking a car on the Cars tab lists its rank and gap on every track it has a time on."""
+        car = self.views['cars'].row_at(event.y)
+        if car is None:
+            return
+        self.track_var.set("All Tracks")
+        self.search_var.set(" ".join(f"car:{word}" for word in car.split()))
+        self.sort_states['ranks'] = SortState(('track', 'rank'))
+        self.notebook.select(self.tabs['ranks'])
+        self.filter_records()
+
+    def schedule_search(self, event=None):
+        """Type-ahead: filter once typing pauses for SEARCH_DELAY_MS."""
+        if self.search_job is not None:
+            self.root.after_cancel(self.search_job)
+        self.search_job = self.root.after(SEARCH_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        self.search_job = None
+        self.filter_records()
 
-    def filter_records(self, event=None):
-        """Filter all records based on the selected track."""
+    def filter_records(self, event=None, keep_position=False):
+        """Rebuild the current tab's row order from the track filter, the search box and its sort."""
+        view = self.current_view()
+        sort_state = self.sort_states[view]
         selected_track = self.track_var.get()
-        
-        if selected_track == "All Tracks":
-            self.displayed_records = list(self.all_records)
-        else:
-            self.displayed_records = [r for r in self.all_records if r['track'] == selected_track]
-            
-        # After filtering, re-apply the last known sort or a default one
-        # Find the currently active sort key
-        active_sort_key = 'track' # Default sort
-        for key, is_reversed in self.sort_states.items():
-             # If a column was previously sorted descending, its state would be True
-             if is_reversed or self.tree.heading(self.column_map[key])['text'].endswith(('↑', '↓')):
-                 active_sort_key = key
-                 break
-        
-        self.displayed_records.sort(key=itemgetter(active_sort_key), reverse=self.sort_states.get(active_sort_key, False))
-        
-        self.update_treeview()
-        
-    def update_treeview(self):
-        """Clear and repopulate the treeview with the records from `self.displayed_records`."""
-        # Clear existing items
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-            
-        # Update column headers to show sort direction
-        for col_key, column_name in self.column_map.items():
-            text = column_name
-            if self.sort_states.get(col_key, False):
-                text += " ↑" # Descending
+        track = None if selected_track == "All Tracks" else selected_track
+        rows = self.table.select(track, self.search_var.get())
+        if view == 'cars':
+            # Cars with a matching record; their figures still cover every track.
+            self.aggregates.refresh()
+            if rows is None:
+                cars = self.aggregates.track_counts
             else:
-                # If it's the active sort column but ascending, show down arrow
-                if self.tree.heading(column_name, "command") and self.sort_states.get(col_key) is not None:
-                     # Check if this column was the one just clicked
-                     is_active = any(self.sort_states.values())
-                     if is_active and not self.sort_states[col_key]:
-                         # Find if this is the active ascending sort
-                         active_key = next((k for k, v in self.sort_states.items() if v is False and self.tree.heading(self.column_map[k])['text'].endswith('↓')), None)
-                         if active_key == col_key:
-                            text += " ↓" # Ascending
-        
-        # Insert filtered and sorted records
-        for record in self.displayed_records:
-            time_str = self.format_time(record['time_ms'])
-            self.tree.insert("", "end", values=(record['track'], time_str, record['car']))
+                car_names = self.table.columns['car']
+                cars = set(car_names[index] for index in rows)
+            sort_key = self.aggregates.car_sort_key(sort_state.key)
+            displayed = sorted(cars, reverse=sort_state.descending and sort_key is None)
+            if sort_key is not None:
+                displayed.sort(key=sort_key, reverse=sort_state.descending)
+        else:
+            if view == 'ranks':
+                self.aggregates.refresh()
+            displayed = self.table.ordered(sort_state.key, sort_state.descending, rows)
+        self.views[view].show(displayed, sort_state, keep_position)
 
 
 if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Browse the records saved by TrackAndCarStats.")
+    parser.add_argument("--watch", nargs="?", type=float, const=WATCH_INTERVAL_S, default=None, metavar="SECONDS",
+                        help=f"reload changed record files every SECONDS (default {WATCH_INTERVAL_S:g})")
+    parser.add_argument("--records", default=None, metavar="DIR",
+                        help="records directory to show (default: 'records' next to this script)")
+    args = parser.parse_args()
     try:
         root = tk.Tk()
-        app = TrackAndCarStatsViewer(root)
+        app = TrackAndCarStatsViewer(root, watch_interval=args.watch, records_dir=args.records)
         root.mainloop()
     except Exception as e:
         # A fallback for any unexpected errors during app startup